@@ -3,13 +3,14 @@ Authentication routes for NavEdge Phase 2
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, EmailStr
 from typing import Optional
 from datetime import timedelta
 
-from core.database import get_db, User, Organization, create_access_token
-from core.middleware import get_current_user, get_current_owner
+from core.database import get_async_db, User, Organization
+from core.middleware import get_current_user, get_current_owner, create_access_token
 from core.config import settings
 
 router = APIRouter()
@@ -38,10 +39,10 @@ class OrganizationCreate(BaseModel):
     address: Optional[str] = None
 
 @router.post("/register", response_model=Token)
-async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Register a new user"""
     # Check if user already exists
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    existing_user = await db.scalar(select(User).where(User.email == user_data.email).limit(1))
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -57,10 +58,9 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     )
     
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.flush()
     
-    # If owner, create organization
+    # If owner, create organization (committed together with the user)
     if user_data.role == "owner":
         organization = Organization(
             name=user_data.name + "'s Fleet",
@@ -69,7 +69,8 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
             owner_id=user.id
         )
         db.add(organization)
-        db.commit()
+    
+    await db.commit()
     
     # Create access token
     access_token = create_access_token(
@@ -89,11 +90,11 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     }
 
 @router.post("/login", response_model=Token)
-async def login(login_data: UserLogin, db: Session = Depends(get_db)):
+async def login(login_data: UserLogin, db: AsyncSession = Depends(get_async_db)):
     """Login user"""
     # In a real app, you'd verify the password hash
     # For now, we'll just check if user exists
-    user = db.query(User).filter(User.email == login_data.email).first()
+    user = await db.scalar(select(User).where(User.email == login_data.email).limit(1))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -132,7 +133,7 @@ async def get_me(current_user: User = Depends(get_current_user)):
 async def create_organization(
     org_data: OrganizationCreate,
     current_user: User = Depends(get_current_owner),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create organization (owners only)"""
     organization = Organization(
@@ -144,8 +145,7 @@ async def create_organization(
     )
     
     db.add(organization)
-    db.commit()
-    db.refresh(organization)
+    await db.commit()
     
     return {
         "id": str(organization.id),
@@ -3,12 +3,14 @@ Renter chatbot routes for simple queries
 """
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime, timedelta
 
-from core.database import get_db, User, Contract, Fine, get_current_user
+from core.database import get_async_db, User, Contract, Fine
+from core.middleware import get_current_user
 
 router = APIRouter()
 
@@ -30,7 +32,7 @@ class ChatIntent(BaseModel):
 async def process_chat_message(
     message_data: ChatMessage,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Process renter chatbot message"""
     
@@ -45,18 +47,18 @@ async def process_chat_message(
     
     # Generate response based on intent
     if intent == "time_left":
-        response_data = get_time_left_info(current_user, db)
+        response_data = await get_time_left_info(current_user, db)
         response = f"You have {response_data['days_left']} days left in your rental."
         
     elif intent == "fines":
-        response_data = get_fines_info(current_user, db)
+        response_data = await get_fines_info(current_user, db)
         if response_data['fines_count'] > 0:
             response = f"You have {response_data['fines_count']} fines totaling AED {response_data['total_amount']:.2f}."
         else:
             response = "You have no fines at this time."
             
     elif intent == "km_left":
-        response_data = get_km_info(current_user, db)
+        response_data = await get_km_info(current_user, db)
         if response_data['km_remaining'] > 0:
             response = f"You have {response_data['km_remaining']} km remaining in your current rental period."
         else:
@@ -116,14 +118,14 @@ def detect_intent(message: str) -> str:
     
     return "unknown"
 
-def get_time_left_info(user: User, db: Session) -> dict:
+async def get_time_left_info(user: User, db: AsyncSession) -> dict:
     """Get time left information for user"""
     
     # Get active contract
-    contract = db.query(Contract).filter(
+    contract = await db.scalar(select(Contract).where(
         Contract.renter_id == user.id,
         Contract.status == "active"
-    ).first()
+    ).limit(1))
     
     if not contract:
         return {"days_left": 0, "end_date": None}
@@ -134,15 +136,13 @@ def get_time_left_info(user: User, db: Session) -> dict:
         "end_date": contract.end_date.isoformat()
     }
 
-def get_fines_info(user: User, db: Session) -> dict:
+async def get_fines_info(user: User, db: AsyncSession) -> dict:
     """Get fines information for user"""
     
-    # Get user's contracts
-    contracts = db.query(Contract).filter(Contract.renter_id == user.id).all()
-    contract_ids = [str(contract.id) for contract in contracts]
-    
-    # Get fines for these contracts
-    fines = db.query(Fine).filter(Fine.contract_id.in_(contract_ids)).all()
+    # Get fines on the user's contracts
+    fines = (await db.scalars(select(Fine).join(Contract, Fine.contract_id == Contract.id).where(
+        Contract.renter_id == user.id
+    ))).all()
     
     total_amount = sum(float(fine.amount) for fine in fines)
     
@@ -160,14 +160,14 @@ def get_fines_info(user: User, db: Session) -> dict:
         ]
     }
 
-def get_km_info(user: User, db: Session) -> dict:
+async def get_km_info(user: User, db: AsyncSession) -> dict:
     """Get km information for user"""
     
     # Get active contract
-    contract = db.query(Contract).filter(
+    contract = await db.scalar(select(Contract).where(
         Contract.renter_id == user.id,
         Contract.status == "active"
-    ).first()
+    ).limit(1))
     
     if not contract:
         return {"km_remaining": 0, "daily_limit": 0}
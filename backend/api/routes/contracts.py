@@ -3,23 +3,34 @@ Contract management routes for NavEdge Phase 2
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import datetime, timedelta
 import uuid
 
-from core.database import get_db, User, Contract, Car, Organization, get_current_user, get_current_owner
+from core.database import get_async_db, User, Contract, Car, Organization, UTCDateTime
+from core.middleware import get_current_user, get_current_owner
+from core.pagination import PageParams, paginate, page_response
 from services.pdf_service import PDFService
 
 router = APIRouter()
 
+def _parse_uuid(value: str, not_found: str) -> uuid.UUID:
+    """Path and body IDs are strings; a malformed one cannot match any row"""
+    try:
+        return uuid.UUID(value)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=not_found)
+
 # Pydantic models
 class ContractCreate(BaseModel):
     renter_id: str
     car_id: str
-    start_date: datetime
-    end_date: datetime
+    start_date: UTCDateTime
+    end_date: UTCDateTime
     deposit_amount: float
     daily_km_limit: int = 300
     monthly_rent: float
@@ -42,15 +53,15 @@ class ContractResponse(BaseModel):
 async def create_contract(
     contract_data: ContractCreate,
     current_user: User = Depends(get_current_owner),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new rental contract"""
     
     # Verify renter exists
-    renter = db.query(User).filter(
-        User.id == contract_data.renter_id,
+    renter = await db.scalar(select(User).where(
+        User.id == _parse_uuid(contract_data.renter_id, "Renter not found"),
         User.role == "renter"
-    ).first()
+    ).limit(1))
     if not renter:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -58,7 +69,7 @@ async def create_contract(
         )
     
     # Verify car exists and is available
-    car = db.query(Car).filter(Car.id == contract_data.car_id).first()
+    car = await db.scalar(select(Car).where(Car.id == _parse_uuid(contract_data.car_id, "Car not found")).limit(1))
     if not car:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -72,9 +83,9 @@ async def create_contract(
         )
     
     # Get organization
-    organization = db.query(Organization).filter(
+    organization = await db.scalar(select(Organization).where(
         Organization.owner_id == current_user.id
-    ).first()
+    ).limit(1))
     if not organization:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -83,8 +94,8 @@ async def create_contract(
     
     # Create contract
     contract = Contract(
-        renter_id=contract_data.renter_id,
-        car_id=contract_data.car_id,
+        renter_id=renter.id,
+        car_id=car.id,
         organization_id=organization.id,
         start_date=contract_data.start_date,
         end_date=contract_data.end_date,
@@ -100,20 +111,18 @@ async def create_contract(
     )
     
     db.add(contract)
-    db.commit()
-    db.refresh(contract)
     
-    # Update car status
+    # Update car status (committed together with the contract)
     car.status = "rented"
-    db.commit()
+    await db.commit()
     
-    # Generate PDF contract
+    # Generate PDF contract off the event loop
     pdf_service = PDFService()
-    pdf_path = pdf_service.generate_contract_pdf(contract, renter, car, organization)
+    pdf_path = await run_in_threadpool(pdf_service.generate_contract_pdf, contract, renter, car, organization)
     
     # Update contract with PDF path
     contract.contract_pdf_path = pdf_path
-    db.commit()
+    await db.commit()
     
     return ContractResponse(
         id=str(contract.id),
@@ -129,70 +138,68 @@ async def create_contract(
         created_at=contract.created_at
     )
 
+# Fields of /my-contracts items (selectable with ?fields=)
+CONTRACT_FIELDS = {
+    "id": lambda contract: str(contract.id),
+    "renter_id": lambda contract: str(contract.renter_id),
+    "car_id": lambda contract: str(contract.car_id),
+    "start_date": lambda contract: contract.start_date,
+    "end_date": lambda contract: contract.end_date,
+    "deposit_amount": lambda contract: float(contract.deposit_amount),
+    "daily_km_limit": lambda contract: contract.daily_km_limit,
+    "monthly_rent": lambda contract: float(contract.monthly_rent),
+    "status": lambda contract: contract.status,
+    "contract_pdf_path": lambda contract: contract.contract_pdf_path,
+    "created_at": lambda contract: contract.created_at
+}
+
 @router.get("/my-contracts")
 async def get_my_contracts(
+    page: PageParams = Depends(),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get contracts for current user"""
+    """Get contracts for current user, newest first, one page at a time"""
     
     if current_user.role == "owner":
         # Get all contracts for owner's organization
-        organization = db.query(Organization).filter(
+        organization = await db.scalar(select(Organization).where(
             Organization.owner_id == current_user.id
-        ).first()
+        ).limit(1))
         
         if not organization:
-            return []
+            return page_response([], page, CONTRACT_FIELDS)
         
-        contracts = db.query(Contract).filter(
-            Contract.organization_id == organization.id
-        ).all()
+        query = select(Contract).where(Contract.organization_id == organization.id)
     else:
         # Get only renter's contracts
-        contracts = db.query(Contract).filter(
-            Contract.renter_id == current_user.id
-        ).all()
+        query = select(Contract).where(Contract.renter_id == current_user.id)
     
-    return [
-        {
-            "id": str(contract.id),
-            "renter_id": str(contract.renter_id),
-            "car_id": str(contract.car_id),
-            "start_date": contract.start_date,
-            "end_date": contract.end_date,
-            "deposit_amount": float(contract.deposit_amount),
-            "daily_km_limit": contract.daily_km_limit,
-            "monthly_rent": float(contract.monthly_rent),
-            "status": contract.status,
-            "contract_pdf_path": contract.contract_pdf_path,
-            "created_at": contract.created_at
-        }
-        for contract in contracts
-    ]
+    contracts = (await db.scalars(paginate(query, Contract, page, CONTRACT_FIELDS))).all()
+    return page_response(contracts, page, CONTRACT_FIELDS)
 
 @router.get("/expiring")
 async def get_expiring_contracts(
     days: int = 7,
     current_user: User = Depends(get_current_owner),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get contracts expiring within specified days"""
     
-    organization = db.query(Organization).filter(
+    organization = await db.scalar(select(Organization).where(
         Organization.owner_id == current_user.id
-    ).first()
+    ).limit(1))
     
     if not organization:
         return []
     
     expiry_date = datetime.utcnow() + timedelta(days=days)
     
-    contracts = db.query(Contract).filter(
+    contracts = (await db.scalars(select(Contract).where(
         Contract.organization_id == organization.id,
         Contract.end_date <= expiry_date,
         Contract.status == "active"
-    ).all()
+    ))).all()
     
     return [
         {
@@ -209,11 +216,11 @@ async def get_expiring_contracts(
 async def download_contract_pdf(
     contract_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Download contract PDF"""
     
-    contract = db.query(Contract).filter(Contract.id == contract_id).first()
+    contract = await db.get(Contract, _parse_uuid(contract_id, "Contract not found"))
     if not contract:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
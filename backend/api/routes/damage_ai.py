@@ -1,24 +1,34 @@
 """
 Damage AI FastAPI Routes v1.1
-Implements /ai/damage/detect, /ai/damage/label, /ai/damage/train, /ai/damage/metrics
+Implements /ai/damage/detect, /ai/damage/label, /ai/damage/train, /ai/damage/metrics, /ai/damage/rescore
 """
 
 from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, status, Form, BackgroundTasks
-from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 import uuid
-import json
+import time
+import asyncio
 
 from core.middleware import SupabaseAuthMiddleware
-from core.database import supabase
 from services.damage_ai_service import damage_ai_service
-from services.s3_storage import s3_service
-from core.damage_ai_models import DamageDetection, DamageLabel, DamageModel, DamageTrainingJob, DamageMetrics
+from services.s3_storage import s3_async
+from services.presign_service import presign_service
+from services.rendition_service import rendition_service, DETECTION_IMAGE_FIELDS
+from services.tiling_service import tiling_service
+from services.blob_store import blob_store
+from services.damage_rescoring_service import damage_rescoring_service
+from services.damage_repository import damage_repository
+from services.shadow_evaluation_service import shadow_evaluation_service
+from core.config import settings
+from core.metrics import observe_stage, size_class
 
 router = APIRouter()
 
+_IMAGE_EXTENSIONS = {'image/png': 'png', 'image/webp': 'webp'}
+
 # Pydantic models for request/response
 class DamageDetectionRequest(BaseModel):
     contract_id: Optional[str] = None
@@ -35,6 +45,7 @@ class DamageDetectionResponse(BaseModel):
     lpips_score: float
     yolo_detections: Dict[str, Any]
     processing_time_ms: int
+    stage_timings: Optional[Dict[str, Any]] = None
     needs_human_review: bool
     uncertainty_score: float
     s3_urls: Dict[str, str]
@@ -72,6 +83,14 @@ class TrainingResponse(BaseModel):
     estimated_completion: Optional[datetime]
     message: str
 
+class RescoreRequest(BaseModel):
+    model_version: Optional[str] = None  # Defaults to the active model
+
+class RescoreResponse(BaseModel):
+    job_id: str
+    status: str
+    message: str
+
 class MetricsResponse(BaseModel):
     model_version: str
     accuracy: float
@@ -118,25 +137,38 @@ async def detect_damage(
         before_bytes = await before_image.read()
         after_bytes = await after_image.read()
         
-        # Run AI damage detection
-        detection_results = damage_ai_service.detect_damage(
-            before_bytes, after_bytes, contract_id
+        # Run AI damage detection off the event loop
+        detection_results = await run_in_threadpool(
+            damage_ai_service.detect_damage, before_bytes, after_bytes, contract_id
         )
         
         # Store detection in database
         detection_id = detection_results['detection_id']
         
-        # Upload original images to S3
-        before_url = s3_service.upload_image(
-            before_bytes, 
-            f"damage-images/{detection_id}", 
-            "before.jpg"
-        )
-        after_url = s3_service.upload_image(
-            after_bytes, 
-            f"damage-images/{detection_id}", 
-            "after.jpg"
-        )
+        # Upload original images to S3 concurrently
+        upload_start = time.perf_counter()
+        if settings.CONTENT_ADDRESSED_STORAGE:
+            # Identical photos (re-submissions, shared before images) are stored once
+            stored = await run_in_threadpool(blob_store.put_many, 'damage_detection', detection_id, {
+                'before_image': (before_bytes, _IMAGE_EXTENSIONS.get(before_image.content_type, 'jpg')),
+                'after_image': (after_bytes, _IMAGE_EXTENSIONS.get(after_image.content_type, 'jpg'))
+            })
+            before_url, after_url = stored['before_image'], stored['after_image']
+        else:
+            before_url, after_url = await asyncio.gather(
+                s3_async.upload_image(before_bytes, f"damage-images/{detection_id}", "before.jpg"),
+                s3_async.upload_image(after_bytes, f"damage-images/{detection_id}", "after.jpg")
+            )
+        
+        stage_timings = detection_results.get('stage_timings')
+        if stage_timings:
+            upload_seconds = time.perf_counter() - upload_start
+            stage_timings['stages_ms']['original_upload'] = round(upload_seconds * 1000, 2)
+            observe_stage(
+                'original_upload', upload_seconds, len(before_bytes) + len(after_bytes),
+                stage_timings['resolution'], size_class(stage_timings['input_bytes']),
+                detection_results['model_version']
+            )
         
         # Insert detection record
         detection_data = {
@@ -153,21 +185,36 @@ async def detect_damage(
             "yolo_detections": detection_results['yolo_detections'],
             "ssim_heatmap_path": detection_results['s3_urls'].get('ssim_heatmap'),
             "lpips_heatmap_path": detection_results['s3_urls'].get('lpips_heatmap'),
-            "damage_overlay_path": detection_results['s3_urls'].get('combined'),
+            "damage_overlay_path": detection_results['s3_urls'].get('combined_overlay'),
             "model_version": detection_results['model_version'],
             "inference_time_ms": detection_results['processing_time_ms'],
+            "stage_timings": stage_timings,
             "needs_human_review": detection_results['needs_human_review'],
             "uncertainty_score": detection_results['uncertainty_score'],
             "status": detection_results['status']
         }
         
         # Insert into database
-        response = supabase.from('damage_detections').insert([detection_data]).execute()
+        await run_in_threadpool(damage_repository.insert_detections, [detection_data])
         
-        if not response.data:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to save detection results"
+        # Sample for candidate model evaluation (runs off the request path)
+        shadow_evaluation_service.maybe_submit(
+            detection_id, before_bytes, after_bytes, detection_results
+        )
+        
+        # Build WebP renditions once the response is sent, reusing the uploaded bytes
+        if settings.RENDITIONS_ON_WRITE:
+            background_tasks.add_task(
+                rendition_service.generate_for_detection,
+                detection_id,
+                {column: detection_data.get(column) for _, column in DETECTION_IMAGE_FIELDS},
+                {'before_image_path': before_bytes, 'after_image_path': after_bytes}
+            )
+        
+        if settings.TILES_ON_WRITE:
+            tiling_service.schedule(
+                detection_id,
+                {column: detection_data.get(column) for _, column in DETECTION_IMAGE_FIELDS}
             )
         
         # Schedule background task for active learning if needed
@@ -196,15 +243,6 @@ async def submit_damage_label(
     """
     
     try:
-        # Validate detection exists
-        detection_response = supabase.from('damage_detections').select('id').eq('id', label_request.detection_id).single().execute()
-        
-        if not detection_response.data:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Damage detection not found"
-            )
-        
         # Create label record
         label_id = str(uuid.uuid4())
         label_data = {
@@ -221,21 +259,13 @@ async def submit_damage_label(
             "label_source": "human"
         }
         
-        # Insert label
-        response = supabase.from('damage_labels').insert([label_data]).execute()
-        
-        if not response.data:
+        # Insert label and mark the detection reviewed in one transaction
+        if not await run_in_threadpool(damage_repository.submit_label, label_data):
             raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to save label"
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Damage detection not found"
             )
         
-        # Update detection status
-        supabase.from('damage_detections').update({
-            "status": "reviewed",
-            "needs_human_review": False
-        }).eq('id', label_request.detection_id).execute()
-        
         return DamageLabelResponse(
             label_id=label_id,
             detection_id=label_request.detection_id,
@@ -246,6 +276,8 @@ async def submit_damage_label(
             created_at=datetime.utcnow()
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -267,16 +299,14 @@ async def train_damage_model(
         training_job_id = str(uuid.uuid4())
         
         # Get active model
-        model_response = supabase.from('damage_models').select('id').eq('is_active', True).eq('model_type', training_request.model_type).single().execute()
+        model_id = await run_in_threadpool(damage_repository.active_model_id, training_request.model_type)
         
-        if not model_response.data:
+        if not model_id:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="No active model found for training"
             )
         
-        model_id = model_response.data['id']
-        
         # Create training job
         job_data = {
             "id": training_job_id,
@@ -286,13 +316,7 @@ async def train_damage_model(
             "status": "pending"
         }
         
-        response = supabase.from('damage_training_jobs').insert([job_data]).execute()
-        
-        if not response.data:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to create training job"
-            )
+        await run_in_threadpool(damage_repository.create_training_job, job_data)
         
         # Schedule background training
         background_tasks.add_task(
@@ -309,12 +333,58 @@ async def train_damage_model(
             message="Training job started successfully"
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to start training: {str(e)}"
         )
 
+@router.post("/rescore", response_model=RescoreResponse)
+async def start_rescoring(
+    rescore_request: RescoreRequest,
+    user_id: str = Depends(SupabaseAuthMiddleware)
+):
+    """
+    Re-run a model over historical detections (resumes an unfinished job for the same version)
+    """
+    
+    try:
+        job_id = damage_rescoring_service.create_job(rescore_request.model_version)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    
+    started = damage_rescoring_service.start_job(job_id)
+    
+    return RescoreResponse(
+        job_id=job_id,
+        status="started" if started else "queued",
+        message="Re-scoring job started" if started else "Another re-scoring job is running; this one will resume automatically"
+    )
+
+@router.get("/rescore/{job_id}")
+async def get_rescoring_status(
+    job_id: str,
+    user_id: str = Depends(SupabaseAuthMiddleware)
+):
+    """
+    Get progress of a re-scoring job
+    """
+    
+    job_status = damage_rescoring_service.get_job_status(job_id)
+    
+    if not job_status:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Re-scoring job not found"
+        )
+    
+    return job_status
+
 @router.get("/metrics", response_model=List[MetricsResponse])
 async def get_damage_metrics(
     model_version: Optional[str] = None,
@@ -326,18 +396,14 @@ async def get_damage_metrics(
     
     try:
         # Get metrics from database
-        query = supabase.from('damage_metrics').select('*')
-        
+        model_ids = None
         if model_version:
-            # Join with models table to filter by version
-            model_response = supabase.from('damage_models').select('id').eq('model_version', model_version).execute()
-            if model_response.data:
-                model_ids = [m['id'] for m in model_response.data]
-                query = query.in_('model_id', model_ids)
+            # Filter by the models of that version
+            model_ids = await run_in_threadpool(damage_repository.model_ids_for_version, model_version)
         
-        response = query.execute()
+        metrics = await run_in_threadpool(damage_repository.list_metrics, model_ids)
         
-        if not response.data:
+        if not metrics:
             # Return default metrics if none found
             return [MetricsResponse(
                 model_version=model_version or "v1.1",
@@ -351,7 +417,7 @@ async def get_damage_metrics(
         
         # Group metrics by model
         metrics_by_model = {}
-        for metric in response.data:
+        for metric in metrics:
             model_id = metric['model_id']
             if model_id not in metrics_by_model:
                 metrics_by_model[model_id] = {
@@ -377,6 +443,21 @@ async def get_damage_metrics(
             detail=f"Failed to get metrics: {str(e)}"
         )
 
+@router.get("/shadow")
+async def get_shadow_evaluation_status(
+    user_id: str = Depends(SupabaseAuthMiddleware)
+):
+    """
+    Get shadow evaluation configuration and sampling counters for this worker
+    """
+    
+    return {
+        'enabled': shadow_evaluation_service.enabled,
+        'candidate_model_version': settings.SHADOW_MODEL_VERSION,
+        'sample_rate': settings.SHADOW_SAMPLE_RATE,
+        'stats': shadow_evaluation_service.stats
+    }
+
 @router.get("/detections/{detection_id}")
 async def get_damage_detection(
     detection_id: str,
@@ -387,35 +468,21 @@ async def get_damage_detection(
     """
     
     try:
-        response = supabase.from('damage_detections').select('*').eq('id', detection_id).single().execute()
+        detection = await run_in_threadpool(damage_repository.get_detection, detection_id)
         
-        if not response.data:
+        if not detection:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Damage detection not found"
             )
         
-        detection = response.data
-        
         # Generate presigned URLs for private S3 objects
-        presigned_urls = {}
-        for key, url in [
-            ('before_image', detection['before_image_path']),
-            ('after_image', detection['after_image_path']),
-            ('ssim_heatmap', detection['ssim_heatmap_path']),
-            ('lpips_heatmap', detection['lpips_heatmap_path']),
-            ('damage_overlay', detection['damage_overlay_path'])
-        ]:
-            if url:
-                presigned_url = s3_service.generate_presigned_url(url)
-                if presigned_url:
-                    presigned_urls[key] = presigned_url
-        
-        return {
-            **detection,
-            'presigned_urls': presigned_urls
-        }
+        presign_service.sign_detections([detection])
         
+        return detection
+        
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -431,9 +498,7 @@ async def get_pending_reviews(
     """
     
     try:
-        response = supabase.from('damage_detections').select('*').eq('needs_human_review', True).order('uncertainty_score', desc=True).limit(50).execute()
-        
-        return response.data or []
+        return await run_in_threadpool(damage_repository.pending_reviews, 50)
         
     except Exception as e:
         raise HTTPException(
@@ -455,27 +520,27 @@ async def _run_training_job(training_job_id: str, model_name: str, training_conf
     """Run model training job in background"""
     try:
         # Update job status to running
-        supabase.from('damage_training_jobs').update({
+        await run_in_threadpool(damage_repository.update_training_job, training_job_id, {
             "status": "running",
-            "started_at": datetime.utcnow().isoformat()
-        }).eq('id', training_job_id).execute()
+            "started_at": datetime.utcnow()
+        })
         
         # Run actual training (placeholder)
-        training_results = damage_ai_service.train_model([], training_config or {})
+        training_results = await run_in_threadpool(damage_ai_service.train_model, [], training_config or {})
         
         # Update job status to completed
-        supabase.from('damage_training_jobs').update({
+        await run_in_threadpool(damage_repository.update_training_job, training_job_id, {
             "status": "completed",
-            "completed_at": datetime.utcnow().isoformat(),
+            "completed_at": datetime.utcnow(),
             "final_metrics": training_results,
             "progress_percentage": 100.0
-        }).eq('id', training_job_id).execute()
+        })
         
     except Exception as e:
         # Update job status to failed
-        supabase.from('damage_training_jobs').update({
+        await run_in_threadpool(damage_repository.update_training_job, training_job_id, {
             "status": "failed",
             "error_message": str(e),
-            "completed_at": datetime.utcnow().isoformat()
-        }).eq('id', training_job_id).execute()
+            "completed_at": datetime.utcnow()
+        })
         print(f"Training job {training_job_id} failed: {e}")
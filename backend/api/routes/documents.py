@@ -3,18 +3,42 @@ Document upload and OCR processing routes
 """
 
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from typing import Optional
 import os
 import uuid
 from datetime import datetime
 
-from core.database import get_db, User, DocumentUpload, get_current_user
+from core.database import get_db, User, Contract, Organization, DocumentUpload, EMIRATES_ID_NUMBER
+from core.middleware import get_current_user, get_current_owner
+from core.pagination import PageParams, paginate, page_response
 from services.ocr_service import OCRService
+from services.blob_store import blob_store
 from core.config import settings
 
 router = APIRouter()
 
+def _write_file(path: str, content: bytes):
+    with open(path, "wb") as buffer:
+        buffer.write(content)
+
+def _store_document(content: bytes, file_extension: str, document_id: uuid.UUID, local_path: str) -> str:
+    """
+    Move an uploaded document into the blob store; keep the local copy if that is unavailable
+    Blocking (database, S3 and disk I/O): async routes call it through run_in_threadpool
+    """
+    if not settings.CONTENT_ADDRESSED_STORAGE:
+        return local_path
+    
+    blob_url = blob_store.put(content, file_extension, 'document_upload', document_id, 'file')
+    if not blob_url:
+        return local_path
+    
+    os.remove(local_path)
+    return blob_url
+
 @router.post("/upload-id")
 async def upload_emirates_id(
     file: UploadFile = File(...),
@@ -32,17 +56,21 @@ async def upload_emirates_id(
     unique_filename = f"emirates_id_{uuid.uuid4()}.{file_extension}"
     file_path = os.path.join(settings.UPLOAD_DIR, unique_filename)
     
-    # Save file
-    with open(file_path, "wb") as buffer:
-        content = await file.read()
-        buffer.write(content)
+    # Save file (off the event loop, like the blob store upload below)
+    content = await file.read()
+    await run_in_threadpool(_write_file, file_path, content)
     
     # Process with OCR
     ocr_service = OCRService()
     extracted_data = ocr_service.extract_emirates_id(file_path)
     
+    # Keep the document in content-addressed storage; re-uploads of the same scan are stored once
+    document_id = uuid.uuid4()
+    file_path = await run_in_threadpool(_store_document, content, file_extension, document_id, file_path)
+    
     # Save document record
     document = DocumentUpload(
+        id=document_id,
         user_id=current_user.id,
         document_type="emirates_id",
         file_path=file_path,
@@ -74,17 +102,21 @@ async def upload_driver_license(
     unique_filename = f"license_{uuid.uuid4()}.{file_extension}"
     file_path = os.path.join(settings.UPLOAD_DIR, unique_filename)
     
-    # Save file
-    with open(file_path, "wb") as buffer:
-        content = await file.read()
-        buffer.write(content)
+    # Save file (off the event loop, like the blob store upload below)
+    content = await file.read()
+    await run_in_threadpool(_write_file, file_path, content)
     
     # Process with OCR
     ocr_service = OCRService()
     extracted_data = ocr_service.extract_driver_license(file_path)
     
+    # Keep the document in content-addressed storage; re-uploads of the same scan are stored once
+    document_id = uuid.uuid4()
+    file_path = await run_in_threadpool(_store_document, content, file_extension, document_id, file_path)
+    
     # Save document record
     document = DocumentUpload(
+        id=document_id,
         user_id=current_user.id,
         document_type="license",
         file_path=file_path,
@@ -122,24 +154,71 @@ async def get_extracted_text(
         "created_at": document.created_at
     }
 
+# Fields of /my-documents items (selectable with ?fields=; leave out extracted_text for lists)
+DOCUMENT_FIELDS = {
+    "id": lambda doc: str(doc.id),
+    "document_type": lambda doc: doc.document_type,
+    "file_path": lambda doc: doc.file_path,
+    "extracted_text": lambda doc: doc.extracted_text,
+    "created_at": lambda doc: doc.created_at
+}
+
 @router.get("/my-documents")
 async def get_my_documents(
+    page: PageParams = Depends(),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get all documents for current user"""
+    """Get documents for current user, newest first, one page at a time"""
     
-    documents = db.query(DocumentUpload).filter(
-        DocumentUpload.user_id == current_user.id
+    query = select(DocumentUpload).where(DocumentUpload.user_id == current_user.id)
+    documents = db.scalars(paginate(query, DocumentUpload, page, DOCUMENT_FIELDS)).all()
+    
+    return page_response(documents, page, DOCUMENT_FIELDS)
+
+@router.get("/by-emirates-id/{emirates_id}")
+async def find_documents_by_emirates_id(
+    emirates_id: str,
+    current_user: User = Depends(get_current_owner),
+    db: Session = Depends(get_db)
+):
+    """
+    Find uploaded Emirates ID scans whose OCR'd ID number matches, newest first
+    Only renters with a contract in the owner's organization are visible
+    """
+    
+    organization = db.scalar(select(Organization).where(
+        Organization.owner_id == current_user.id
+    ).limit(1))
+    
+    if not organization:
+        raise HTTPException(status_code=404, detail="Organization not found")
+    
+    # OCR stores the number without separators (784XXXXXXXXXXXX)
+    number = emirates_id.replace("-", "").replace(" ", "")
+    
+    # Uses the expression index on the parsed Emirates ID
+    renters = select(Contract.renter_id).where(Contract.organization_id == organization.id)
+    documents = db.scalars(
+        select(DocumentUpload)
+        .where(EMIRATES_ID_NUMBER == number, DocumentUpload.user_id.in_(renters))
+        .order_by(DocumentUpload.created_at.desc())
     ).all()
     
-    return [
-        {
-            "id": str(doc.id),
-            "document_type": doc.document_type,
-            "file_path": doc.file_path,
-            "extracted_text": doc.extracted_text,
-            "created_at": doc.created_at
-        }
-        for doc in documents
-    ]
+    # Same answer for unknown numbers and other organizations' renters
+    if not documents:
+        raise HTTPException(status_code=404, detail="No documents found for this Emirates ID")
+    
+    return {
+        "emirates_id": number,
+        "documents": [
+            {
+                "id": str(document.id),
+                "user_id": str(document.user_id),
+                "document_type": document.document_type,
+                "file_path": document.file_path,
+                "created_at": document.created_at
+            }
+            for document in documents
+        ]
+    }
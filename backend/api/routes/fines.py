@@ -3,24 +3,35 @@ Fines management and Dubai Police integration routes
 """
 
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime, timedelta
 import uuid
 
-from core.database import get_db, User, Contract, Fine, Car, get_current_user, get_current_owner
+from core.database import get_async_db, User, Contract, Fine, Car, UTCDateTime
+from core.middleware import get_current_user, get_current_owner
+from core.pagination import PageParams, paginate, page_response
 from services.dubai_police_service import DubaiPoliceService
 from services.notification_service import NotificationService
+from services.fine_ingestion_service import fine_ingestion_service
 
 router = APIRouter()
 
+def _parse_uuid(value: str, not_found: str) -> uuid.UUID:
+    """Path and body IDs are strings; a malformed one cannot match any row"""
+    try:
+        return uuid.UUID(value)
+    except ValueError:
+        raise HTTPException(status_code=404, detail=not_found)
+
 # Pydantic models
 class FineCreate(BaseModel):
     contract_id: str
     violation: str
     amount: float
-    date: datetime
+    date: UTCDateTime
     location: Optional[str] = None
 
 class FineResponse(BaseModel):
@@ -39,7 +50,7 @@ async def check_dubai_police_fines(
     license_plate: str,
     background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_owner),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Check Dubai Police for fines for a specific license plate"""
     
@@ -47,44 +58,45 @@ async def check_dubai_police_fines(
     police_service = DubaiPoliceService()
     
     # Check for fines
-    fines_data = police_service.check_fines(license_plate)
+    fines_data = await police_service.check_fines(license_plate)
     
     if fines_data['success']:
-        # Process found fines
-        for fine_data in fines_data['fines']:
-            # Find contract for this car
-            car = db.query(Car).filter(Car.license_plate == license_plate).first()
-            if car:
-                contract = db.query(Contract).filter(
-                    Contract.car_id == car.id,
-                    Contract.status == "active"
-                ).first()
-                
-                if contract:
-                    # Create fine record
-                    fine = Fine(
-                        contract_id=contract.id,
-                        violation=fine_data['violation'],
-                        amount=fine_data['amount'],
-                        date=fine_data['date'],
-                        location=fine_data.get('location'),
-                        source="dubai_police"
-                    )
-                    db.add(fine)
-                    
-                    # Send notification
-                    notification_service = NotificationService()
-                    background_tasks.add_task(
-                        notification_service.send_whatsapp_notification,
-                        current_user.phone,
-                        f"New fine detected for {license_plate}: {fine_data['violation']} - AED {fine_data['amount']}"
-                    )
+        # Find the active contract for this car
+        contract = await db.scalar(select(Contract).join(Car, Car.id == Contract.car_id).where(
+            Car.license_plate == license_plate,
+            Contract.status == "active"
+        ).limit(1))
+        
+        new_fines = []
+        if contract:
+            # Fines already recorded (by the daily job or an earlier check) are skipped
+            new_fines = await fine_ingestion_service.ingest(db, [
+                {
+                    'contract_id': contract.id,
+                    'license_plate': license_plate,
+                    'violation': fine['violation'],
+                    'amount': fine['amount'],
+                    'date': fine['date'],
+                    'location': fine.get('location'),
+                    'source': "dubai_police"
+                }
+                for fine in fines_data['fines']
+            ])
+            await db.commit()
         
-        db.commit()
+        # Send notifications for newly recorded fines only
+        notification_service = NotificationService()
+        for fine in new_fines:
+            background_tasks.add_task(
+                notification_service.send_whatsapp_notification,
+                current_user.phone,
+                f"New fine detected for {license_plate}: {fine.violation} - AED {fine.amount}"
+            )
         
         return {
             "message": "Dubai Police check completed",
             "fines_found": len(fines_data['fines']),
+            "fines_new": len(new_fines),
             "fines": fines_data['fines']
         }
     else:
@@ -98,28 +110,34 @@ async def check_dubai_police_fines(
 async def add_manual_fine(
     fine_data: FineCreate,
     current_user: User = Depends(get_current_owner),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Manually add a fine"""
     
-    # Verify contract exists
-    contract = db.query(Contract).filter(Contract.id == fine_data.contract_id).first()
-    if not contract:
+    # Verify contract exists (with its car's plate for the fingerprint)
+    row = (await db.execute(
+        select(Contract.id, Car.license_plate)
+        .outerjoin(Car, Car.id == Contract.car_id)
+        .where(Contract.id == _parse_uuid(fine_data.contract_id, "Contract not found"))
+    )).first()
+    if not row:
         raise HTTPException(status_code=404, detail="Contract not found")
     
     # Create fine
-    fine = Fine(
-        contract_id=fine_data.contract_id,
-        violation=fine_data.violation,
-        amount=fine_data.amount,
-        date=fine_data.date,
-        location=fine_data.location,
-        source="manual"
-    )
-    
-    db.add(fine)
-    db.commit()
-    db.refresh(fine)
+    inserted = await fine_ingestion_service.ingest(db, [{
+        'contract_id': row.id,
+        'license_plate': row.license_plate,
+        'violation': fine_data.violation,
+        'amount': fine_data.amount,
+        'date': fine_data.date,
+        'location': fine_data.location,
+        'source': "manual"
+    }])
+    if not inserted:
+        raise HTTPException(status_code=409, detail="Fine already recorded")
+    
+    await db.commit()
+    fine = inserted[0]
     
     return FineResponse(
         id=str(fine.id),
@@ -133,88 +151,75 @@ async def add_manual_fine(
         created_at=fine.created_at
     )
 
+# Fields of fine list items (selectable with ?fields=)
+FINE_FIELDS = {
+    "id": lambda fine: str(fine.id),
+    "contract_id": lambda fine: str(fine.contract_id),
+    "violation": lambda fine: fine.violation,
+    "amount": lambda fine: float(fine.amount),
+    "date": lambda fine: fine.date,
+    "status": lambda fine: fine.status,
+    "location": lambda fine: fine.location,
+    "source": lambda fine: fine.source,
+    "created_at": lambda fine: fine.created_at
+}
+
 @router.get("/by-renter/{renter_id}")
 async def get_fines_by_renter(
     renter_id: str,
+    page: PageParams = Depends(),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get fines for a specific renter"""
+    """Get fines for a specific renter, newest first, one page at a time"""
     
     # Check permissions
-    if current_user.role == "renter" and current_user.id != renter_id:
+    if current_user.role == "renter" and str(current_user.id) != renter_id:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    # Get renter's contracts
-    contracts = db.query(Contract).filter(Contract.renter_id == renter_id).all()
-    contract_ids = [str(contract.id) for contract in contracts]
-    
-    # Get fines for these contracts
-    fines = db.query(Fine).filter(Fine.contract_id.in_(contract_ids)).all()
+    # Get fines on the renter's contracts
+    query = select(Fine).join(Contract, Fine.contract_id == Contract.id).where(
+        Contract.renter_id == _parse_uuid(renter_id, "Renter not found")
+    )
+    fines = (await db.scalars(paginate(query, Fine, page, FINE_FIELDS))).all()
     
-    return [
-        FineResponse(
-            id=str(fine.id),
-            contract_id=str(fine.contract_id),
-            violation=fine.violation,
-            amount=float(fine.amount),
-            date=fine.date,
-            status=fine.status,
-            location=fine.location,
-            source=fine.source,
-            created_at=fine.created_at
-        )
-        for fine in fines
-    ]
+    return page_response(fines, page, FINE_FIELDS)
 
 @router.get("/my-fines")
 async def get_my_fines(
+    page: PageParams = Depends(),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get fines for current user"""
+    """Get fines for current user, newest first, one page at a time"""
     
     if current_user.role == "renter":
-        # Get renter's contracts
-        contracts = db.query(Contract).filter(Contract.renter_id == current_user.id).all()
-        contract_ids = [str(contract.id) for contract in contracts]
-        
-        # Get fines for these contracts
-        fines = db.query(Fine).filter(Fine.contract_id.in_(contract_ids)).all()
+        # Get fines on the renter's contracts
+        query = select(Fine).join(Contract, Fine.contract_id == Contract.id).where(
+            Contract.renter_id == current_user.id
+        )
+        fines = (await db.scalars(paginate(query, Fine, page, FINE_FIELDS))).all()
     else:
         # Get all fines for owner's organization
         # This would require organization relationship
         fines = []
     
-    return [
-        FineResponse(
-            id=str(fine.id),
-            contract_id=str(fine.contract_id),
-            violation=fine.violation,
-            amount=float(fine.amount),
-            date=fine.date,
-            status=fine.status,
-            location=fine.location,
-            source=fine.source,
-            created_at=fine.created_at
-        )
-        for fine in fines
-    ]
+    return page_response(fines, page, FINE_FIELDS)
 
 @router.put("/{fine_id}/status")
 async def update_fine_status(
     fine_id: str,
     status: str,
     current_user: User = Depends(get_current_owner),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update fine status"""
     
-    fine = db.query(Fine).filter(Fine.id == fine_id).first()
+    fine = await db.get(Fine, _parse_uuid(fine_id, "Fine not found"))
     if not fine:
         raise HTTPException(status_code=404, detail="Fine not found")
     
     fine.status = status
-    db.commit()
+    await db.commit()
     
     return {"message": "Fine status updated successfully"}
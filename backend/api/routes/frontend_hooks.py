@@ -4,28 +4,48 @@ Provides endpoints for frontend integration with overlays and label submission
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 from datetime import datetime
+import uuid
 
 from core.middleware import SupabaseAuthMiddleware
-from core.database import supabase
-from services.s3_storage import s3_service
+from core.damage_ai_models import DamageDetection
+from core.pagination import PageParams, encode_cursor
+from services.presign_service import presign_service
+from services.damage_repository import damage_repository
+from services.rendition_service import rendition_service, RENDITION_SIZES, DETECTION_IMAGE_FIELDS
+from services.tiling_service import tiling_service
+from core.config import settings
 
 router = APIRouter()
 
+def _validate_rendition(rendition: str):
+    if rendition not in RENDITION_SIZES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown rendition '{rendition}'. Use one of: {', '.join(RENDITION_SIZES)}"
+        )
+
 class DamageOverlayRequest(BaseModel):
     detection_id: str
     overlay_type: str  # ssim, lpips, yolo, combined
+    rendition: str = "preview"  # thumbnail, preview, full
 
 class DamageOverlayResponse(BaseModel):
     detection_id: str
     overlay_url: str
     overlay_type: str
+    rendition: str
     presigned_url: str
     expires_at: datetime
 
+class TileUrlsRequest(BaseModel):
+    level: int
+    tiles: List[List[int]]  # [[col, row], ...] visible in the viewer
+
 class LabelSubmissionRequest(BaseModel):
     detection_id: str
     is_damage: bool
@@ -42,108 +62,97 @@ class LabelSubmissionResponse(BaseModel):
     success: bool
     message: str
 
+# Columns a detection page can be projected to with ?fields=
+DETECTION_COLUMNS = {column.name: None for column in DamageDetection.__table__.columns}
+
 @router.get("/damage-detections")
 async def get_damage_detections(
     contract_id: Optional[str] = Query(None),
     car_id: Optional[str] = Query(None),
     status: Optional[str] = Query(None),
-    limit: int = Query(20, le=100),
-    offset: int = Query(0, ge=0),
+    damage_class: Optional[str] = Query(None, description="Only detections with a YOLO detection of this class"),
+    min_confidence: Optional[float] = Query(None, ge=0, le=1, description="Minimum highest YOLO confidence"),
+    page: PageParams = Depends(),
+    rendition: str = Query("thumbnail"),
     user_id: str = Depends(SupabaseAuthMiddleware)
 ):
     """
-    Get damage detections for frontend display
+    Get damage detections for frontend display, newest first, one page at a time
+    Images are served as thumbnails unless another rendition is requested
     """
+    _validate_rendition(rendition)
+    fields = page.selected(DETECTION_COLUMNS)
     try:
-        query = supabase.from('damage_detections').select('*')
-        
-        if contract_id:
-            query = query.eq('contract_id', contract_id)
-        if car_id:
-            query = query.eq('car_id', car_id)
-        if status:
-            query = query.eq('status', status)
-        
-        query = query.order('created_at', desc=True).range(offset, offset + limit - 1)
-        response = query.execute()
-        
-        detections = response.data or []
-        
-        # Generate presigned URLs for images
-        for detection in detections:
-            detection['presigned_urls'] = {}
-            
-            # Generate presigned URLs for all image paths
-            for key, url in [
-                ('before_image', detection.get('before_image_path')),
-                ('after_image', detection.get('after_image_path')),
-                ('ssim_heatmap', detection.get('ssim_heatmap_path')),
-                ('lpips_heatmap', detection.get('lpips_heatmap_path')),
-                ('damage_overlay', detection.get('damage_overlay_path')),
-                ('annotated_image', detection.get('annotated_image_path'))
-            ]:
-                if url:
-                    presigned_url = s3_service.generate_presigned_url(url, expiration=3600)
-                    if presigned_url:
-                        detection['presigned_urls'][key] = presigned_url
+        # Keyset and image columns are always read; presigning needs the latter
+        columns = set(fields) | {'id', 'created_at', 'renditions'} | {column for _, column in DETECTION_IMAGE_FIELDS}
+        
+        # Keyset instead of offset: rows after the cursor's (created_at, id)
+        rows = await run_in_threadpool(
+            damage_repository.list_detections,
+            contract_id=contract_id, car_id=car_id, status=status, columns=sorted(columns),
+            after=page.position, limit=page.limit + 1,
+            damage_class=damage_class, min_confidence=min_confidence
+        )
+        detections = rows[:page.limit]
+        
+        # Presign every image on the page in one batch
+        presign_service.sign_detections(detections, rendition=rendition)
+        
+        next_cursor = None
+        if len(rows) > page.limit:
+            last = detections[-1]
+            next_cursor = encode_cursor(last['created_at'], last['id'])
+        
+        if page.fields:
+            keep = set(fields) | {'presigned_urls', 'presigned_rendition', 'presigned_urls_expires_at'}
+            detections = [{key: value for key, value in d.items() if key in keep} for d in detections]
         
         return {
             'detections': detections,
-            'total': len(detections),
-            'limit': limit,
-            'offset': offset
+            'next_cursor': next_cursor,
+            'limit': page.limit
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            status_code=500,
             detail=f"Failed to get damage detections: {str(e)}"
         )
 
 @router.get("/damage-detections/{detection_id}")
 async def get_damage_detection_detail(
     detection_id: str,
+    rendition: str = Query("preview"),
     user_id: str = Depends(SupabaseAuthMiddleware)
 ):
     """
     Get detailed damage detection with all overlays and heatmaps
     """
+    _validate_rendition(rendition)
     try:
-        response = supabase.from('damage_detections').select('*').eq('id', detection_id).single().execute()
+        detection = await run_in_threadpool(damage_repository.get_detection, detection_id)
         
-        if not response.data:
+        if not detection:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Damage detection not found"
             )
         
-        detection = response.data
-        
         # Generate presigned URLs for all images
-        presigned_urls = {}
-        for key, url in [
-            ('before_image', detection.get('before_image_path')),
-            ('after_image', detection.get('after_image_path')),
-            ('ssim_heatmap', detection.get('ssim_heatmap_path')),
-            ('lpips_heatmap', detection.get('lpips_heatmap_path')),
-            ('damage_overlay', detection.get('damage_overlay_path')),
-            ('annotated_image', detection.get('annotated_image_path'))
-        ]:
-            if url:
-                presigned_url = s3_service.generate_presigned_url(url, expiration=3600)
-                if presigned_url:
-                    presigned_urls[key] = presigned_url
+        presign_service.sign_detections([detection], rendition=rendition)
         
         # Get labels for this detection
-        labels_response = supabase.from('damage_labels').select('*').eq('detection_id', detection_id).execute()
-        labels = labels_response.data or []
+        labels = await run_in_threadpool(damage_repository.labels_for_detection, detection_id)
         
         return {
             **detection,
-            'presigned_urls': presigned_urls,
             'labels': labels
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -158,28 +167,25 @@ async def get_damage_overlay(
     """
     Get damage overlay image with presigned URL
     """
+    _validate_rendition(overlay_request.rendition)
     try:
         # Get detection
-        response = supabase.from('damage_detections').select('*').eq('id', overlay_request.detection_id).single().execute()
+        detection = await run_in_threadpool(damage_repository.get_detection, overlay_request.detection_id)
         
-        if not response.data:
+        if not detection:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Damage detection not found"
             )
         
-        detection = response.data
-        
-        # Get overlay URL based on type
-        overlay_url = None
-        if overlay_request.overlay_type == 'ssim':
-            overlay_url = detection.get('ssim_heatmap_path')
-        elif overlay_request.overlay_type == 'lpips':
-            overlay_url = detection.get('lpips_heatmap_path')
-        elif overlay_request.overlay_type == 'yolo':
-            overlay_url = detection.get('damage_overlay_path')
-        elif overlay_request.overlay_type == 'combined':
-            overlay_url = detection.get('damage_overlay_path')
+        # Get overlay column based on type
+        overlay_column = {
+            'ssim': 'ssim_heatmap_path',
+            'lpips': 'lpips_heatmap_path',
+            'yolo': 'damage_overlay_path',
+            'combined': 'damage_overlay_path'
+        }.get(overlay_request.overlay_type)
+        overlay_url = detection.get(overlay_column) if overlay_column else None
         
         if not overlay_url:
             raise HTTPException(
@@ -187,49 +193,168 @@ async def get_damage_overlay(
                 detail=f"Overlay type '{overlay_request.overlay_type}' not found"
             )
         
-        # Generate presigned URL
-        presigned_url = s3_service.generate_presigned_url(overlay_url, expiration=3600)
+        # Generate presigned URL for the requested rendition (the original until it exists)
+        selected = rendition_service.resolve(
+            detection, overlay_request.rendition, [(overlay_request.overlay_type, overlay_column)]
+        )
+        signed = presign_service.sign(selected[overlay_column])
         
-        if not presigned_url:
+        if not signed:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to generate presigned URL"
             )
         
+        presigned_url, expires_at = signed
         return DamageOverlayResponse(
             detection_id=overlay_request.detection_id,
             overlay_url=overlay_url,
             overlay_type=overlay_request.overlay_type,
+            rendition=overlay_request.rendition if selected[overlay_column] != overlay_url else 'original',
             presigned_url=presigned_url,
-            expires_at=datetime.utcnow()
+            expires_at=expires_at
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to get damage overlay: {str(e)}"
         )
 
-@router.post("/submit-label", response_model=LabelSubmissionResponse)
-async def submit_damage_label(
-    label_request: LabelSubmissionRequest,
+def _image_column(image: str) -> str:
+    column = dict(DETECTION_IMAGE_FIELDS).get(image)
+    if not column:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown image '{image}'. Use one of: {', '.join(dict(DETECTION_IMAGE_FIELDS))}"
+        )
+    return column
+
+@router.get("/damage-detections/{detection_id}/tiles/{image}")
+async def get_tile_pyramid(
+    detection_id: str,
+    image: str,
     user_id: str = Depends(SupabaseAuthMiddleware)
 ):
     """
-    Submit human label for damage detection (frontend integration)
+    Get the DeepZoom pyramid of a detection image for zoomable viewers
+    Returns 202 and starts building the pyramid if it does not exist yet, or 503 with
+    Retry-After while a failed build is backing off
     """
+    column = _image_column(image)
     try:
-        # Validate detection exists
-        detection_response = supabase.from('damage_detections').select('id').eq('id', label_request.detection_id).single().execute()
+        detection = await run_in_threadpool(
+            damage_repository.get_detection, detection_id, ['id', column, 'tile_pyramids']
+        )
         
-        if not detection_response.data:
+        if not detection or not detection.get(column):
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
-                detail="Damage detection not found"
+                detail="Damage detection image not found"
             )
+        pyramid = (detection.get('tile_pyramids') or {}).get(column)
+        
+        if not pyramid:
+            retry_after = tiling_service.retry_after(detection_id, column)
+            if retry_after:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Tile pyramid build failed; retrying later",
+                    headers={'Retry-After': str(retry_after)}
+                )
+            tiling_service.schedule(detection_id, {column: detection[column]})
+            return JSONResponse(
+                status_code=status.HTTP_202_ACCEPTED,
+                content={'detection_id': detection_id, 'image': image, 'status': 'building'}
+            )
+        
+        signed = presign_service.sign(pyramid['dzi_url'])
+        
+        return {
+            'detection_id': detection_id,
+            'image': image,
+            'status': 'ready',
+            **{key: value for key, value in pyramid.items() if key not in ('prefix', 'dzi_url')},
+            'dzi_presigned_url': signed[0] if signed else None
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to get tile pyramid: {str(e)}"
+        )
+
+@router.post("/damage-detections/{detection_id}/tiles/{image}/urls")
+async def get_tile_urls(
+    detection_id: str,
+    image: str,
+    tile_request: TileUrlsRequest,
+    user_id: str = Depends(SupabaseAuthMiddleware)
+):
+    """
+    Get presigned URLs for the visible tiles of one pyramid level in a single call
+    """
+    column = _image_column(image)
+    if len(tile_request.tiles) > settings.TILE_URL_BATCH_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.TILE_URL_BATCH_LIMIT} tiles per request"
+        )
+    
+    try:
+        detection = await run_in_threadpool(damage_repository.get_detection, detection_id, ['id', 'tile_pyramids'])
         
+        pyramid = ((detection or {}).get('tile_pyramids') or {}).get(column)
+        if not pyramid:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Tile pyramid not built yet"
+            )
+        
+        if not 0 <= tile_request.level <= pyramid['max_level']:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Level must be between 0 and {pyramid['max_level']}"
+            )
+        
+        tile_urls = tiling_service.tile_urls(
+            pyramid, tile_request.level, [tuple(tile[:2]) for tile in tile_request.tiles if len(tile) >= 2]
+        )
+        signed = presign_service.sign_many(tile_urls.values())
+        
+        tiles = {name: signed[url][0] for name, url in tile_urls.items() if url in signed}
+        expiries = [signed[url][1] for url in tile_urls.values() if url in signed]
+        
+        return {
+            'detection_id': detection_id,
+            'image': image,
+            'level': tile_request.level,
+            'tiles': tiles,
+            'expires_at': min(expiries) if expiries else None
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to get tile URLs: {str(e)}"
+        )
+
+@router.post("/submit-label", response_model=LabelSubmissionResponse)
+async def submit_damage_label(
+    label_request: LabelSubmissionRequest,
+    user_id: str = Depends(SupabaseAuthMiddleware)
+):
+    """
+    Submit human label for damage detection (frontend integration)
+    """
+    try:
         # Create label record
-        import uuid
         label_id = str(uuid.uuid4())
         
         label_data = {
@@ -247,21 +372,13 @@ async def submit_damage_label(
             'labeling_time_seconds': None  # Could be calculated on frontend
         }
         
-        # Insert label
-        response = supabase.from('damage_labels').insert([label_data]).execute()
-        
-        if not response.data:
+        # Insert label and mark the detection reviewed in one transaction
+        if not await run_in_threadpool(damage_repository.submit_label, label_data):
             raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to save label"
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Damage detection not found"
             )
         
-        # Update detection status
-        supabase.from('damage_detections').update({
-            'status': 'reviewed',
-            'needs_human_review': False
-        }).eq('id', label_request.detection_id).execute()
-        
         return LabelSubmissionResponse(
             label_id=label_id,
             detection_id=label_request.detection_id,
@@ -269,6 +386,8 @@ async def submit_damage_label(
             message="Label submitted successfully"
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -278,31 +397,18 @@ async def submit_damage_label(
 @router.get("/pending-reviews")
 async def get_pending_reviews(
     limit: int = Query(10, le=50),
+    rendition: str = Query("preview"),
     user_id: str = Depends(SupabaseAuthMiddleware)
 ):
     """
     Get detections that need human review (for active learning)
     """
+    _validate_rendition(rendition)
     try:
-        response = supabase.from('damage_detections').select('*').eq('needs_human_review', True).order('uncertainty_score', desc=True).limit(limit).execute()
-        
-        detections = response.data or []
-        
-        # Generate presigned URLs for images
-        for detection in detections:
-            detection['presigned_urls'] = {}
-            
-            for key, url in [
-                ('before_image', detection.get('before_image_path')),
-                ('after_image', detection.get('after_image_path')),
-                ('ssim_heatmap', detection.get('ssim_heatmap_path')),
-                ('lpips_heatmap', detection.get('lpips_heatmap_path')),
-                ('damage_overlay', detection.get('damage_overlay_path'))
-            ]:
-                if url:
-                    presigned_url = s3_service.generate_presigned_url(url, expiration=3600)
-                    if presigned_url:
-                        detection['presigned_urls'][key] = presigned_url
+        detections = await run_in_threadpool(damage_repository.pending_reviews, limit)
+        
+        # Presign every image on the page in one batch
+        presign_service.sign_detections(detections, rendition=rendition)
         
         return {
             'pending_reviews': detections,
@@ -324,14 +430,12 @@ async def get_model_metrics(
     """
     try:
         # Get latest metrics for active model
-        response = supabase.from('damage_metrics').select('*').order('evaluation_date', desc=True).limit(20).execute()
-        
-        metrics = response.data or []
+        metrics = await run_in_threadpool(damage_repository.list_metrics, None, 20)
         
         # Group metrics by model and date
         metrics_by_date = {}
         for metric in metrics:
-            date = metric['evaluation_date'][:10]  # Get date part
+            date = metric['evaluation_date'].date().isoformat()  # Get date part
             if date not in metrics_by_date:
                 metrics_by_date[date] = {}
             metrics_by_date[date][metric['metric_type']] = metric['metric_value']
@@ -363,16 +467,14 @@ async def get_training_status(
     """
     try:
         # Get latest training job
-        response = supabase.from('damage_training_jobs').select('*').order('created_at', desc=True).limit(1).execute()
+        job = await run_in_threadpool(damage_repository.latest_training_job)
         
-        if not response.data:
+        if not job:
             return {
                 'status': 'no_training_jobs',
                 'message': 'No training jobs found'
             }
         
-        job = response.data[0]
-        
         return {
             'job_id': job['id'],
             'status': job['status'],
@@ -398,22 +500,7 @@ async def trigger_manual_training(
     Manually trigger model training (admin function)
     """
     try:
-        # Check if there's already a running training job
-        running_jobs = supabase.from('damage_training_jobs').select('id').in_('status', ['pending', 'running']).execute()
-        
-        if running_jobs.data:
-            return {
-                'success': False,
-                'message': 'Training job already in progress',
-                'job_id': running_jobs.data[0]['id']
-            }
-        
-        # Create new training job
-        import uuid
-        job_id = str(uuid.uuid4())
-        
         job_data = {
-            'id': job_id,
             'job_type': 'manual_training',
             'status': 'pending',
             'training_config': {
@@ -422,16 +509,21 @@ async def trigger_manual_training(
             }
         }
         
-        response = supabase.from('damage_training_jobs').insert([job_data]).execute()
+        # Create a new training job unless one is already pending or running
+        created, job_id = await run_in_threadpool(damage_repository.create_training_job_unless_running, job_data)
         
-        if response.data:
+        if not created:
             return {
-                'success': True,
-                'message': 'Training job created successfully',
+                'success': False,
+                'message': 'Training job already in progress',
                 'job_id': job_id
             }
-        else:
-            raise Exception("Failed to create training job")
+        
+        return {
+            'success': True,
+            'message': 'Training job created successfully',
+            'job_id': job_id
+        }
         
     except Exception as e:
         raise HTTPException(
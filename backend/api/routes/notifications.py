@@ -2,13 +2,16 @@
 Notification routes for WhatsApp and email alerts
 """
 
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, BackgroundTasks
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
 
-from core.database import get_db, User, Notification, get_current_user, get_current_owner
+from core.database import get_db, User, Notification
+from core.middleware import get_current_user, get_current_owner
+from core.pagination import PageParams, paginate, page_response
 from services.notification_service import NotificationService
 
 router = APIRouter()
@@ -125,30 +128,30 @@ async def get_notification_templates():
     
     return templates
 
+# Fields of /my-notifications items (selectable with ?fields=)
+NOTIFICATION_FIELDS = {
+    "id": lambda notification: str(notification.id),
+    "user_id": lambda notification: str(notification.user_id),
+    "type": lambda notification: notification.type,
+    "title": lambda notification: notification.title,
+    "message": lambda notification: notification.message,
+    "status": lambda notification: notification.status,
+    "sent_at": lambda notification: notification.sent_at,
+    "created_at": lambda notification: notification.created_at
+}
+
 @router.get("/my-notifications")
 async def get_my_notifications(
+    page: PageParams = Depends(),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get notifications for current user"""
-    
-    notifications = db.query(Notification).filter(
-        Notification.user_id == current_user.id
-    ).order_by(Notification.created_at.desc()).all()
-    
-    return [
-        NotificationResponse(
-            id=str(notification.id),
-            user_id=str(notification.user_id),
-            type=notification.type,
-            title=notification.title,
-            message=notification.message,
-            status=notification.status,
-            sent_at=notification.sent_at,
-            created_at=notification.created_at
-        )
-        for notification in notifications
-    ]
+    """Get notifications for current user, newest first, one page at a time"""
+    
+    query = select(Notification).where(Notification.user_id == current_user.id)
+    notifications = db.scalars(paginate(query, Notification, page, NOTIFICATION_FIELDS)).all()
+    
+    return page_response(notifications, page, NOTIFICATION_FIELDS)
 
 @router.post("/bulk")
 async def send_bulk_notifications(
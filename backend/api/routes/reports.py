@@ -3,6 +3,9 @@ Reports and analytics routes
 """
 
 from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
@@ -10,8 +13,10 @@ from datetime import datetime, timedelta
 import pandas as pd
 import io
 
-from core.database import get_db, User, Contract, Fine, Car, Organization, get_current_owner
+from core.database import get_db, get_async_db, User, Organization, OrganizationStats, UTCDateTime
+from core.middleware import get_current_owner
 from services.report_service import ReportService
+from services.dashboard_service import dashboard_service
 
 router = APIRouter()
 
@@ -34,16 +39,19 @@ class ReportRequest(BaseModel):
 @router.get("/dashboard")
 async def get_dashboard_stats(
     current_user: User = Depends(get_current_owner),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get dashboard statistics"""
     
-    # Get organization
-    organization = db.query(Organization).filter(
-        Organization.owner_id == current_user.id
-    ).first()
+    # Organization and its dashboard counters in one round trip (stats are keyed by organization_id)
+    row = (await db.execute(
+        select(Organization.id, OrganizationStats)
+        .outerjoin(OrganizationStats, OrganizationStats.organization_id == Organization.id)
+        .where(Organization.owner_id == current_user.id)
+        .limit(1)
+    )).first()
     
-    if not organization:
+    if not row:
         return DashboardStats(
             total_contracts=0,
             active_contracts=0,
@@ -54,75 +62,39 @@ async def get_dashboard_stats(
             cars_rented=0
         )
     
-    # Get contracts
-    contracts = db.query(Contract).filter(
-        Contract.organization_id == organization.id
-    ).all()
-    
-    active_contracts = [c for c in contracts if c.status == "active"]
-    total_revenue = sum(float(c.monthly_rent) for c in contracts)
-    
-    # Get fines
-    contract_ids = [str(c.id) for c in contracts]
-    fines = db.query(Fine).filter(Fine.contract_id.in_(contract_ids)).all()
-    
-    pending_fines = [f for f in fines if f.status == "pending"]
-    total_fines_amount = sum(float(f.amount) for f in fines)
-    
-    # Get cars
-    cars = db.query(Car).filter(Car.organization_id == organization.id).all()
-    cars_available = [c for c in cars if c.status == "available"]
-    cars_rented = [c for c in cars if c.status == "rented"]
+    organization_id, stats = row
+    if stats is None:
+        # No counters yet (nothing written since the last reconciliation); aggregate once
+        return DashboardStats(**await dashboard_service.dashboard_stats(db, organization_id))
     
     return DashboardStats(
-        total_contracts=len(contracts),
-        active_contracts=len(active_contracts),
-        total_revenue=total_revenue,
-        pending_fines=len(pending_fines),
-        total_fines_amount=total_fines_amount,
-        cars_available=len(cars_available),
-        cars_rented=len(cars_rented)
+        total_contracts=stats.contracts_total,
+        active_contracts=stats.contracts_active,
+        total_revenue=float(stats.revenue_total),
+        pending_fines=stats.fines_pending,
+        total_fines_amount=float(stats.fines_total_amount),
+        cars_available=stats.cars_available,
+        cars_rented=stats.cars_rented
     )
 
 @router.get("/financial/summary")
 async def get_financial_summary(
-    start_date: Optional[datetime] = None,
-    end_date: Optional[datetime] = None,
+    start_date: Optional[UTCDateTime] = None,
+    end_date: Optional[UTCDateTime] = None,
     current_user: User = Depends(get_current_owner),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get financial summary report"""
     
     # Get organization
-    organization = db.query(Organization).filter(
+    organization = await db.scalar(select(Organization).where(
         Organization.owner_id == current_user.id
-    ).first()
+    ).limit(1))
     
     if not organization:
         return {"error": "Organization not found"}
     
-    # Get contracts
-    contracts_query = db.query(Contract).filter(
-        Contract.organization_id == organization.id
-    )
-    
-    if start_date:
-        contracts_query = contracts_query.filter(Contract.start_date >= start_date)
-    if end_date:
-        contracts_query = contracts_query.filter(Contract.end_date <= end_date)
-    
-    contracts = contracts_query.all()
-    
-    # Calculate financial metrics
-    total_revenue = sum(float(c.monthly_rent) for c in contracts)
-    total_deposits = sum(float(c.deposit_amount) for c in contracts)
-    
-    # Get fines
-    contract_ids = [str(c.id) for c in contracts]
-    fines = db.query(Fine).filter(Fine.contract_id.in_(contract_ids)).all()
-    
-    total_fines = sum(float(f.amount) for f in fines)
-    net_revenue = total_revenue - total_fines
+    totals = await dashboard_service.financial_summary(db, organization.id, start_date, end_date)
     
     return {
         "period": {
@@ -130,19 +102,19 @@ async def get_financial_summary(
             "end_date": end_date.isoformat() if end_date else None
         },
         "revenue": {
-            "total_revenue": total_revenue,
-            "total_deposits": total_deposits,
-            "net_revenue": net_revenue
+            "total_revenue": totals['total_revenue'],
+            "total_deposits": totals['total_deposits'],
+            "net_revenue": totals['total_revenue'] - totals['total_fines']
         },
         "fines": {
-            "total_fines": total_fines,
-            "fines_count": len(fines),
-            "pending_fines": len([f for f in fines if f.status == "pending"])
+            "total_fines": totals['total_fines'],
+            "fines_count": totals['fines_count'],
+            "pending_fines": totals['pending_fines']
         },
         "contracts": {
-            "total_contracts": len(contracts),
-            "active_contracts": len([c for c in contracts if c.status == "active"]),
-            "completed_contracts": len([c for c in contracts if c.status == "expired"])
+            "total_contracts": totals['total_contracts'],
+            "active_contracts": totals['active_contracts'],
+            "completed_contracts": totals['completed_contracts']
         }
     }
 
@@ -156,9 +128,10 @@ async def export_pdf_report(
 ):
     """Export report as PDF"""
     
+    # Rendering is blocking; ReportService uses the sync session inside the threadpool
     report_service = ReportService()
-    pdf_path = report_service.generate_pdf_report(
-        start_date, end_date, report_type, current_user, db
+    pdf_path = await run_in_threadpool(
+        report_service.generate_pdf_report, start_date, end_date, report_type, current_user, db
     )
     
     return {"pdf_path": pdf_path}
@@ -174,8 +147,8 @@ async def export_csv_report(
     """Export report as CSV"""
     
     report_service = ReportService()
-    csv_data = report_service.generate_csv_report(
-        start_date, end_date, report_type, current_user, db
+    csv_data = await run_in_threadpool(
+        report_service.generate_csv_report, start_date, end_date, report_type, current_user, db
     )
     
     # Return CSV as downloadable file
@@ -188,7 +161,7 @@ async def export_csv_report(
 @router.get("/scheduled")
 async def get_scheduled_reports(
     current_user: User = Depends(get_current_owner),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get scheduled reports"""
     
@@ -202,7 +175,7 @@ async def schedule_report(
     frequency: str,  # daily, weekly, monthly
     email: str,
     current_user: User = Depends(get_current_owner),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Schedule automated reports"""
     
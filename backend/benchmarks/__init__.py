@@ -0,0 +1 @@
+# NavEdge Benchmarks Package
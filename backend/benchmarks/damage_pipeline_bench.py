@@ -0,0 +1,166 @@
+"""
+Damage pipeline benchmark
+
+Runs every DamageAIService stage and the full detect_damage on deterministic
+synthetic pairs at 1, 4 and 12 MP, with S3 uploads written to a local temp dir.
+
+Usage (from backend/):
+    python -m benchmarks.damage_pipeline_bench                  # run and check budgets
+    python -m benchmarks.damage_pipeline_bench --resolutions 1mp --iterations 5
+    python -m benchmarks.damage_pipeline_bench --record-budgets # write current p95 * headroom as budgets
+
+Exits with status 1 when any p95 latency exceeds its budget in budgets.json.
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Any
+
+import cv2
+import numpy as np
+
+from benchmarks.synthetic_images import RESOLUTIONS, VARIANTS, make_pairs
+
+BUDGETS_PATH = os.path.join(os.path.dirname(__file__), 'budgets.json')
+
+def stub_s3_uploads(target_dir: str):
+    """Route S3 uploads to the local filesystem so network time never enters the numbers"""
+    from core.config import settings
+    from services.local_object_store import LocalObjectStore
+    from services.s3_storage import s3_service
+
+    # Blob references need the database; plain uploads measure the same transfer cost
+    settings.CONTENT_ADDRESSED_STORAGE = False
+    s3_service.use_backend(LocalObjectStore(target_dir))
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far (ru_maxrss is kB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024, 1)
+
+def measure(fn: Callable[[], Any], iterations: int, warmup: int) -> Dict[str, float]:
+    """Time fn and summarise latency percentiles and throughput"""
+    for _ in range(warmup):
+        fn()
+
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+
+    samples_ms = np.array(samples)
+    return {
+        'iterations': iterations,
+        'p50_ms': round(float(np.percentile(samples_ms, 50)), 2),
+        'p95_ms': round(float(np.percentile(samples_ms, 95)), 2),
+        'p99_ms': round(float(np.percentile(samples_ms, 99)), 2),
+        'mean_ms': round(float(samples_ms.mean()), 2),
+        'throughput_per_s': round(1000.0 / float(samples_ms.mean()), 3),
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+def stage_benchmarks(service, before_bytes: bytes, after_bytes: bytes) -> Dict[str, Callable[[], Any]]:
+    """One callable per pipeline stage, each fed with the previous stages' precomputed outputs"""
+    before_img, after_img = service._resize_images(
+        service._bytes_to_image(before_bytes), service._bytes_to_image(after_bytes)
+    )
+    _, ssim_heatmap = service._compute_ssim(before_img, after_img)
+    _, lpips_heatmap = service._compute_lpips(before_img, after_img)
+    yolo_results = service._yolo_damage_detection(before_img, after_img)
+    overlays = service._generate_overlays(before_img, after_img, ssim_heatmap, lpips_heatmap, yolo_results)
+
+    return {
+        'decode': lambda: (service._bytes_to_image(before_bytes), service._bytes_to_image(after_bytes)),
+        'ssim': lambda: service._compute_ssim(before_img, after_img),
+        'lpips': lambda: service._compute_lpips(before_img, after_img),
+        'yolo': lambda: service._yolo_damage_detection(before_img, after_img),
+        'overlay': lambda: service._generate_overlays(
+            before_img, after_img, ssim_heatmap, lpips_heatmap, yolo_results
+        ),
+        'encode': lambda: [cv2.imencode('.jpg', image) for image in overlays.values()],
+        'detect_damage': lambda: service.detect_damage(before_bytes, after_bytes)
+    }
+
+def run(resolutions: List[str], iterations: int, warmup: int, variant: str) -> Dict[str, Dict[str, Any]]:
+    from services.damage_ai_service import damage_ai_service
+
+    results = {}
+    for resolution in resolutions:
+        before_bytes, after_bytes = make_pairs(resolution)[variant]
+        benchmarks = stage_benchmarks(damage_ai_service, before_bytes, after_bytes)
+
+        results[resolution] = {}
+        for name, fn in benchmarks.items():
+            results[resolution][name] = measure(fn, iterations, warmup)
+            print(f"{resolution:>5} {name:<14} " + " ".join(
+                f"{key}={value}" for key, value in results[resolution][name].items() if key != 'iterations'
+            ))
+
+    return results
+
+def check_budgets(results: Dict[str, Dict[str, Any]], budgets: Dict[str, Any]) -> List[str]:
+    """Return one message per p95 latency that exceeds its budget"""
+    failures = []
+    for resolution, stages in results.items():
+        for stage, summary in stages.items():
+            budget = budgets.get(resolution, {}).get(stage, {}).get('p95_ms')
+            if budget is not None and summary['p95_ms'] > budget:
+                failures.append(f"{resolution}/{stage}: p95 {summary['p95_ms']} ms > budget {budget} ms")
+    return failures
+
+def record_budgets(results: Dict[str, Dict[str, Any]], headroom: float) -> Dict[str, Any]:
+    return {
+        resolution: {
+            stage: {'p95_ms': round(summary['p95_ms'] * headroom, 1)}
+            for stage, summary in stages.items()
+        }
+        for resolution, stages in results.items()
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Damage AI pipeline benchmark")
+    parser.add_argument('--resolutions', nargs='+', default=list(RESOLUTIONS), choices=list(RESOLUTIONS))
+    parser.add_argument('--variant', default='combined', choices=VARIANTS)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--budgets', default=BUDGETS_PATH)
+    parser.add_argument('--record-budgets', action='store_true', help="Write measured p95 * headroom as the new budgets")
+    parser.add_argument('--headroom', type=float, default=1.25)
+    parser.add_argument('--output', help="Write full results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="navedge-bench-") as upload_dir:
+        stub_s3_uploads(upload_dir)
+        results = run(args.resolutions, args.iterations, args.warmup, args.variant)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.record_budgets:
+        with open(args.budgets, 'w') as f:
+            json.dump(record_budgets(results, args.headroom), f, indent=2)
+            f.write('\n')
+        print(f"Budgets written to {args.budgets}")
+        return
+
+    with open(args.budgets) as f:
+        budgets = json.load(f)
+
+    failures = check_budgets(results, budgets)
+    if failures:
+        print("Latency budget regressions:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+
+    print("All stages within latency budget")
+
+if __name__ == '__main__':
+    main()
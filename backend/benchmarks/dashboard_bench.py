@@ -0,0 +1,216 @@
+"""
+Owner dashboard benchmark
+
+Seeds one organisation with --contracts contracts (plus cars, renters and fines) and times
+the dashboard and financial summary two ways:
+  python - load every contract, fine and car and aggregate in Python (the old route code)
+  sql    - DashboardService aggregate queries, one row per request
+
+Both must produce the same totals. Needs a reachable PostgreSQL at DATABASE_URL with the
+schema created (the app's startup does this). The seeded rows are removed afterwards
+unless --keep is given.
+
+Usage (from backend/):
+    python -m benchmarks.dashboard_bench
+    python -m benchmarks.dashboard_bench --contracts 100000 --iterations 50 --max-p95-ms 50
+
+Exits with status 1 when the SQL totals differ from the Python ones or the SQL p95 exceeds
+--max-p95-ms.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Any, Callable, Awaitable
+
+import numpy as np
+from sqlalchemy import delete, insert, select, text
+
+from core.database import SessionLocal, AsyncSessionLocal, async_engine, User, Organization, OrganizationStats, Car, Contract, Fine
+from services.dashboard_service import dashboard_service
+
+INSERT_BATCH_SIZE = 5000
+
+def seed(contracts: int, seed_value: int) -> uuid.UUID:
+    """Insert one organisation with its cars, renters, contracts and fines; returns its id"""
+    rng = random.Random(seed_value)
+    tag = uuid.uuid4().hex[:8]
+    owner_id, organization_id = uuid.uuid4(), uuid.uuid4()
+    renters = [uuid.uuid4() for _ in range(max(contracts // 100, 1))]
+    cars = [uuid.uuid4() for _ in range(max(contracts // 50, 1))]
+    start = datetime(2024, 1, 1)
+
+    db = SessionLocal()
+    try:
+        db.execute(insert(User), [{'id': owner_id, 'email': f"bench-owner-{tag}@example.com", 'name': "Bench owner", 'role': "owner"}])
+        db.execute(insert(Organization), [{'id': organization_id, 'name': f"Bench {tag}", 'email': f"bench-{tag}@example.com", 'owner_id': owner_id}])
+        db.execute(insert(User), [
+            {'id': renter_id, 'email': f"bench-renter-{tag}-{i}@example.com", 'name': f"Renter {i}", 'role': "renter"}
+            for i, renter_id in enumerate(renters)
+        ])
+        db.execute(insert(Car), [
+            {'id': car_id, 'make': "Toyota", 'model': "Camry", 'year': 2023, 'license_plate': f"B{tag}{i}",
+             'status': rng.choice(["available", "rented", "maintenance"]), 'organization_id': organization_id}
+            for i, car_id in enumerate(cars)
+        ])
+
+        for batch_start in range(0, contracts, INSERT_BATCH_SIZE):
+            contract_rows, fine_rows = [], []
+            for _ in range(batch_start, min(batch_start + INSERT_BATCH_SIZE, contracts)):
+                contract_id = uuid.uuid4()
+                begins = start + timedelta(days=rng.randrange(730))
+                contract_rows.append({
+                    'id': contract_id, 'renter_id': rng.choice(renters), 'car_id': rng.choice(cars),
+                    'organization_id': organization_id, 'start_date': begins, 'end_date': begins + timedelta(days=30),
+                    'deposit_amount': Decimal(rng.randrange(1000, 5000)), 'monthly_rent': Decimal(rng.randrange(2000, 9000)),
+                    'status': rng.choice(["active", "expired", "terminated"])
+                })
+                for _ in range(rng.choice([0, 0, 1, 2])):
+                    fine_rows.append({
+                        'contract_id': contract_id, 'violation': "Speeding", 'amount': Decimal(rng.randrange(100, 3000)),
+                        'date': begins, 'status': rng.choice(["pending", "paid", "deducted"]), 'source': "manual"
+                    })
+            db.execute(insert(Contract), contract_rows)
+            if fine_rows:
+                db.execute(insert(Fine), fine_rows)
+
+        db.commit()
+        db.execute(text("ANALYZE users, organizations, cars, contracts, fines"))
+        db.commit()
+        return organization_id
+    finally:
+        db.close()
+
+def cleanup(organization_id: uuid.UUID):
+    db = SessionLocal()
+    try:
+        contract_ids = select(Contract.id).where(Contract.organization_id == organization_id)
+        renter_ids = select(Contract.renter_id).where(Contract.organization_id == organization_id).distinct()
+        owner_id = db.scalar(select(Organization.owner_id).where(Organization.id == organization_id))
+
+        db.execute(delete(Fine).where(Fine.contract_id.in_(contract_ids)).execution_options(organization_stats_bypass=True))
+        renters = db.scalars(renter_ids).all()
+        db.execute(delete(Contract).where(Contract.organization_id == organization_id).execution_options(organization_stats_bypass=True))
+        db.execute(delete(Car).where(Car.organization_id == organization_id).execution_options(organization_stats_bypass=True))
+        db.execute(delete(OrganizationStats).where(OrganizationStats.organization_id == organization_id))
+        db.execute(delete(Organization).where(Organization.id == organization_id))
+        db.execute(delete(User).where(User.id.in_([*renters, owner_id])))
+        db.commit()
+    finally:
+        db.close()
+
+async def python_dashboard(db, organization_id: uuid.UUID) -> Dict[str, Any]:
+    """The route's former implementation, kept here as the baseline"""
+    contracts = (await db.scalars(select(Contract).where(Contract.organization_id == organization_id))).all()
+    fines = (await db.scalars(select(Fine).where(Fine.contract_id.in_([c.id for c in contracts])))).all()
+    cars = (await db.scalars(select(Car).where(Car.organization_id == organization_id))).all()
+    return {
+        'total_contracts': len(contracts),
+        'active_contracts': len([c for c in contracts if c.status == "active"]),
+        'total_revenue': sum(float(c.monthly_rent) for c in contracts),
+        'pending_fines': len([f for f in fines if f.status == "pending"]),
+        'total_fines_amount': sum(float(f.amount) for f in fines),
+        'cars_available': len([c for c in cars if c.status == "available"]),
+        'cars_rented': len([c for c in cars if c.status == "rented"])
+    }
+
+async def python_financial_summary(db, organization_id: uuid.UUID) -> Dict[str, Any]:
+    contracts = (await db.scalars(select(Contract).where(Contract.organization_id == organization_id))).all()
+    fines = (await db.scalars(select(Fine).where(Fine.contract_id.in_([c.id for c in contracts])))).all()
+    return {
+        'total_contracts': len(contracts),
+        'active_contracts': len([c for c in contracts if c.status == "active"]),
+        'completed_contracts': len([c for c in contracts if c.status == "expired"]),
+        'total_revenue': sum(float(c.monthly_rent) for c in contracts),
+        'total_deposits': sum(float(c.deposit_amount) for c in contracts),
+        'fines_count': len(fines),
+        'pending_fines': len([f for f in fines if f.status == "pending"]),
+        'total_fines': sum(float(f.amount) for f in fines)
+    }
+
+async def measure(fn: Callable[..., Awaitable[Dict[str, Any]]], organization_id: uuid.UUID,
+                  iterations: int) -> Dict[str, Any]:
+    samples = []
+    result = None
+    for _ in range(iterations + 1):
+        # A fresh session per call, as per request, so nothing is served from the identity map
+        async with AsyncSessionLocal() as db:
+            start = time.perf_counter()
+            result = await fn(db, organization_id)
+            samples.append((time.perf_counter() - start) * 1000)
+
+    samples_ms = np.array(samples[1:])  # first call warms the pool
+    return {
+        'result': result,
+        'p50_ms': round(float(np.percentile(samples_ms, 50)), 2),
+        'p95_ms': round(float(np.percentile(samples_ms, 95)), 2)
+    }
+
+def same_totals(expected: Dict[str, Any], actual: Dict[str, Any]) -> bool:
+    return all(abs(float(expected[key]) - float(actual[key])) < 0.005 for key in expected)
+
+async def run(organization_id: uuid.UUID, iterations: int, python_iterations: int) -> Dict[str, Dict[str, Any]]:
+    cases = {
+        'dashboard': (python_dashboard, dashboard_service.dashboard_stats),
+        'financial_summary': (python_financial_summary, dashboard_service.financial_summary)
+    }
+    results = {}
+    for name, (python_fn, sql_fn) in cases.items():
+        python = await measure(python_fn, organization_id, python_iterations)
+        sql = await measure(sql_fn, organization_id, iterations)
+        results[name] = {
+            'python': {key: value for key, value in python.items() if key != 'result'},
+            'sql': {key: value for key, value in sql.items() if key != 'result'},
+            'match': same_totals(python['result'], sql['result']),
+            'speedup': round(python['p50_ms'] / max(sql['p50_ms'], 1e-9), 1)
+        }
+        print(f"{name:>17} python_p50_ms={python['p50_ms']} sql_p50_ms={sql['p50_ms']} "
+              f"sql_p95_ms={sql['p95_ms']} speedup={results[name]['speedup']}x match={results[name]['match']}")
+
+    await async_engine.dispose()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Python-side vs SQL-side dashboard aggregation")
+    parser.add_argument('--contracts', type=int, default=100000)
+    parser.add_argument('--iterations', type=int, default=50, help="Timed calls of the SQL version")
+    parser.add_argument('--python-iterations', type=int, default=5, help="Timed calls of the Python version")
+    parser.add_argument('--max-p95-ms', type=float, default=50.0, help="Fail when the SQL p95 exceeds this")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--keep', action='store_true', help="Leave the seeded organisation in place")
+    parser.add_argument('--output', help="Write full results as JSON")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    organization_id = seed(args.contracts, args.seed)
+    print(f"seeded contracts={args.contracts} organization_id={organization_id} in {time.perf_counter() - start:.1f}s")
+
+    try:
+        results = asyncio.run(run(organization_id, args.iterations, args.python_iterations))
+    finally:
+        if not args.keep:
+            cleanup(organization_id)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'contracts': args.contracts, **results}, f, indent=2)
+
+    failures = [f"{name}: SQL totals differ from Python totals" for name, r in results.items() if not r['match']]
+    failures += [
+        f"{name}: SQL p95 {r['sql']['p95_ms']} ms > {args.max_p95_ms} ms"
+        for name, r in results.items() if r['sql']['p95_ms'] > args.max_p95_ms
+    ]
+    if failures:
+        print("Dashboard regressions:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Database concurrency benchmark
+
+Serves the same contracts lookup two ways from one ASGI app and drives both with
+concurrent requests:
+  sync  - async def handler querying through the sync SessionLocal (the old route pattern,
+          every query blocks the event loop)
+  async - async def handler querying through an AsyncSession from get_async_db
+
+Needs a reachable PostgreSQL at DATABASE_URL with the schema created (the app's startup
+does this). --latency-ms adds pg_sleep to each request to model a remote database.
+
+Usage (from backend/):
+    python -m benchmarks.db_concurrency_bench
+    python -m benchmarks.db_concurrency_bench --requests 2000 --concurrency 100 --latency-ms 5
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from typing import Dict, Any, List
+
+import httpx
+import numpy as np
+from fastapi import Depends, FastAPI
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.database import SessionLocal, async_engine, get_async_db, Contract
+
+def build_app(latency_s: float) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/sync/{renter_id}")
+    async def sync_lookup(renter_id: uuid.UUID):
+        db = SessionLocal()
+        try:
+            if latency_s:
+                db.execute(text("SELECT pg_sleep(:s)"), {'s': latency_s})
+            contracts = db.query(Contract).filter(Contract.renter_id == renter_id).all()
+            return {'count': len(contracts)}
+        finally:
+            db.close()
+
+    @app.get("/async/{renter_id}")
+    async def async_lookup(renter_id: uuid.UUID, db: AsyncSession = Depends(get_async_db)):
+        if latency_s:
+            await db.execute(text("SELECT pg_sleep(:s)"), {'s': latency_s})
+        contracts = (await db.scalars(select(Contract).where(Contract.renter_id == renter_id))).all()
+        return {'count': len(contracts)}
+
+    return app
+
+async def drive(app: FastAPI, path: str, requests: int, concurrency: int) -> Dict[str, Any]:
+    """Send requests with at most concurrency in flight; summarise latency and throughput"""
+    semaphore = asyncio.Semaphore(concurrency)
+    samples: List[float] = []
+    errors = 0
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def one():
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(f"{path}/{uuid.uuid4()}")
+                samples.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 200:
+                    errors += 1
+
+        # Warm the pools so connection setup is not measured
+        await asyncio.gather(*(one() for _ in range(concurrency)))
+        samples.clear()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - start
+
+    samples_ms = np.array(samples)
+    return {
+        'requests': requests,
+        'errors': errors,
+        'throughput_per_s': round(requests / elapsed, 1),
+        'p50_ms': round(float(np.percentile(samples_ms, 50)), 2),
+        'p95_ms': round(float(np.percentile(samples_ms, 95)), 2),
+        'p99_ms': round(float(np.percentile(samples_ms, 99)), 2)
+    }
+
+async def run(requests: int, concurrency: int, latency_ms: float) -> Dict[str, Dict[str, Any]]:
+    app = build_app(latency_ms / 1000)
+    results = {}
+    for mode in ('sync', 'async'):
+        results[mode] = await drive(app, f"/{mode}", requests, concurrency)
+        print(f"{mode:>5} " + " ".join(f"{key}={value}" for key, value in results[mode].items()))
+
+    await async_engine.dispose()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync vs async session throughput under concurrent requests")
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--latency-ms', type=float, default=2.0, help="Server-side pg_sleep per request")
+    parser.add_argument('--output', help="Write full results as JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.requests, args.concurrency, args.latency_ms))
+    speedup = results['async']['throughput_per_s'] / max(results['sync']['throughput_per_s'], 1e-9)
+    print(f"async/sync throughput: {speedup:.2f}x")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({**results, 'speedup': round(speedup, 2)}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
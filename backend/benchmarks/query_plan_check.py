@@ -0,0 +1,348 @@
+"""
+Query plan regression check
+
+Seeds a multi-tenant dataset (organisations, cars, renters, contracts, fines,
+notifications, Emirates ID uploads, damage detections and labels), ANALYZEs it and runs EXPLAIN on each hot
+query of the API. Fails when any plan reads a seeded table with a sequential scan, i.e.
+when a query pattern lost its index, or when a time-bounded query on a partitioned table
+reads partitions outside its range, i.e. when partition pruning stopped working.
+
+Monthly partitions for the seeded range are created first (they stay; they are empty
+once the seeded rows are removed).
+
+Needs a reachable PostgreSQL at DATABASE_URL with the schema created (the app's startup
+does this); use a scratch database. Seeded rows are removed afterwards unless --keep.
+
+Usage (from backend/):
+    python -m benchmarks.query_plan_check
+    python -m benchmarks.query_plan_check --organizations 200 --contracts 100000 --verbose
+
+--force-index turns enable_seqscan off so small seeds still prove an index is usable;
+a sequential scan then means no usable index exists at all.
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Any, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select, text, tuple_
+from sqlalchemy.orm import Session
+
+from core.database import (
+    SessionLocal, User, Organization, OrganizationStats, Car, Contract, Fine, Notification, DocumentUpload,
+    EMIRATES_ID_NUMBER
+)
+from core.damage_ai_models import DamageDetection, DamageLabel, DETECTION_YOLO_DETECTIONS, DETECTION_YOLO_CONFIDENCE
+from core.pagination import PageParams, paginate
+from services.partition_service import partition_service, month_start, PARTITIONED_TABLES
+
+INSERT_BATCH_SIZE = 5000
+
+SEEDED_TABLES = {
+    'users', 'organizations', 'cars', 'contracts', 'fines', 'notifications',
+    'document_uploads', 'damage_detections', 'damage_labels'
+}
+
+# Seeded YOLO classes and their weights; the class filter query asks for the rare one
+YOLO_CLASSES = {'damage': 70, 'scratch': 20, 'dent': 8, 'crack': 2}
+
+# Seeded rows span this many days back from now (and up to 60 days ahead: contracts start
+# up to 30 days ahead and their detections are dated at the contract end)
+HISTORY_DAYS = 730
+
+def ensure_seed_partitions(db: Session):
+    """Monthly partitions for every seeded month, so rows do not pile up in the default partition"""
+    for table in PARTITIONED_TABLES:
+        if not partition_service.is_partitioned(db, table):
+            continue
+        month = month_start(datetime.utcnow() - timedelta(days=HISTORY_DAYS))
+        while month <= datetime.utcnow() + timedelta(days=60):
+            partition_service.create_partition(db, table, month)
+            month = month_start(month, 1)
+    db.commit()
+
+def yolo_output(rng: random.Random) -> Dict[str, Any]:
+    """yolo_detections as DamageAIService stores it"""
+    classes = rng.choices(list(YOLO_CLASSES), weights=list(YOLO_CLASSES.values()), k=rng.randrange(3))
+    detections = [{'class': name, 'confidence': round(rng.uniform(0.25, 1.0), 4)} for name in classes]
+    return {'detections': detections, 'confidence': max((d['confidence'] for d in detections), default=0.0)}
+
+def seed(db: Session, organizations: int, contracts: int, rng: random.Random) -> Dict[str, Any]:
+    """Insert the dataset; returns the ids the queries filter by and everything to clean up"""
+    now = datetime.utcnow()
+    tag = uuid.uuid4().hex[:8]
+    owners = [uuid.uuid4() for _ in range(organizations)]
+    orgs = [uuid.uuid4() for _ in range(organizations)]
+    renters = [uuid.uuid4() for _ in range(max(contracts // 20, 1))]
+    cars = {org: [uuid.uuid4() for _ in range(max(contracts // organizations // 10, 1))] for org in orgs}
+
+    db.execute(insert(User), [
+        {'id': user_id, 'email': f"plan-{tag}-{i}@example.com", 'name': f"User {i}", 'role': role}
+        for i, (user_id, role) in enumerate([(o, "owner") for o in owners] + [(r, "renter") for r in renters])
+    ])
+    db.execute(insert(Organization), [
+        {'id': org, 'name': f"Plan {tag} {i}", 'email': f"plan-org-{tag}-{i}@example.com", 'owner_id': owner}
+        for i, (org, owner) in enumerate(zip(orgs, owners))
+    ])
+    db.execute(insert(Car), [
+        {'id': car, 'make': "Nissan", 'model': "Altima", 'year': 2023, 'license_plate': f"P{tag}{org.hex[:6]}{i}",
+         'status': rng.choice(["available", "available", "rented", "maintenance"]), 'organization_id': org}
+        for org, org_cars in cars.items() for i, car in enumerate(org_cars)
+    ])
+
+    contract_ids = []
+    for batch_start in range(0, contracts, INSERT_BATCH_SIZE):
+        contract_rows, fine_rows, detection_rows = [], [], []
+        for _ in range(batch_start, min(batch_start + INSERT_BATCH_SIZE, contracts)):
+            org = rng.choice(orgs)
+            contract_id = uuid.uuid4()
+            begins = now - timedelta(days=rng.randrange(-30, HISTORY_DAYS))
+            ends = begins + timedelta(days=30)
+            # Contracts still running are active; most of the history has expired
+            status = "active" if ends >= now else rng.choice(["expired", "expired", "terminated"])
+            contract_ids.append(contract_id)
+            contract_rows.append({
+                'id': contract_id, 'renter_id': rng.choice(renters), 'car_id': rng.choice(cars[org]),
+                'organization_id': org, 'start_date': begins, 'end_date': ends, 'status': status,
+                'deposit_amount': Decimal(2000), 'monthly_rent': Decimal(rng.randrange(2000, 9000)),
+                'created_at': begins
+            })
+            for _ in range(rng.choice([0, 0, 1, 2])):
+                fine_rows.append({
+                    'contract_id': contract_id, 'violation': "Speeding", 'amount': Decimal(600), 'date': begins,
+                    'status': "pending" if status == "active" else rng.choice(["paid", "deducted"]),
+                    'source': "manual", 'created_at': begins
+                })
+            if rng.random() < 0.2:
+                review = rng.random() < 0.05
+                detection_rows.append({
+                    'id': uuid.uuid4(), 'contract_id': contract_id, 'car_id': contract_rows[-1]['car_id'],
+                    'before_image_path': "s3://plan/before.jpg", 'after_image_path': "s3://plan/after.jpg",
+                    'needs_human_review': review, 'uncertainty_score': Decimal(str(round(rng.random(), 4))),
+                    'yolo_detections': yolo_output(rng), 'status': "completed", 'created_at': ends
+                })
+        db.execute(insert(Contract), contract_rows)
+        if fine_rows:
+            db.execute(insert(Fine), fine_rows)
+        if detection_rows:
+            db.execute(insert(DamageDetection), detection_rows)
+            db.execute(insert(DamageLabel), [
+                {'detection_id': row['id'], 'user_id': rng.choice(owners), 'is_damage': True}
+                for row in detection_rows if rng.random() < 0.5
+            ])
+
+    db.execute(insert(Notification), [
+        {'user_id': rng.choice(renters), 'type': "in_app", 'title': "Reminder", 'message': "Contract ending",
+         'status': "sent", 'created_at': now - timedelta(minutes=rng.randrange(525600))}
+        for _ in range(contracts)
+    ])
+    emirates_ids = [f"784{rng.randrange(10 ** 12):012d}" for _ in renters]
+    db.execute(insert(DocumentUpload), [
+        {'user_id': renter, 'document_type': "emirates_id", 'file_path': "s3://plan/id.jpg",
+         'extracted_text': {'success': True, 'raw_text': "", 'parsed_data': {'emirates_id': emirates_id}}}
+        for renter, emirates_id in zip(renters, emirates_ids)
+    ])
+
+    db.commit()
+    db.execute(text(f"ANALYZE {', '.join(sorted(SEEDED_TABLES))}"))
+    db.commit()
+
+    return {
+        'owners': owners, 'organizations': orgs, 'renters': renters, 'contracts': contract_ids,
+        'owner_id': owners[0], 'organization_id': orgs[0], 'renter_id': renters[0],
+        'contract_id': contract_ids[0], 'emirates_id': emirates_ids[0], 'detection_id': db.scalar(
+            select(DamageDetection.id).where(DamageDetection.contract_id.in_(contract_ids[:INSERT_BATCH_SIZE])).limit(1)
+        )
+    }
+
+def cleanup(db: Session, seeded: Dict[str, Any]):
+    contract_ids = select(Contract.id).where(Contract.organization_id.in_(seeded['organizations']))
+    detection_ids = select(DamageDetection.id).where(DamageDetection.contract_id.in_(contract_ids))
+    users = seeded['owners'] + seeded['renters']
+
+    db.execute(delete(DamageLabel).where(DamageLabel.detection_id.in_(detection_ids)))
+    db.execute(delete(DamageDetection).where(DamageDetection.contract_id.in_(contract_ids)))
+    db.execute(delete(Fine).where(Fine.contract_id.in_(contract_ids)).execution_options(organization_stats_bypass=True))
+    db.execute(delete(Contract).where(Contract.organization_id.in_(seeded['organizations'])).execution_options(organization_stats_bypass=True))
+    db.execute(delete(Car).where(Car.organization_id.in_(seeded['organizations'])).execution_options(organization_stats_bypass=True))
+    db.execute(delete(Notification).where(Notification.user_id.in_(users)))
+    db.execute(delete(DocumentUpload).where(DocumentUpload.user_id.in_(users)))
+    db.execute(delete(OrganizationStats).where(OrganizationStats.organization_id.in_(seeded['organizations'])))
+    db.execute(delete(Organization).where(Organization.id.in_(seeded['organizations'])))
+    db.execute(delete(User).where(User.id.in_(users)))
+    db.commit()
+
+def hot_queries(seeded: Dict[str, Any]) -> Dict[str, Any]:
+    """The API's query patterns, bound to seeded ids"""
+    page = PageParams(cursor=None, limit=50, fields=None)
+    return {
+        'organization_by_owner': select(Organization).where(Organization.owner_id == seeded['owner_id']).limit(1),
+        'contracts_by_organization': paginate(
+            select(Contract).where(Contract.organization_id == seeded['organization_id']), Contract, page
+        ),
+        'contracts_by_renter_status': select(Contract).where(
+            Contract.renter_id == seeded['renter_id'], Contract.status == "active"
+        ),
+        'contracts_expiring': select(Contract).where(
+            Contract.status == "active", Contract.end_date <= datetime.utcnow() + timedelta(days=7)
+        ),
+        'fines_by_contract_status': select(Fine).where(
+            Fine.contract_id == seeded['contract_id'], Fine.status == "pending"
+        ),
+        'fines_by_renter': paginate(
+            select(Fine).join(Contract, Fine.contract_id == Contract.id).where(
+                Contract.renter_id == seeded['renter_id']
+            ), Fine, page
+        ),
+        'cars_by_organization_status': select(Car).where(
+            Car.organization_id == seeded['organization_id'], Car.status == "available"
+        ),
+        'notifications_by_user': paginate(
+            select(Notification).where(Notification.user_id == seeded['renter_id']), Notification, page
+        ),
+        'detections_review_queue': select(DamageDetection).where(
+            DamageDetection.needs_human_review.is_(True)
+        ).order_by(DamageDetection.uncertainty_score.desc()).limit(50),
+        'labels_by_detection': select(DamageLabel).where(DamageLabel.detection_id == seeded['detection_id']),
+        'detections_by_yolo_class': select(DamageDetection.id).where(
+            DETECTION_YOLO_DETECTIONS.contains([{'class': "crack"}])
+        ),
+        'detections_by_yolo_confidence': select(DamageDetection.id).where(DETECTION_YOLO_CONFIDENCE >= 0.99),
+        'documents_by_emirates_id': select(DocumentUpload).where(EMIRATES_ID_NUMBER == seeded['emirates_id'])
+    }
+
+def pruning_queries() -> Dict[str, Tuple[Any, str, datetime, datetime]]:
+    """
+    Time-bounded queries on partitioned tables with the created_at range they may read
+
+    Returns:
+        name -> (statement, partitioned table, lower bound, upper bound)
+    """
+    now = datetime.utcnow()
+    cursor = (now - timedelta(days=200), uuid.UUID(int=0))
+    window = (month_start(now, -6), month_start(now, -5))
+    return {
+        'detections_page_after_cursor': (
+            select(DamageDetection).where(
+                DamageDetection.created_at <= cursor[0],
+                tuple_(DamageDetection.created_at, DamageDetection.id) < tuple_(*cursor)
+            ).order_by(DamageDetection.created_at.desc(), DamageDetection.id.desc()).limit(50),
+            'damage_detections', datetime.min, cursor[0]
+        ),
+        'rescore_page_after_cursor': (
+            select(DamageDetection.id).where(
+                DamageDetection.created_at >= cursor[0],
+                tuple_(DamageDetection.created_at, DamageDetection.id) > tuple_(*cursor)
+            ).order_by(DamageDetection.created_at, DamageDetection.id).limit(50),
+            'damage_detections', cursor[0], datetime.max
+        ),
+        'detections_of_one_month': (
+            select(func.count()).select_from(DamageDetection).where(
+                DamageDetection.created_at >= window[0], DamageDetection.created_at < window[1]
+            ),
+            'damage_detections', *window
+        ),
+        'labels_since_last_training': (
+            select(func.count()).select_from(DamageLabel).where(DamageLabel.created_at > now - timedelta(days=7)),
+            'damage_labels', now - timedelta(days=7), datetime.max
+        )
+    }
+
+def relations(plan: Dict[str, Any], node_type: Optional[str] = None) -> List[str]:
+    """Relations read anywhere in the plan tree (by nodes of node_type only, if given)"""
+    found = []
+    if 'Relation Name' in plan and node_type in (None, plan.get('Node Type')):
+        found.append(plan['Relation Name'])
+    for child in plan.get('Plans', []):
+        found.extend(relations(child, node_type))
+    return found
+
+def parent_table(relation: str) -> str:
+    """Partitioned table a partition belongs to (the relation itself otherwise)"""
+    return re.sub(r'_(p\d{6}|default)$', '', relation)
+
+def seq_scans(plan: Dict[str, Any]) -> List[str]:
+    """Seeded tables read by a Seq Scan anywhere in the plan tree (partitions count as their table)"""
+    return [parent_table(relation) for relation in relations(plan, 'Seq Scan') if parent_table(relation) in SEEDED_TABLES]
+
+def unpruned(db: Session, plan: Dict[str, Any], table: str, lower: datetime, upper: datetime) -> List[str]:
+    """Monthly partitions of table read by the plan although they lie outside [lower, upper]"""
+    outside = {
+        partition.name for partition in partition_service.partitions(db, table)
+        if partition.upper <= lower or partition.lower > upper
+    }
+    return sorted(set(relations(plan)) & outside)
+
+def explain(db: Session, stmt) -> Dict[str, Any]:
+    connection = db.connection()
+    compiled = stmt.compile(dialect=connection.dialect)
+    # The driver gets the values as SQLAlchemy would send them (e.g. JSONB parameters serialised)
+    params = {}
+    for key, value in compiled.params.items():
+        processor = compiled.binds[key].type.dialect_impl(connection.dialect).bind_processor(connection.dialect)
+        params[key] = processor(value) if processor else value
+    result = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", params).scalar()
+    return (json.loads(result) if isinstance(result, str) else result)[0]['Plan']
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail when a hot query plans a sequential scan")
+    parser.add_argument('--organizations', type=int, default=200)
+    parser.add_argument('--contracts', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--force-index', action='store_true', help="SET enable_seqscan = off while explaining")
+    parser.add_argument('--verbose', action='store_true', help="Print every plan")
+    parser.add_argument('--keep', action='store_true', help="Leave the seeded rows in place")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    ensure_seed_partitions(db)
+    seeded = seed(db, args.organizations, args.contracts, random.Random(args.seed))
+    failures = []
+    try:
+        if args.force_index:
+            db.execute(text("SET enable_seqscan = off"))
+
+        for name, stmt in hot_queries(seeded).items():
+            plan = explain(db, stmt)
+            scans = seq_scans(plan)
+            print(f"{name:>28} top={plan['Node Type']} cost={plan['Total Cost']} "
+                  f"seq_scans={','.join(scans) or '-'}")
+            if args.verbose:
+                print(json.dumps(plan, indent=2))
+            if scans:
+                failures.append(f"{name}: sequential scan on {', '.join(scans)}")
+
+        for name, (stmt, table, lower, upper) in pruning_queries().items():
+            if not partition_service.is_partitioned(db, table):
+                failures.append(f"{name}: {table} is not partitioned")
+                continue
+            plan = explain(db, stmt)
+            extra = unpruned(db, plan, table, lower, upper)
+            read = [relation for relation in relations(plan) if parent_table(relation) == table]
+            print(f"{name:>28} top={plan['Node Type']} cost={plan['Total Cost']} "
+                  f"partitions={len(read)} unpruned={','.join(extra) or '-'}")
+            if args.verbose:
+                print(json.dumps(plan, indent=2))
+            if extra:
+                failures.append(f"{name}: reads partitions outside its range: {', '.join(extra)}")
+
+        db.rollback()
+    finally:
+        if not args.keep:
+            cleanup(db, seeded)
+        db.close()
+
+    if failures:
+        print("Query plan regressions:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Deterministic synthetic before/after image pairs for damage pipeline benchmarks
+"""
+
+import cv2
+import numpy as np
+from typing import Dict, Tuple
+
+# Resolutions used by the benchmark suite (width, height)
+RESOLUTIONS = {
+    '1mp': (1152, 864),
+    '4mp': (2304, 1728),
+    '12mp': (4000, 3000)
+}
+
+# Kinds of after-image changes
+VARIANTS = ['scratches', 'dents', 'lighting', 'combined']
+
+def make_base_image(width: int, height: int, seed: int) -> np.ndarray:
+    """Car-panel-like image: smooth gradient body, a few panel edges and sensor noise"""
+    rng = np.random.default_rng(seed)
+    
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    body_color = rng.uniform(60, 200, 3).astype(np.float32)
+    shading = 0.75 + 0.25 * np.sin(x / width * np.pi) * np.cos(y / height * np.pi / 2)
+    image = shading[..., None] * body_color[None, None, :]
+    
+    # Panel gaps and a window line
+    for _ in range(4):
+        x0 = int(rng.integers(0, width))
+        cv2.line(image, (x0, 0), (x0 + int(rng.integers(-width // 10, width // 10)), height), (20, 20, 20), max(2, width // 800))
+    cv2.line(image, (0, height // 3), (width, height // 3 + int(rng.integers(-height // 20, height // 20))), (30, 30, 30), max(2, width // 600))
+    
+    image += rng.normal(0, 3, image.shape).astype(np.float32)
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+def add_scratches(image: np.ndarray, rng: np.random.Generator, count: int = 6) -> np.ndarray:
+    height, width = image.shape[:2]
+    result = image.copy()
+    for _ in range(count):
+        start = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        length = rng.uniform(0.05, 0.2) * width
+        angle = rng.uniform(0, np.pi)
+        end = (int(start[0] + length * np.cos(angle)), int(start[1] + length * np.sin(angle)))
+        color = tuple(int(c) for c in rng.uniform(180, 255, 3))
+        cv2.line(result, start, end, color, max(1, width // 1500), lineType=cv2.LINE_AA)
+    return result
+
+def add_dents(image: np.ndarray, rng: np.random.Generator, count: int = 3) -> np.ndarray:
+    height, width = image.shape[:2]
+    result = image.astype(np.float32)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    for _ in range(count):
+        cx, cy = rng.uniform(0.1, 0.9) * width, rng.uniform(0.1, 0.9) * height
+        radius = rng.uniform(0.02, 0.06) * width
+        # Dark-to-light falloff across the dent mimics a pressed-in panel under directional light
+        dist = ((x - cx) ** 2 + (y - cy) ** 2) / (2 * radius ** 2)
+        profile = np.exp(-dist) * ((x - cx) / radius).clip(-1, 1)
+        result += 40 * profile[..., None]
+    return np.clip(result, 0, 255).astype(np.uint8)
+
+def shift_lighting(image: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    gain = rng.uniform(0.85, 1.15)
+    gamma = rng.uniform(0.9, 1.1)
+    result = 255.0 * (image.astype(np.float32) / 255.0) ** gamma * gain
+    return np.clip(result, 0, 255).astype(np.uint8)
+
+def make_pair(resolution: str, variant: str, seed: int = 0) -> Tuple[bytes, bytes]:
+    """
+    Build one JPEG-encoded before/after pair
+    
+    Args:
+        resolution: Key of RESOLUTIONS
+        variant: One of VARIANTS
+        seed: Same seed always yields byte-identical output
+        
+    Returns:
+        (before_jpeg_bytes, after_jpeg_bytes)
+    """
+    width, height = RESOLUTIONS[resolution]
+    rng = np.random.default_rng(seed * 1000 + VARIANTS.index(variant))
+    
+    before = make_base_image(width, height, seed)
+    after = before
+    if variant in ('scratches', 'combined'):
+        after = add_scratches(after, rng)
+    if variant in ('dents', 'combined'):
+        after = add_dents(after, rng)
+    if variant in ('lighting', 'combined'):
+        after = shift_lighting(after, rng)
+    
+    encode_params = [cv2.IMWRITE_JPEG_QUALITY, 90]
+    _, before_jpeg = cv2.imencode('.jpg', before, encode_params)
+    _, after_jpeg = cv2.imencode('.jpg', after, encode_params)
+    return before_jpeg.tobytes(), after_jpeg.tobytes()
+
+def make_pairs(resolution: str, seed: int = 0) -> Dict[str, Tuple[bytes, bytes]]:
+    """One pair per variant at the given resolution"""
+    return {variant: make_pair(resolution, variant, seed) for variant in VARIANTS}
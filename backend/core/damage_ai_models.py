@@ -2,8 +2,8 @@
 Damage AI Database Models for v1.1
 """
 
-from sqlalchemy import Column, String, Integer, DateTime, Boolean, Text, JSON, ForeignKey, DECIMAL, LargeBinary
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, Integer, DateTime, Boolean, Text, JSON, ForeignKey, DECIMAL, LargeBinary, UniqueConstraint, Index, text
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import relationship
 import uuid
 from datetime import datetime
@@ -11,7 +11,19 @@ from core.database import Base
 
 class DamageDetection(Base):
     __tablename__ = "damage_detections"
-    
+    __table_args__ = (
+        # Keyset pages of /damage-detections, unfiltered and by contract or car
+        Index("ix_damage_detections_created", "created_at", "id"),
+        Index("ix_damage_detections_contract_created", "contract_id", "created_at", "id"),
+        Index("ix_damage_detections_car_created", "car_id", "created_at", "id"),
+        # Review queue: flagged detections, most uncertain first
+        Index("ix_damage_detections_review_uncertainty", "needs_human_review", "uncertainty_score"),
+        # Monthly partitions (services/partition_service.py); retention drops whole months
+        {'postgresql_partition_by': 'RANGE (created_at)'}
+    )
+    
+    # The partition key is part of the primary key, so other tables cannot declare foreign
+    # keys to detections; they reference id only
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     contract_id = Column(UUID(as_uuid=True), ForeignKey("contracts.id"))
     car_id = Column(UUID(as_uuid=True), ForeignKey("cars.id"))
@@ -30,7 +42,8 @@ class DamageDetection(Base):
     lpips_score = Column(DECIMAL(5, 4), nullable=True)
     
     # YOLOv8 Detection Results
-    yolo_detections = Column(JSON, nullable=True)  # Bounding boxes, classes, confidences
+    # {'detections': [{'class', 'confidence', 'bbox', 'area'}], 'confidence': max over detections}
+    yolo_detections = Column(JSONB, nullable=True)
     segmentation_mask_path = Column(String, nullable=True)  # S3 path to segmentation mask
     
     # Heatmap paths
@@ -41,10 +54,13 @@ class DamageDetection(Base):
     # Overlay images
     damage_overlay_path = Column(String, nullable=True)
     annotated_image_path = Column(String, nullable=True)
+    renditions = Column(JSONB, nullable=True)  # {image column: {thumbnail|preview|full: S3 URL}}
+    tile_pyramids = Column(JSONB, nullable=True)  # {image column: DeepZoom pyramid descriptor}
     
     # Model information
     model_version = Column(String, nullable=True)
     inference_time_ms = Column(Integer, nullable=True)
+    stage_timings = Column(JSONB, nullable=True)  # Per-stage ms, bytes, resolution bucket
     
     # Active learning
     needs_human_review = Column(Boolean, default=False)
@@ -54,19 +70,38 @@ class DamageDetection(Base):
     status = Column(String, default="processing")  # processing, completed, failed, reviewed
     processing_stage = Column(String, nullable=True)  # ssim, lpips, yolo, overlay, completed
     
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, primary_key=True, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     contract = relationship("Contract", back_populates="damage_detections")
     car = relationship("Car", back_populates="damage_detections")
-    labels = relationship("DamageLabel", back_populates="detection")
+    labels = relationship(
+        "DamageLabel", primaryjoin="DamageDetection.id == foreign(DamageLabel.detection_id)", back_populates="detection"
+    )
+
+# /damage-detections filters on the YOLO output. Queries must use these exact expressions for
+# the planner to match the indexes below.
+# Containment (@>) on the detection list, e.g. detections of a class
+DETECTION_YOLO_DETECTIONS = DamageDetection.yolo_detections['detections']
+# Highest YOLO confidence of the detection
+DETECTION_YOLO_CONFIDENCE = DamageDetection.yolo_detections['confidence'].as_float()
+
+Index("ix_damage_detections_yolo_detections", DETECTION_YOLO_DETECTIONS.label('yolo_detections_list'),
+      postgresql_using='gin', postgresql_ops={'yolo_detections_list': 'jsonb_path_ops'})
+Index("ix_damage_detections_yolo_confidence", DETECTION_YOLO_CONFIDENCE)
 
 class DamageLabel(Base):
     __tablename__ = "damage_labels"
+    __table_args__ = (
+        # Labels of a detection (review views, the storage GC's unlabelled check)
+        Index("ix_damage_labels_detection_id", "detection_id"),
+        # Monthly partitions (services/partition_service.py); labels are training data and never dropped
+        {'postgresql_partition_by': 'RANGE (created_at)'}
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    detection_id = Column(UUID(as_uuid=True), ForeignKey("damage_detections.id"))
+    detection_id = Column(UUID(as_uuid=True))  # damage_detections.id
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"))
     
     # Label data
@@ -87,11 +122,13 @@ class DamageLabel(Base):
     labeling_time_seconds = Column(Integer, nullable=True)
     inter_annotator_agreement = Column(DECIMAL(5, 4), nullable=True)
     
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, primary_key=True, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
-    detection = relationship("DamageDetection", back_populates="labels")
+    detection = relationship(
+        "DamageDetection", primaryjoin="DamageDetection.id == foreign(DamageLabel.detection_id)", back_populates="labels"
+    )
     user = relationship("User")
 
 class DamageModel(Base):
@@ -170,6 +207,11 @@ class DamageTrainingJob(Base):
 
 class DamageMetrics(Base):
     __tablename__ = "damage_metrics"
+    __table_args__ = (
+        # One running-mean row per shadow metric, upserted by concurrent workers
+        Index("uq_damage_metrics_shadow", "model_id", "metric_type", unique=True,
+              postgresql_where=text("dataset_split = 'shadow'")),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     model_id = Column(UUID(as_uuid=True), ForeignKey("damage_models.id"))
@@ -192,6 +234,69 @@ class DamageMetrics(Base):
     # Relationships
     model = relationship("DamageModel")
 
+class DamageRescoreJob(Base):
+    __tablename__ = "damage_rescore_jobs"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    model_id = Column(UUID(as_uuid=True), ForeignKey("damage_models.id"))
+    model_version = Column(String, nullable=False)
+    
+    # Job status
+    status = Column(String, default="pending")  # pending, running, paused, completed, failed
+    error_message = Column(Text, nullable=True)
+    
+    # Checkpoint: keyset position of the last detection that was scored
+    cursor_created_at = Column(DateTime, nullable=True)
+    cursor_detection_id = Column(UUID(as_uuid=True), nullable=True)
+    processed_count = Column(Integer, default=0)
+    failed_count = Column(Integer, default=0)
+    
+    # Lease held by the worker running the job
+    worker_id = Column(String, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    
+    # Timing
+    started_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relationships
+    model = relationship("DamageModel")
+
+class DamageRescoreResult(Base):
+    __tablename__ = "damage_rescore_results"
+    __table_args__ = (
+        UniqueConstraint("detection_id", "model_version", name="uq_rescore_detection_version"),
+    )
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    job_id = Column(UUID(as_uuid=True), ForeignKey("damage_rescore_jobs.id"))
+    detection_id = Column(UUID(as_uuid=True), nullable=False)  # damage_detections.id
+    model_id = Column(UUID(as_uuid=True), ForeignKey("damage_models.id"))
+    model_version = Column(String, nullable=False)
+    source = Column(String, default="rescore")  # rescore, shadow
+    
+    # Scores from the re-run model
+    damage_detected = Column(Boolean, default=False)
+    confidence_score = Column(DECIMAL(5, 4), nullable=True)
+    damage_severity = Column(String, nullable=True)
+    ssim_score = Column(DECIMAL(5, 4), nullable=True)
+    lpips_score = Column(DECIMAL(5, 4), nullable=True)
+    yolo_detections = Column(JSON, nullable=True)
+    uncertainty_score = Column(DECIMAL(5, 4), nullable=True)
+    inference_time_ms = Column(Integer, nullable=True)
+    
+    status = Column(String, default="completed")  # completed, failed
+    error_message = Column(Text, nullable=True)
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    job = relationship("DamageRescoreJob")
+    detection = relationship("DamageDetection", primaryjoin="DamageDetection.id == foreign(DamageRescoreResult.detection_id)")
+
 # Update existing models to include relationships
 from core.database import Contract, Car
 
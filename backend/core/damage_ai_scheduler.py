@@ -6,12 +6,15 @@ Implements automated model training and active learning
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 from datetime import datetime, timedelta
-import asyncio
 import logging
 from typing import Dict, Any, List
 
-from core.database import supabase
 from services.damage_ai_service import damage_ai_service
+from services.damage_repository import damage_repository
+from services.damage_rescoring_service import damage_rescoring_service
+from services.blob_store import blob_store
+from services.storage_gc_service import storage_gc_service
+from services.partition_service import partition_service
 from core.config import settings
 
 # Configure logging
@@ -54,6 +57,33 @@ class DamageAIScheduler:
             max_instances=1
         )
         
+        # Resume or start historical re-scoring every 15 minutes
+        self.scheduler.add_job(
+            self.rescoring_job,
+            CronTrigger(minute='*/15', timezone='UTC'),
+            id='damage_rescoring',
+            replace_existing=True,
+            max_instances=1
+        )
+        
+        # Delete unreferenced content-addressed blobs daily (4 AM UTC)
+        self.scheduler.add_job(
+            self.blob_gc_job,
+            CronTrigger(hour=4, minute=0, timezone='UTC'),
+            id='blob_gc',
+            replace_existing=True,
+            max_instances=1
+        )
+        
+        # Create upcoming monthly partitions of damage_detections/damage_labels daily (1 AM UTC)
+        self.scheduler.add_job(
+            self.partition_maintenance_job,
+            CronTrigger(hour=1, minute=0, timezone='UTC'),
+            id='partition_maintenance',
+            replace_existing=True,
+            max_instances=1
+        )
+        
         # Cleanup old data weekly (Sunday 3 AM UTC)
         self.scheduler.add_job(
             self.cleanup_old_data_job,
@@ -70,6 +100,7 @@ class DamageAIScheduler:
     
     def stop(self):
         """Stop the scheduler"""
+        damage_rescoring_service.stop()
         self.scheduler.shutdown()
         logger.info("Damage AI Scheduler stopped")
     
@@ -134,11 +165,10 @@ class DamageAIScheduler:
                 reverse=True
             )
             
-            # Update review status
-            for detection in prioritized_detections[:20]:  # Top 20 most uncertain
-                self._mark_for_review(detection['id'])
+            # Update review status of the top 20 most uncertain in one statement
+            marked = self._mark_for_review([detection['id'] for detection in prioritized_detections[:20]])
             
-            logger.info(f"Marked {len(prioritized_detections[:20])} detections for human review")
+            logger.info(f"Marked {marked} detections for human review")
             
         except Exception as e:
             logger.error(f"Active learning review job failed: {e}")
@@ -170,48 +200,79 @@ class DamageAIScheduler:
         except Exception as e:
             logger.error(f"Model performance monitoring job failed: {e}")
     
+    def rescoring_job(self):
+        """Re-score history for a newly activated model and resume interrupted jobs"""
+        try:
+            job_id = damage_rescoring_service.ensure_job_for_active_model()
+            if job_id:
+                logger.info(f"Created re-scoring job {job_id} for newly active model")
+            
+            damage_rescoring_service.resume_unfinished_jobs()
+            
+        except Exception as e:
+            logger.error(f"Re-scoring job scheduling failed: {e}")
+    
     def cleanup_old_data_job(self):
         """Cleanup old data and temporary files"""
         logger.info("Starting cleanup job...")
         
         try:
-            # Cleanup old detections (older than 90 days)
-            cutoff_date = datetime.utcnow() - timedelta(days=90)
-            
-            response = supabase.from('damage_detections').delete().lt('created_at', cutoff_date.isoformat()).execute()
+            # Cleanup old detections (whole months past retention) together with their images,
+            # overlays and heatmaps, then sweep objects whose detection is already gone
+            cutoff_date = datetime.utcnow() - timedelta(days=settings.DETECTION_RETENTION_DAYS)
+            
+            purged = storage_gc_service.purge_detections(cutoff_date)
+            logger.info(
+                f"Cleaned up {purged['detections']} old detections in {purged['partitions_dropped']} dropped partitions "
+                f"({purged['objects_deleted']} objects deleted, {purged['refs_released']} blob references released)"
+            )
             
-            if response.data:
-                logger.info(f"Cleaned up {len(response.data)} old detections")
+            swept = storage_gc_service.sweep_orphans()
+            logger.info(
+                f"Swept {swept['objects_deleted']} orphaned objects, "
+                f"released {swept['refs_released']} orphaned blob references"
+            )
             
             # Cleanup old training jobs (older than 30 days)
             training_cutoff = datetime.utcnow() - timedelta(days=30)
             
-            response = supabase.from('damage_training_jobs').delete().lt('created_at', training_cutoff.isoformat()).execute()
+            deleted = damage_repository.delete_training_jobs_before(training_cutoff)
             
-            if response.data:
-                logger.info(f"Cleaned up {len(response.data)} old training jobs")
+            if deleted:
+                logger.info(f"Cleaned up {deleted} old training jobs")
             
             logger.info("Cleanup job completed successfully")
             
         except Exception as e:
             logger.error(f"Cleanup job failed: {e}")
     
-    def _get_new_labels_count(self) -> int:
-        """Get count of new labels since last training"""
+    def partition_maintenance_job(self):
+        """Create monthly partitions PARTITION_MONTHS_AHEAD months ahead"""
         try:
-            # Get last training date
-            response = supabase.from('damage_training_jobs').select('completed_at').eq('status', 'completed').order('completed_at', desc=True).limit(1).execute()
+            created = partition_service.ensure_partitions()
+            if created:
+                logger.info(f"Created partitions: {', '.join(created)}")
             
-            if not response.data:
-                # No previous training, count all labels
-                response = supabase.from('damage_labels').select('count').execute()
-                return response.data[0]['count'] if response.data else 0
+        except Exception as e:
+            logger.error(f"Partition maintenance job failed: {e}")
+    
+    def blob_gc_job(self):
+        """Delete blobs that no detection or document references any more"""
+        try:
+            collected = blob_store.collect_garbage()
+            logger.info(f"Blob GC deleted {collected} unreferenced blobs")
             
-            last_training = response.data[0]['completed_at']
+        except Exception as e:
+            logger.error(f"Blob GC job failed: {e}")
+    
+    def _get_new_labels_count(self) -> int:
+        """Get count of new labels since last training"""
+        try:
+            # Get last training date (None when there was no previous training: count all labels)
+            last_training = damage_repository.last_completed_training_at()
             
             # Count labels since last training
-            response = supabase.from('damage_labels').select('count').gt('created_at', last_training).execute()
-            return response.data[0]['count'] if response.data else 0
+            return damage_repository.count_labels(since=last_training)
             
         except Exception as e:
             logger.error(f"Error getting new labels count: {e}")
@@ -220,20 +281,8 @@ class DamageAIScheduler:
     def _get_training_data(self) -> List[Dict[str, Any]]:
         """Get training data for model training"""
         try:
-            # Get labeled detections
-            response = supabase.from('damage_detections').select('*, damage_labels(*)').eq('status', 'reviewed').execute()
-            
-            training_data = []
-            for detection in response.data:
-                if detection.get('damage_labels'):
-                    training_data.append({
-                        'detection_id': detection['id'],
-                        'before_image_path': detection['before_image_path'],
-                        'after_image_path': detection['after_image_path'],
-                        'labels': detection['damage_labels']
-                    })
-            
-            return training_data
+            # Get labeled detections with their labels
+            return damage_repository.training_data()
             
         except Exception as e:
             logger.error(f"Error getting training data: {e}")
@@ -242,16 +291,10 @@ class DamageAIScheduler:
     def _create_training_job(self, training_data: List[Dict[str, Any]]) -> str:
         """Create a new training job record"""
         try:
-            import uuid
-            
-            job_id = str(uuid.uuid4())
-            
             # Get active model
-            model_response = supabase.from('damage_models').select('id').eq('is_active', True).single().execute()
-            model_id = model_response.data['id'] if model_response.data else None
+            model_id = damage_repository.active_model_id()
             
             job_data = {
-                'id': job_id,
                 'model_id': model_id,
                 'job_type': 'nightly_training',
                 'training_config': {
@@ -260,16 +303,11 @@ class DamageAIScheduler:
                 },
                 'training_samples': len(training_data),
                 'status': 'running',
-                'started_at': datetime.utcnow().isoformat()
+                'started_at': datetime.utcnow()
             }
             
-            response = supabase.from('damage_training_jobs').insert([job_data]).execute()
+            return damage_repository.create_training_job(job_data)
             
-            if response.data:
-                return job_id
-            else:
-                raise Exception("Failed to create training job")
-                
         except Exception as e:
             logger.error(f"Error creating training job: {e}")
             raise
@@ -279,12 +317,12 @@ class DamageAIScheduler:
         try:
             update_data = {
                 'status': 'completed',
-                'completed_at': datetime.utcnow().isoformat(),
+                'completed_at': datetime.utcnow(),
                 'final_metrics': results,
                 'progress_percentage': 100.0
             }
             
-            supabase.from('damage_training_jobs').update(update_data).eq('id', job_id).execute()
+            damage_repository.update_training_job(job_id, update_data)
             
         except Exception as e:
             logger.error(f"Error updating training job: {e}")
@@ -293,13 +331,11 @@ class DamageAIScheduler:
         """Update model performance metrics"""
         try:
             # Get active model
-            model_response = supabase.from('damage_models').select('id').eq('is_active', True).single().execute()
+            model_id = damage_repository.active_model_id()
             
-            if not model_response.data:
+            if not model_id:
                 return
             
-            model_id = model_response.data['id']
-            
             # Insert new metrics
             metrics_data = []
             for metric_type, value in metrics.items():
@@ -308,11 +344,11 @@ class DamageAIScheduler:
                         'model_id': model_id,
                         'metric_type': metric_type,
                         'metric_value': value,
-                        'evaluation_date': datetime.utcnow().isoformat()
+                        'evaluation_date': datetime.utcnow()
                     })
             
             if metrics_data:
-                supabase.from('damage_metrics').insert(metrics_data).execute()
+                damage_repository.insert_metrics(metrics_data)
             
         except Exception as e:
             logger.error(f"Error updating model metrics: {e}")
@@ -320,38 +356,34 @@ class DamageAIScheduler:
     def _get_uncertain_detections(self) -> List[Dict[str, Any]]:
         """Get detections with high uncertainty scores"""
         try:
-            response = supabase.from('damage_detections').select('*').eq('needs_human_review', True).gte('uncertainty_score', settings.ACTIVE_LEARNING_THRESHOLD).execute()
-            return response.data or []
+            return damage_repository.pending_reviews(min_uncertainty=settings.ACTIVE_LEARNING_THRESHOLD)
             
         except Exception as e:
             logger.error(f"Error getting uncertain detections: {e}")
             return []
     
-    def _mark_for_review(self, detection_id: str):
-        """Mark detection for human review"""
+    def _mark_for_review(self, detection_ids: List[str]) -> int:
+        """Mark detections for human review"""
         try:
-            supabase.from('damage_detections').update({
-                'needs_human_review': True,
-                'status': 'pending_review'
-            }).eq('id', detection_id).execute()
+            return damage_repository.mark_for_review(detection_ids)
             
         except Exception as e:
-            logger.error(f"Error marking detection for review: {e}")
+            logger.error(f"Error marking detections for review: {e}")
+            return 0
     
     def _get_recent_model_metrics(self) -> Dict[str, Any]:
         """Get recent model performance metrics"""
         try:
             # Get latest metrics for active model
-            response = supabase.from('damage_metrics').select('*').eq('model_id', 
-                supabase.from('damage_models').select('id').eq('is_active', True).single().execute().data['id']
-            ).order('evaluation_date', desc=True).limit(10).execute()
+            model_id = damage_repository.active_model_id()
+            metrics = damage_repository.list_metrics([model_id], 10) if model_id else []
             
-            if not response.data:
+            if not metrics:
                 return {}
             
             # Aggregate latest metrics
             latest_metrics = {}
-            for metric in response.data:
+            for metric in metrics:
                 metric_type = metric['metric_type']
                 if metric_type not in latest_metrics:
                     latest_metrics[metric_type] = metric['metric_value']
@@ -391,13 +423,6 @@ class DamageAIScheduler:
     def _log_training_error(self, error_message: str):
         """Log training error to database"""
         try:
-            error_data = {
-                'error_type': 'training_failure',
-                'error_message': error_message,
-                'timestamp': datetime.utcnow().isoformat(),
-                'job_type': 'nightly_training'
-            }
-            
             # You could create an error_logs table for this
             logger.error(f"Training error logged: {error_message}")
             
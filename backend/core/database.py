@@ -2,20 +2,89 @@
 Database configuration and models for NavEdge Phase 2
 """
 
-from sqlalchemy import create_engine, Column, String, Integer, DateTime, Boolean, Text, JSON, ForeignKey, DECIMAL
+from sqlalchemy import create_engine, event, Column, String, Integer, BigInteger, DateTime, Boolean, Text, JSON, ForeignKey, DECIMAL, UniqueConstraint, Index
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session, relationship
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 import uuid
-from datetime import datetime
-from typing import Generator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Annotated, AsyncGenerator, Generator, Iterator, Optional
+from pydantic import AfterValidator
 from core.config import settings
 
-# Database engine
-engine = create_engine(settings.DATABASE_URL)
+POOL_OPTIONS = dict(
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+    pool_pre_ping=settings.DB_POOL_PRE_PING
+)
+
+def async_database_url(database_url: str):
+    """DATABASE_URL with the asyncpg driver and its prepared statement cache size"""
+    url = make_url(database_url)
+    return url.set(drivername="postgresql+asyncpg").update_query_dict({
+        "prepared_statement_cache_size": str(settings.DB_STATEMENT_CACHE_SIZE)
+    })
+
+# Database engine (schedulers, background jobs and services running in threads)
+engine = create_engine(settings.DATABASE_URL, **POOL_OPTIONS)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Async engine for route handlers, so queries do not block the event loop
+async_engine = create_async_engine(
+    async_database_url(settings.DATABASE_URL),
+    **POOL_OPTIONS,
+    # asyncpg's own statement cache; 0 disables it for pgbouncer in transaction mode
+    connect_args={"statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE}
+)
+# expire_on_commit=False keeps loaded attributes readable after commit without another round trip
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+def naive_utc(value: datetime) -> datetime:
+    """
+    DateTime columns are timestamp without time zone holding UTC; asyncpg refuses aware
+    datetimes for them, so convert to UTC and drop the offset
+    """
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+# Request model field for datetimes written to DateTime columns (e.g. "2026-01-01T09:00:00Z")
+UTCDateTime = Annotated[datetime, AfterValidator(naive_utc)]
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+_query_counter: ContextVar[Optional[QueryCounter]] = ContextVar('query_counter', default=None)
+
+@event.listens_for(engine, "before_cursor_execute")
+@event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    counter = _query_counter.get()
+    if counter is not None:
+        counter.count += 1
+
+@contextmanager
+def count_queries() -> Iterator[QueryCounter]:
+    """
+    Count the statements sent to the database by the current task or thread
+
+    Other requests and jobs running concurrently on the same engines are not counted.
+    """
+    counter = QueryCounter()
+    token = _query_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _query_counter.reset(token)
+
 # Database dependency
 def get_db() -> Generator[Session, None, None]:
     db = SessionLocal()
@@ -24,6 +93,11 @@ def get_db() -> Generator[Session, None, None]:
     finally:
         db.close()
 
+# Async database dependency
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
 # User Roles
 class UserRole:
     OWNER = "owner"
@@ -48,6 +122,10 @@ class User(Base):
 
 class Organization(Base):
     __tablename__ = "organizations"
+    __table_args__ = (
+        # Every owner route resolves the organisation by its owner
+        Index("ix_organizations_owner_id", "owner_id"),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String, nullable=False)
@@ -65,6 +143,10 @@ class Organization(Base):
 
 class Car(Base):
     __tablename__ = "cars"
+    __table_args__ = (
+        # Dashboard car counts by status (DashboardService)
+        Index("ix_cars_organization_status", "organization_id", "status"),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     make = Column(String, nullable=False)
@@ -87,6 +169,19 @@ class Car(Base):
 
 class Contract(Base):
     __tablename__ = "contracts"
+    __table_args__ = (
+        # Dashboard aggregates and any organization_id lookup (leading column);
+        # INCLUDE lets the aggregates run as index-only scans
+        Index("ix_contracts_organization_status", "organization_id", "status",
+              postgresql_include=["monthly_rent"]),
+        # A renter's active contract (chatbot, fine matching)
+        Index("ix_contracts_renter_status", "renter_id", "status"),
+        # Active contracts ending soon (expiry reminders, /expiring)
+        Index("ix_contracts_status_end_date", "status", "end_date"),
+        # Keyset pages of /my-contracts (core/pagination.py)
+        Index("ix_contracts_organization_created", "organization_id", "created_at", "id"),
+        Index("ix_contracts_renter_created", "renter_id", "created_at", "id"),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     renter_id = Column(UUID(as_uuid=True), ForeignKey("users.id"))
@@ -102,7 +197,7 @@ class Contract(Base):
     status = Column(String, default="active")  # active, expired, terminated
     
     # Contract terms
-    terms = Column(JSON, nullable=True)
+    terms = Column(JSONB, nullable=True)
     
     # Document paths
     contract_pdf_path = Column(String, nullable=True)
@@ -119,6 +214,10 @@ class Contract(Base):
 
 class Fine(Base):
     __tablename__ = "fines"
+    __table_args__ = (
+        Index("ix_fines_contract_status", "contract_id", "status", postgresql_include=["amount"]),
+        Index("ix_fines_contract_created", "contract_id", "created_at", "id"),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     contract_id = Column(UUID(as_uuid=True), ForeignKey("contracts.id"))
@@ -128,11 +227,47 @@ class Fine(Base):
     status = Column(String, default="pending")  # pending, paid, deducted
     location = Column(String, nullable=True)
     source = Column(String, default="dubai_police")  # dubai_police, manual
+    # SHA-256 of plate, violation, date, location and source; see FineIngestionService.fingerprint
+    fingerprint = Column(String(64), unique=True, index=True, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationships
     contract = relationship("Contract", back_populates="fines")
 
+# Dashboard counters per organisation, kept in step with contracts, fines and cars
+# (see OrganizationStatsService) and reconciled nightly
+class OrganizationStats(Base):
+    __tablename__ = "organization_stats"
+    
+    organization_id = Column(UUID(as_uuid=True), ForeignKey("organizations.id"), primary_key=True)
+    
+    # Contracts by status
+    contracts_total = Column(Integer, default=0, nullable=False)
+    contracts_active = Column(Integer, default=0, nullable=False)
+    contracts_expired = Column(Integer, default=0, nullable=False)
+    contracts_terminated = Column(Integer, default=0, nullable=False)
+    revenue_total = Column(DECIMAL(14, 2), default=0, nullable=False)  # sum of monthly_rent
+    deposits_total = Column(DECIMAL(14, 2), default=0, nullable=False)
+    
+    # Fines by status
+    fines_total = Column(Integer, default=0, nullable=False)
+    fines_pending = Column(Integer, default=0, nullable=False)
+    fines_paid = Column(Integer, default=0, nullable=False)
+    fines_deducted = Column(Integer, default=0, nullable=False)
+    fines_total_amount = Column(DECIMAL(14, 2), default=0, nullable=False)
+    fines_pending_amount = Column(DECIMAL(14, 2), default=0, nullable=False)
+    fines_paid_amount = Column(DECIMAL(14, 2), default=0, nullable=False)
+    fines_deducted_amount = Column(DECIMAL(14, 2), default=0, nullable=False)
+    
+    # Cars by status
+    cars_total = Column(Integer, default=0, nullable=False)
+    cars_available = Column(Integer, default=0, nullable=False)
+    cars_rented = Column(Integer, default=0, nullable=False)
+    cars_maintenance = Column(Integer, default=0, nullable=False)
+    
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    reconciled_at = Column(DateTime, nullable=True)
+
 class DamageReport(Base):
     __tablename__ = "damage_reports"
     
@@ -146,7 +281,7 @@ class DamageReport(Base):
     
     # AI Analysis
     damage_detected = Column(Boolean, default=False)
-    damage_details = Column(JSON, nullable=True)  # AI analysis results
+    damage_details = Column(JSONB, nullable=True)  # AI analysis results
     ai_confidence = Column(DECIMAL(3, 2), nullable=True)
     
     # Manual assessment
@@ -161,16 +296,27 @@ class DamageReport(Base):
 
 class DocumentUpload(Base):
     __tablename__ = "document_uploads"
+    __table_args__ = (
+        Index("ix_document_uploads_user_created", "user_id", "created_at", "id"),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"))
     document_type = Column(String, nullable=False)  # emirates_id, license, contract
     file_path = Column(String, nullable=False)
-    extracted_text = Column(JSON, nullable=True)
+    extracted_text = Column(JSONB, nullable=True)  # OCR result: success, raw_text, parsed_data
     created_at = Column(DateTime, default=datetime.utcnow)
 
+# Emirates ID number parsed from an ID scan. Queries must use this exact expression for the
+# planner to match the expression index below.
+EMIRATES_ID_NUMBER = DocumentUpload.extracted_text['parsed_data']['emirates_id'].astext
+Index("ix_document_uploads_emirates_id", EMIRATES_ID_NUMBER)
+
 class Notification(Base):
     __tablename__ = "notifications"
+    __table_args__ = (
+        Index("ix_notifications_user_created", "user_id", "created_at", "id"),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"))
@@ -180,3 +326,30 @@ class Notification(Base):
     status = Column(String, default="pending")  # pending, sent, failed
     sent_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+
+# Content-addressed objects in S3, keyed by the SHA-256 of their bytes
+class StorageBlob(Base):
+    __tablename__ = "storage_blobs"
+    
+    sha256 = Column(String(64), primary_key=True)
+    key = Column(String, nullable=False)
+    size_bytes = Column(BigInteger, nullable=False)
+    content_type = Column(String, nullable=True)
+    ref_count = Column(Integer, default=0, nullable=False)
+    orphaned_at = Column(DateTime, nullable=True, index=True)  # set when ref_count drops to 0
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_referenced_at = Column(DateTime, default=datetime.utcnow)
+
+# References from records (detections, documents) to the blobs they use
+class StorageBlobRef(Base):
+    __tablename__ = "storage_blob_refs"
+    __table_args__ = (
+        UniqueConstraint("owner_type", "owner_id", "role", name="uq_blob_ref_owner_role"),
+    )
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    sha256 = Column(String(64), ForeignKey("storage_blobs.sha256"), nullable=False, index=True)
+    owner_type = Column(String, nullable=False)  # damage_detection, document_upload
+    owner_id = Column(UUID(as_uuid=True), nullable=False)
+    role = Column(String, nullable=False)  # e.g. before_image, ssim_heatmap, file
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,64 @@
+"""
+Single-process election for work that must not run once per worker
+
+Under gunicorn every worker runs the app's startup. The schema setup and the job
+schedulers must run in exactly one process (across hosts too), or every cron job fires
+once per worker. The process that wins a session-level PostgreSQL advisory lock does
+that work; the lock is held on a dedicated connection until shutdown or until the
+process dies, when a restarted worker takes over.
+"""
+
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from core.database import engine
+
+# Held by the process that runs schema setup and the schedulers
+SCHEDULER_LOCK_KEY = 0x7363686564756c65  # 'schedule'
+
+class LeaderLock:
+    def __init__(self, key: int):
+        self.key = key
+        self._connection: Optional[Connection] = None
+
+    @property
+    def held(self) -> bool:
+        return self._connection is not None
+
+    def acquire(self) -> bool:
+        """Try to take the lock without waiting; True if this process holds it"""
+        if self._connection is not None:
+            return True
+
+        connection = engine.connect()
+        try:
+            acquired = connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {'key': self.key}).scalar()
+            # Session-level locks outlive the transaction; don't sit idle in one
+            connection.commit()
+        except Exception:
+            connection.close()
+            raise
+
+        if not acquired:
+            connection.close()
+            return False
+
+        self._connection = connection
+        return True
+
+    def release(self):
+        if self._connection is None:
+            return
+        try:
+            self._connection.execute(text("SELECT pg_advisory_unlock(:key)"), {'key': self.key})
+            self._connection.commit()
+        finally:
+            # Closing returns the connection to the pool; invalidate so the lock cannot leak
+            self._connection.invalidate()
+            self._connection.close()
+            self._connection = None
+
+# Global scheduler leader lock instance
+scheduler_leader = LeaderLock(SCHEDULER_LOCK_KEY)
@@ -0,0 +1,153 @@
+"""
+Prometheus metrics for NavEdge Phase 2
+Per-stage latency histograms for the damage AI pipeline, S3 cache counters and job query
+counts, exposed on /metrics
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Tuple
+
+try:
+    from prometheus_client import (
+        CollectorRegistry, Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST, multiprocess
+    )
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+    print("prometheus_client not available. Install with: pip install prometheus-client")
+
+STAGE_LABELS = ['stage', 'resolution', 'size_class', 'model_version']
+
+# Stages of one detection range from milliseconds (ensemble) to tens of seconds (SSIM at 12 MP)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+if PROMETHEUS_AVAILABLE:
+    DAMAGE_STAGE_SECONDS = Histogram(
+        'navedge_damage_stage_seconds',
+        'Time spent in each damage detection pipeline stage',
+        STAGE_LABELS,
+        buckets=LATENCY_BUCKETS
+    )
+    DAMAGE_STAGE_BYTES = Counter(
+        'navedge_damage_stage_bytes',
+        'Bytes processed by each damage detection pipeline stage',
+        STAGE_LABELS
+    )
+
+    S3_CACHE_REQUESTS = Counter(
+        'navedge_s3_cache_requests',
+        'S3 disk cache lookups by result (hit, coalesced, miss, error)',
+        ['result']
+    )
+    S3_CACHE_BYTES = Gauge(
+        'navedge_s3_cache_bytes',
+        'Bytes held in the S3 disk cache',
+        multiprocess_mode='max'
+    )
+
+    JOB_DB_QUERIES = Histogram(
+        'navedge_job_db_queries',
+        'Database statements issued per background job run',
+        ['job'],
+        buckets=(1, 5, 10, 25, 50, 100, 250, 1000, 5000)
+    )
+
+def resolution_bucket(width: int, height: int) -> str:
+    """Bucket image size into a bounded set of label values"""
+    megapixels = width * height / 1_000_000
+    for limit in (1, 4, 12, 24):
+        if megapixels <= limit:
+            return f"le_{limit}mp"
+    return "gt_24mp"
+
+def size_class(num_bytes: int) -> str:
+    """Bucket payload size into a bounded set of label values"""
+    megabytes = num_bytes / (1024 * 1024)
+    for limit in (1, 5, 20, 50):
+        if megabytes <= limit:
+            return f"le_{limit}mb"
+    return "gt_50mb"
+
+def observe_stage(stage: str, seconds: float, num_bytes: int = 0, resolution: str = "unknown",
+                  payload_class: str = "unknown", model_version: str = "unknown"):
+    """Record one stage duration (and bytes) in the Prometheus histograms"""
+    if not PROMETHEUS_AVAILABLE:
+        return
+
+    labels = (stage, resolution, payload_class, model_version)
+    DAMAGE_STAGE_SECONDS.labels(*labels).observe(seconds)
+    if num_bytes:
+        DAMAGE_STAGE_BYTES.labels(*labels).inc(num_bytes)
+
+def observe_cache_request(result: str):
+    """Count one S3 disk cache lookup; hit rate = (hit + coalesced) / all but error"""
+    if PROMETHEUS_AVAILABLE:
+        S3_CACHE_REQUESTS.labels(result).inc()
+
+def set_cache_bytes(num_bytes: int):
+    if PROMETHEUS_AVAILABLE:
+        S3_CACHE_BYTES.set(num_bytes)
+
+def observe_job_queries(job: str, count: int):
+    """Record how many statements one run of a background job sent to the database"""
+    if PROMETHEUS_AVAILABLE:
+        JOB_DB_QUERIES.labels(job).observe(count)
+
+class StageTimer:
+    """Times the stages of one detection; keeps a per-detection summary and feeds the histograms"""
+
+    def __init__(self, model_version: str, input_bytes: int = 0):
+        self.model_version = model_version
+        self.input_bytes = input_bytes
+        self.resolution = "unknown"
+        self.timings_ms: Dict[str, float] = {}
+        self.bytes: Dict[str, int] = {}
+
+    def set_resolution(self, width: int, height: int):
+        self.resolution = resolution_bucket(width, height)
+
+    @contextmanager
+    def stage(self, name: str, num_bytes: int = 0):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start, num_bytes)
+
+    def record(self, name: str, seconds: float, num_bytes: int = 0):
+        self.timings_ms[name] = round(self.timings_ms.get(name, 0.0) + seconds * 1000, 2)
+        if num_bytes:
+            self.bytes[name] = self.bytes.get(name, 0) + num_bytes
+
+        observe_stage(
+            name, seconds, num_bytes, self.resolution, size_class(self.input_bytes), self.model_version
+        )
+
+    def summary(self) -> Dict[str, object]:
+        """Compact summary persisted with the detection"""
+        return {
+            'stages_ms': self.timings_ms,
+            'bytes': self.bytes,
+            'resolution': self.resolution,
+            'input_bytes': self.input_bytes,
+            'model_version': self.model_version
+        }
+
+def render_metrics() -> Tuple[bytes, str]:
+    """
+    Render all metrics in Prometheus text format
+
+    Under gunicorn, set PROMETHEUS_MULTIPROC_DIR so every worker's samples are aggregated.
+    """
+    if not PROMETHEUS_AVAILABLE:
+        return b"# prometheus_client not installed\n", CONTENT_TYPE_LATEST
+
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,100 @@
+"""
+Keyset pagination for list endpoints
+
+Lists are ordered newest first by (created_at, id) and paged with an opaque cursor holding
+the position of the last item returned, so every page is one index range scan on
+(<filter column>, created_at, id) no matter how deep the client has paged.
+"""
+
+import base64
+import binascii
+import json
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Query, status
+from sqlalchemy import tuple_
+from sqlalchemy.orm import load_only
+from sqlalchemy.sql import Select
+
+from core.config import settings
+
+# Field name -> function producing its response value from a row
+FieldMap = Dict[str, Callable[[Any], Any]]
+
+def encode_cursor(created_at: datetime, item_id: Any) -> str:
+    """Opaque cursor for the position after (created_at, id)"""
+    payload = json.dumps({'t': created_at.isoformat(), 'id': str(item_id)}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    """Position encoded by encode_cursor; 400 for anything else"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return datetime.fromisoformat(payload['t']), uuid.UUID(payload['id'])
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+class PageParams:
+    """
+    cursor, limit and fields query parameters shared by paginated endpoints
+
+    Use as a dependency: page: PageParams = Depends()
+    """
+
+    def __init__(
+        self,
+        cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+        limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+        fields: Optional[str] = Query(None, description="Comma-separated fields to return (default all)")
+    ):
+        self.limit = limit
+        self.position = decode_cursor(cursor) if cursor else None
+        self.fields = [field.strip() for field in fields.split(',') if field.strip()] if fields else None
+
+    def selected(self, field_map: FieldMap) -> List[str]:
+        """Requested fields in field_map order (all of them when none were requested)"""
+        if not self.fields:
+            return list(field_map)
+        unknown = [field for field in self.fields if field not in field_map]
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(field_map)}"
+            )
+        return [field for field in field_map if field in self.fields]
+
+def paginate(stmt: Select, model, page: PageParams, field_map: Optional[FieldMap] = None) -> Select:
+    """
+    Restrict a select of model to one page: rows after the cursor, newest first, limit + 1
+    (the extra row only tells page_response whether there is a next page)
+
+    With field_map and a fields selection, only the selected columns (plus the keyset)
+    are loaded.
+    """
+    if page.position:
+        stmt = stmt.where(tuple_(model.created_at, model.id) < tuple_(*page.position))
+
+    if field_map is not None and page.fields:
+        columns = model.__table__.columns
+        loaded = [getattr(model, field) for field in page.selected(field_map) if field in columns]
+        stmt = stmt.options(load_only(model.id, model.created_at, *loaded))
+
+    return stmt.order_by(model.created_at.desc(), model.id.desc()).limit(page.limit + 1)
+
+def page_response(rows: Sequence[Any], page: PageParams, field_map: FieldMap,
+                  position: Callable[[Any], Tuple[datetime, Any]] = lambda row: (row.created_at, row.id)) -> Dict[str, Any]:
+    """
+    Response body of a page fetched with paginate
+
+    Returns:
+        items (projected to the selected fields), next_cursor (None on the last page) and limit
+    """
+    items = rows[:page.limit]
+    fields = page.selected(field_map)
+    return {
+        'items': [{field: field_map[field](row) for field in fields} for row in items],
+        'next_cursor': encode_cursor(*position(items[-1])) if len(rows) > page.limit else None,
+        'limit': page.limit
+    }
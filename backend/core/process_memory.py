@@ -0,0 +1,47 @@
+"""
+Process memory accounting for pre-forked workers
+Reports how much of a worker's memory is still shared copy-on-write with the master
+"""
+
+import os
+from typing import Dict, Any, Optional
+
+# smaps_rollup fields we report, in kB
+SMAPS_FIELDS = ['Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty', 'Swap']
+
+def get_process_memory(pid: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Get shared versus private memory for a process (Linux only)
+    
+    Args:
+        pid: Process ID, defaults to the current process
+        
+    Returns:
+        Memory breakdown in MB, or an error entry when /proc is unavailable
+    """
+    pid = pid or os.getpid()
+    
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            lines = f.readlines()
+    except OSError as e:
+        return {'pid': pid, 'error': str(e)}
+    
+    values_kb = {}
+    for line in lines:
+        parts = line.split()
+        if len(parts) >= 2 and parts[0].rstrip(':') in SMAPS_FIELDS:
+            values_kb[parts[0].rstrip(':')] = int(parts[1])
+    
+    shared_kb = values_kb.get('Shared_Clean', 0) + values_kb.get('Shared_Dirty', 0)
+    private_kb = values_kb.get('Private_Clean', 0) + values_kb.get('Private_Dirty', 0)
+    
+    return {
+        'pid': pid,
+        'parent_pid': os.getppid() if pid == os.getpid() else None,
+        'rss_mb': round(values_kb.get('Rss', 0) / 1024, 1),
+        'pss_mb': round(values_kb.get('Pss', 0) / 1024, 1),
+        'shared_mb': round(shared_kb / 1024, 1),
+        'private_mb': round(private_kb / 1024, 1),
+        'swap_mb': round(values_kb.get('Swap', 0) / 1024, 1)
+    }
@@ -0,0 +1,171 @@
+"""
+CPU resource governor for NavEdge Phase 2
+Splits the node's cores between workers and caps torch, OpenCV and BLAS threads accordingly
+"""
+
+import os
+from typing import Dict, Any, List, Optional
+
+from core.config import settings
+
+# Environment variables read by BLAS / OpenMP runtimes when they are first loaded
+THREAD_ENV_VARS = [
+    'OMP_NUM_THREADS',
+    'MKL_NUM_THREADS',
+    'OPENBLAS_NUM_THREADS',
+    'NUMEXPR_NUM_THREADS',
+    'VECLIB_MAXIMUM_THREADS'
+]
+
+class ResourceGovernor:
+    def __init__(self):
+        self.decisions: Dict[str, Any] = {}
+        self.runtime_applied = False
+
+    def detect_cores(self) -> Dict[str, Any]:
+        """Count usable cores: affinity mask and cgroup CPU quota, whichever is smaller"""
+        if hasattr(os, 'sched_getaffinity'):
+            available = sorted(os.sched_getaffinity(0))
+        else:
+            available = list(range(os.cpu_count() or 1))
+
+        usable = len(available)
+        quota = self._cgroup_cpu_quota()
+        if quota is not None:
+            usable = max(1, min(usable, int(quota)))
+
+        return {
+            'available_cpus': available,
+            'cgroup_quota': quota,
+            'usable_cores': usable
+        }
+
+    def plan(self) -> Dict[str, Any]:
+        """Decide per-worker thread budgets from detected cores and configured concurrency"""
+        cores = self.detect_cores()
+        workers = max(1, settings.WEB_CONCURRENCY)
+        concurrency = max(1, settings.INFERENCE_CONCURRENCY_PER_WORKER)
+
+        threads = settings.TORCH_NUM_THREADS or max(1, cores['usable_cores'] // (workers * concurrency))
+
+        return {
+            **cores,
+            'workers': workers,
+            'inference_concurrency_per_worker': concurrency,
+            'threads_per_inference': threads,
+            'oversubscription': round(workers * concurrency * threads / cores['usable_cores'], 2)
+        }
+
+    def apply_env(self):
+        """
+        Export BLAS/OpenMP thread limits
+
+        Must run before numpy, torch or cv2 are imported, since those runtimes
+        read the variables only once. Values set explicitly by the operator win.
+        """
+        plan = self.plan()
+        env = {}
+        for var in THREAD_ENV_VARS:
+            if var in os.environ:
+                env[var] = {'value': os.environ[var], 'source': 'environment'}
+            else:
+                os.environ[var] = str(plan['threads_per_inference'])
+                env[var] = {'value': os.environ[var], 'source': 'governor'}
+
+        self.decisions.update(plan)
+        self.decisions['env'] = env
+
+    def apply_runtime(self, worker_slot: Optional[int] = None):
+        """
+        Set torch and OpenCV thread counts in this worker and optionally pin it to cores
+
+        Args:
+            worker_slot: Index of this worker among the node's workers, used for pinning
+        """
+        plan = self.plan()
+        threads = plan['threads_per_inference']
+        self.decisions.update(plan)
+
+        try:
+            import torch
+            torch.set_num_threads(threads)
+            try:
+                torch.set_num_interop_threads(max(1, settings.INFERENCE_CONCURRENCY_PER_WORKER))
+            except RuntimeError:
+                # Only allowed before the first parallel op; keep torch's value
+                pass
+            self.decisions['torch_threads'] = torch.get_num_threads()
+            self.decisions['torch_interop_threads'] = torch.get_num_interop_threads()
+        except ImportError:
+            pass
+
+        try:
+            import cv2
+            cv2.setNumThreads(threads)
+            self.decisions['opencv_threads'] = cv2.getNumThreads()
+        except ImportError:
+            pass
+
+        try:
+            from threadpoolctl import threadpool_limits
+            threadpool_limits(limits=threads)
+            self.decisions['threadpoolctl'] = True
+        except ImportError:
+            self.decisions['threadpoolctl'] = False
+
+        self.decisions['worker_slot'] = worker_slot
+        self.decisions['pinned_cpus'] = None
+        if settings.CPU_PIN_WORKERS and worker_slot is not None:
+            self.decisions['pinned_cpus'] = self._pin(worker_slot, plan)
+
+        self.decisions['pid'] = os.getpid()
+        self.runtime_applied = True
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current decisions plus what the process actually runs with"""
+        current = {}
+        if hasattr(os, 'sched_getaffinity'):
+            current['affinity'] = sorted(os.sched_getaffinity(0))
+        try:
+            import torch
+            current['torch_threads'] = torch.get_num_threads()
+        except ImportError:
+            pass
+        try:
+            import cv2
+            current['opencv_threads'] = cv2.getNumThreads()
+        except ImportError:
+            pass
+
+        return {'decisions': self.decisions, 'current': current}
+
+    def _pin(self, worker_slot: int, plan: Dict[str, Any]) -> Optional[List[int]]:
+        """Pin this process to its own contiguous slice of the available CPUs"""
+        if not hasattr(os, 'sched_setaffinity'):
+            return None
+
+        available = plan['available_cpus']
+        per_worker = max(1, len(available) // plan['workers'])
+        start = (worker_slot % plan['workers']) * per_worker
+        cpus = available[start:start + per_worker] or available
+
+        try:
+            os.sched_setaffinity(0, cpus)
+            return cpus
+        except OSError as e:
+            print(f"CPU pinning failed: {e}")
+            return None
+
+    def _cgroup_cpu_quota(self) -> Optional[float]:
+        """CPU limit from cgroup v2 cpu.max (e.g. container CPU limits), if any"""
+        try:
+            with open('/sys/fs/cgroup/cpu.max') as f:
+                quota, period = f.read().split()
+            if quota == 'max':
+                return None
+            return int(quota) / int(period)
+        except (OSError, ValueError):
+            return None
+
+# Global governor instance
+resource_governor = ResourceGovernor()
@@ -8,9 +8,14 @@ from datetime import datetime
 import asyncio
 from typing import Optional
 
+from sqlalchemy import select
+
 from services.dubai_police_service import DubaiPoliceService
 from services.notification_service import NotificationService
-from core.database import SessionLocal, Contract, Car, Fine, Organization
+from services.fine_ingestion_service import fine_ingestion_service
+from services.organization_stats_service import organization_stats_service
+from core.database import SessionLocal, AsyncSessionLocal, Contract, Car, Organization, User, count_queries
+from core.metrics import observe_job_queries
 
 # Global scheduler instance
 scheduler: Optional[AsyncIOScheduler] = None
@@ -49,6 +54,15 @@ def start_scheduler():
             replace_existing=True
         )
         
+        # Reconcile dashboard counters with the base tables at 3 AM UAE time
+        scheduler.add_job(
+            reconcile_dashboard_stats,
+            CronTrigger(hour=3, minute=0, timezone='Asia/Dubai'),
+            id='dashboard_stats_reconciliation',
+            name='Dashboard Stats Reconciliation',
+            replace_existing=True
+        )
+        
         scheduler.start()
         print("✅ Background job scheduler started")
 
@@ -65,65 +79,64 @@ async def check_dubai_police_fines():
     """Daily job to check Dubai Police for fines"""
     print("🔍 Starting daily Dubai Police fine check...")
     
-    try:
-        db = SessionLocal()
-        police_service = DubaiPoliceService()
-        notification_service = NotificationService()
-        
-        # Get all active contracts
-        contracts = db.query(Contract).filter(Contract.status == "active").all()
-        
-        for contract in contracts:
-            # Get car for this contract
-            car = db.query(Car).filter(Car.id == contract.car_id).first()
-            if not car:
-                continue
+    with count_queries() as queries:
+        try:
+            police_service = DubaiPoliceService()
+            notification_service = NotificationService()
             
-            # Check for fines
-            fines_result = await police_service.check_fines(car.license_plate)
+            async with AsyncSessionLocal() as db:
+                # Active contracts with their car's plate and the owner's phone, in one query
+                contracts = (await db.execute(
+                    select(Contract.id, Car.license_plate, User.phone)
+                    .join(Car, Car.id == Contract.car_id)
+                    .outerjoin(Organization, Organization.id == Contract.organization_id)
+                    .outerjoin(User, User.id == Organization.owner_id)
+                    .where(Contract.status == "active")
+                )).all()
+                
+                # Check each plate once
+                fines_by_plate = {}
+                for license_plate in dict.fromkeys(row.license_plate for row in contracts):
+                    fines_result = await police_service.check_fines(license_plate)
+                    if fines_result['success']:
+                        fines_by_plate[license_plate] = fines_result['fines']
+                
+                # One INSERT ... ON CONFLICT DO NOTHING for every fine found; rows already
+                # stored (by earlier or concurrent runs) are skipped and not returned
+                new_fines = await fine_ingestion_service.ingest(db, [
+                    {
+                        'contract_id': contract.id,
+                        'license_plate': contract.license_plate,
+                        'violation': fine_data['violation'],
+                        'amount': fine_data['amount'],
+                        'date': fine_data['date'],
+                        'location': fine_data.get('location'),
+                        'source': "dubai_police"
+                    }
+                    for contract in contracts
+                    for fine_data in fines_by_plate.get(contract.license_plate, [])
+                ])
+                await db.commit()
             
-            if fines_result['success'] and fines_result['fines']:
-                # Process new fines
-                for fine_data in fines_result['fines']:
-                    # Check if fine already exists
-                    existing_fine = db.query(Fine).filter(
-                        Fine.contract_id == contract.id,
-                        Fine.violation == fine_data['violation'],
-                        Fine.date == fine_data['date']
-                    ).first()
-                    
-                    if not existing_fine:
-                        # Create new fine
-                        fine = Fine(
-                            contract_id=contract.id,
-                            violation=fine_data['violation'],
-                            amount=fine_data['amount'],
-                            date=fine_data['date'],
-                            location=fine_data.get('location'),
-                            source="dubai_police"
-                        )
-                        db.add(fine)
-                        
-                        # Send notification to owner
-                        organization = db.query(Organization).filter(
-                            Organization.id == contract.organization_id
-                        ).first()
-                        
-                        if organization and organization.owner_id:
-                            owner = db.query(User).filter(User.id == organization.owner_id).first()
-                            if owner and owner.phone:
-                                await notification_service.send_whatsapp_notification(
-                                    owner.phone,
-                                    f"New fine detected for {car.license_plate}: {fine_data['violation']} - AED {fine_data['amount']}"
-                                )
-        
-        db.commit()
-        print(f"✅ Dubai Police fine check completed for {len(contracts)} contracts")
-        
-    except Exception as e:
-        print(f"❌ Error in Dubai Police fine check: {e}")
-    finally:
-        db.close()
+            # Notify owners only about fines this run inserted
+            contracts_by_id = {contract.id: contract for contract in contracts}
+            for fine in new_fines:
+                contract = contracts_by_id[fine.contract_id]
+                if contract.phone:
+                    await notification_service.send_whatsapp_notification(
+                        contract.phone,
+                        f"New fine detected for {contract.license_plate}: {fine.violation} - AED {fine.amount}"
+                    )
+            
+            print(
+                f"✅ Dubai Police fine check completed for {len(contracts)} contracts: "
+                f"{len(new_fines)} new fines, {queries.count} database queries"
+            )
+            
+        except Exception as e:
+            print(f"❌ Error in Dubai Police fine check: {e}")
+        finally:
+            observe_job_queries('daily_fine_check', queries.count)
 
 async def check_expiring_contracts():
     """Daily job to check for expiring contracts"""
@@ -177,3 +190,15 @@ async def generate_daily_reports():
         
     except Exception as e:
         print(f"❌ Error in daily reports generation: {e}")
+
+async def reconcile_dashboard_stats():
+    """Nightly job to correct drift in the per-organization dashboard counters"""
+    print("🧮 Reconciling dashboard counters...")
+    
+    try:
+        result = await asyncio.to_thread(organization_stats_service.reconcile)
+        print(f"✅ Dashboard counters reconciled for {result['organizations']} organizations "
+              f"({result['drifted']} drifted)")
+        
+    except Exception as e:
+        print(f"❌ Error in dashboard counter reconciliation: {e}")
@@ -0,0 +1,67 @@
+"""
+Gunicorn configuration for NavEdge Phase 2 (pre-fork serving mode)
+
+Run with: gunicorn -c gunicorn.conf.py main:app
+
+The app, and with it the YOLO and LPIPS weights, is imported once in the master
+before workers are forked. Weight storages are moved to shared memory and the
+master's objects are frozen out of the garbage collector, so workers share the
+weights copy-on-write instead of each holding a private copy.
+"""
+
+import gc
+import os
+
+from core.config import settings
+
+bind = f"0.0.0.0:{settings.PORT}"
+workers = settings.WEB_CONCURRENCY
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = 120
+graceful_timeout = 30
+
+# Keep the collector from touching (and dirtying) objects while the app loads in the master
+gc.disable()
+
+def when_ready(server):
+    """Runs in the master after the app is loaded, before any worker is forked"""
+    from services.damage_ai_service import damage_ai_service
+    from core.process_memory import get_process_memory
+    
+    damage_ai_service.prepare_for_fork()
+    
+    # Move everything allocated so far to the permanent generation: gc in workers
+    # will never traverse (and write to) these objects' headers
+    gc.freeze()
+    
+    server.log.info(f"Master memory before fork: {get_process_memory()}")
+
+def pre_fork(server, worker):
+    """Runs in the master before each fork: give the worker the lowest free CPU slot"""
+    used_slots = {getattr(w, 'cpu_slot', None) for w in server.WORKERS.values()}
+    worker.cpu_slot = next(slot for slot in range(len(used_slots) + 1) if slot not in used_slots)
+
+def post_fork(server, worker):
+    """Runs in each worker right after fork"""
+    gc.enable()
+    
+    # Connections the master may have opened must not be shared with the worker
+    from core.database import engine, async_engine
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+    
+    from core.resource_governor import resource_governor
+    resource_governor.apply_runtime(worker.cpu_slot)
+
+def post_worker_init(worker):
+    """Runs in each worker once the app is ready to serve"""
+    from core.process_memory import get_process_memory
+    
+    worker.log.info(f"Worker memory after init: {get_process_memory()}")
+
+def child_exit(server, worker):
+    """Drop a dead worker's live gauges from the shared Prometheus directory"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -7,17 +7,24 @@ from fastapi import FastAPI, HTTPException, Depends, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, Response
 import uvicorn
 import os
+import asyncio
 from datetime import datetime
 from typing import Optional, List
 
+# Thread limits have to be exported before numpy/torch/cv2 are first imported
+from core.resource_governor import resource_governor
+resource_governor.apply_env()
+
 # Import routers
 from api.routes import auth, documents, contracts, damage, damage_ai, frontend_hooks, fines, chatbot, notifications, reports
 from core.database import engine, Base
 from core.config import settings
 from core.middleware import AuthMiddleware
+# Registers the flush hook that keeps per-organization dashboard counters current
+import services.organization_stats_service  # noqa: F401
 
 # Create FastAPI app
 app = FastAPI(
@@ -58,28 +65,66 @@ app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 @app.on_event("startup")
 async def startup_event():
     """Initialize database and start background services"""
-    # Create database tables
-    Base.metadata.create_all(bind=engine)
+    # Schema setup and the schedulers run in one process only; under gunicorn the other
+    # workers just serve requests
+    from core.leader_lock import scheduler_leader
+    if scheduler_leader.acquire():
+        # Create database tables
+        Base.metadata.create_all(bind=engine)
+        
+        # Monthly partitions of damage_detections/damage_labels (then kept ahead by the scheduler)
+        from services.partition_service import partition_service
+        partition_service.ensure_partitions()
+        
+        # Start background job scheduler
+        from core.scheduler import start_scheduler
+        start_scheduler()
+        
+        # Start damage AI scheduler
+        from core.damage_ai_scheduler import damage_ai_scheduler
+        damage_ai_scheduler.start()
+        
+        print(f"Schedulers running in process {os.getpid()}")
     
-    # Start background job scheduler
-    from core.scheduler import start_scheduler
-    start_scheduler()
+    # Cap torch/OpenCV threads (already done per worker under gunicorn)
+    if not resource_governor.runtime_applied:
+        resource_governor.apply_runtime()
     
-    # Start damage AI scheduler
-    from core.damage_ai_scheduler import damage_ai_scheduler
-    damage_ai_scheduler.start()
+    # Warm up damage AI models off the event loop; /health/ready stays 503 until done
+    from services.damage_ai_service import damage_ai_service
+    asyncio.get_running_loop().run_in_executor(None, damage_ai_service.warm_up)
     
     print("🚀 NavEdge Phase 2 Backend started successfully!")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on shutdown"""
-    from core.scheduler import stop_scheduler
-    stop_scheduler()
+    from core.leader_lock import scheduler_leader
+    if scheduler_leader.held:
+        from core.scheduler import stop_scheduler
+        stop_scheduler()
+        
+        # Stop damage AI scheduler
+        from core.damage_ai_scheduler import damage_ai_scheduler
+        damage_ai_scheduler.stop()
+        
+        # Let a restarted worker take over the schedulers
+        scheduler_leader.release()
+    
+    # Drop queued shadow evaluations
+    from services.shadow_evaluation_service import shadow_evaluation_service
+    shadow_evaluation_service.shutdown()
+    
+    # Drop queued rendition and tile generation
+    from services.rendition_service import rendition_service
+    from services.tiling_service import tiling_service
+    rendition_service.shutdown()
+    tiling_service.shutdown()
+    
+    # Close pooled async database connections
+    from core.database import async_engine
+    await async_engine.dispose()
     
-    # Stop damage AI scheduler
-    from core.damage_ai_scheduler import damage_ai_scheduler
-    damage_ai_scheduler.stop()
     print("🛑 NavEdge Phase 2 Backend stopped")
 
 @app.get("/")
@@ -101,6 +146,73 @@ async def health_check():
         "version": "2.0.0"
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint (per-stage damage AI latency histograms)"""
+    from core.metrics import render_metrics
+    
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness probe: not ready until damage AI models are warmed up"""
+    from services.damage_ai_service import damage_ai_service
+    
+    ready = damage_ai_service.ready.is_set()
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={
+            "status": "ready" if ready else "warming_up",
+            "warmup": damage_ai_service.warmup_report,
+            "timestamp": datetime.now().isoformat()
+        }
+    )
+
+@app.get("/health/memory")
+async def memory_check():
+    """Shared (copy-on-write with the pre-fork master) versus private memory of this worker"""
+    from core.process_memory import get_process_memory
+    
+    return {
+        **get_process_memory(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/health/resources")
+async def resource_diagnostics():
+    """Thread budgets and CPU pinning chosen by the resource governor for this worker"""
+    return {
+        **resource_governor.snapshot(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/health/cache")
+async def cache_diagnostics():
+    """S3 disk cache and presigned URL cache hit rates for this worker (node-wide counters are on /metrics)"""
+    from services.s3_storage import s3_service
+    from services.presign_service import presign_service
+    
+    presign = {
+        "hit_rate": presign_service.hit_rate,
+        "stats": presign_service.stats,
+        "entries": presign_service.size,
+        "max_entries": settings.PRESIGN_CACHE_MAX_ENTRIES
+    }
+    
+    cache = s3_service.disk_cache
+    if not cache:
+        return {"enabled": False, "presign": presign}
+    
+    return {
+        "enabled": True,
+        "hit_rate": cache.hit_rate,
+        "stats": cache.stats,
+        "max_bytes": cache.max_bytes,
+        "presign": presign,
+        "timestamp": datetime.now().isoformat()
+    }
+
 @app.get("/health/detailed")
 async def detailed_health():
     """Detailed health check"""
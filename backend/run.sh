@@ -175,7 +175,7 @@ User=www-data
 Group=www-data
 WorkingDirectory=/opt/navedge/backend
 Environment=PATH=/opt/navedge/venv/bin
-ExecStart=/opt/navedge/venv/bin/python main.py
+ExecStart=/opt/navedge/venv/bin/gunicorn -c gunicorn.conf.py main:app
 Restart=always
 RestartSec=10
 
@@ -0,0 +1,253 @@
+"""
+Content-Addressed Blob Store
+Stores objects under their SHA-256 so identical bytes are uploaded once, with
+reference-counted garbage collection
+"""
+
+import hashlib
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import Integer, String, case, column, func, literal_column, update, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.database import SessionLocal, StorageBlob, StorageBlobRef
+from services.s3_storage import s3_service
+
+CONTENT_TYPES = {
+    'jpg': 'image/jpeg',
+    'jpeg': 'image/jpeg',
+    'png': 'image/png',
+    'webp': 'image/webp',
+    'pdf': 'application/pdf'
+}
+
+class BlobStore:
+    def __init__(self):
+        self.stats = {'uploaded': 0, 'deduplicated': 0, 'failed': 0, 'collected': 0}
+
+    def blob_key(self, sha256: str, extension: str) -> str:
+        """blobs/ab/cd/abcd....jpg - two levels of fan-out keep listings small"""
+        return f"{settings.BLOB_PREFIX}/{sha256[:2]}/{sha256[2:4]}/{sha256}.{extension.lower().lstrip('.')}"
+
+    def put(self, data: bytes, extension: str, owner_type: str, owner_id: str, role: str) -> Optional[str]:
+        """
+        Store bytes and reference them from an owner's slot
+
+        The upload is skipped when a blob with the same SHA-256 is already indexed in
+        storage_blobs, or (for a new index row) already present in S3 per a HEAD request.
+        Re-putting a slot with different bytes moves the reference to the new blob.
+
+        Args:
+            data: Object bytes
+            extension: File extension, used for the key and content type
+            owner_type: damage_detection or document_upload
+            owner_id: ID of the owning record
+            role: Slot within the owner, e.g. before_image or ssim_heatmap
+
+        Returns:
+            S3 URL of the blob, None if it could not be stored
+        """
+        sha256 = hashlib.sha256(data).hexdigest()
+        owner_id = uuid.UUID(str(owner_id))
+        now = datetime.utcnow()
+
+        db = SessionLocal()
+        try:
+            existing = db.query(StorageBlobRef).filter(
+                StorageBlobRef.owner_type == owner_type,
+                StorageBlobRef.owner_id == owner_id,
+                StorageBlobRef.role == role
+            ).with_for_update().first()
+
+            if existing and existing.sha256 == sha256:
+                blob = db.get(StorageBlob, sha256)
+                db.commit()
+                self.stats['deduplicated'] += 1
+                return s3_service._url_for_key(blob.key)
+
+            # Take a reference first; this waits on any GC pass holding the row, so a
+            # blob is never deleted from S3 after we decide to reuse it
+            stmt = insert(StorageBlob).values(
+                sha256=sha256,
+                key=self.blob_key(sha256, extension),
+                size_bytes=len(data),
+                content_type=CONTENT_TYPES.get(extension.lower().lstrip('.'), 'application/octet-stream'),
+                ref_count=1,
+                created_at=now,
+                last_referenced_at=now
+            ).on_conflict_do_update(
+                index_elements=[StorageBlob.sha256],
+                set_={
+                    'ref_count': StorageBlob.ref_count + 1,
+                    'orphaned_at': None,
+                    'last_referenced_at': now
+                }
+            ).returning(StorageBlob.key, StorageBlob.content_type, literal_column('(xmax = 0)').label('inserted'))
+            row = db.execute(stmt).one()
+            url = s3_service._url_for_key(row.key)
+
+            if row.inserted and not s3_service.object_exists(url):
+                folder, _, filename = row.key.rpartition('/')
+                if not s3_service.upload_file(data, folder, filename, row.content_type):
+                    raise RuntimeError(f"upload of {row.key} failed")
+                self.stats['uploaded'] += 1
+            else:
+                self.stats['deduplicated'] += 1
+
+            if existing:
+                self._decrement(db, Counter([existing.sha256]), now)
+                existing.sha256 = sha256
+                existing.created_at = now
+            else:
+                db.add(StorageBlobRef(sha256=sha256, owner_type=owner_type, owner_id=owner_id, role=role))
+
+            db.commit()
+            return url
+
+        except Exception as e:
+            db.rollback()
+            self.stats['failed'] += 1
+            print(f"Blob store put failed for {owner_type}/{owner_id}/{role}: {e}")
+            return None
+        finally:
+            db.close()
+
+    def put_many(self, owner_type: str, owner_id: str,
+                 items: Dict[str, Tuple[bytes, str]]) -> Dict[str, Optional[str]]:
+        """
+        Store several slots of one owner concurrently over the S3 connection pool
+
+        Args:
+            items: role -> (bytes, extension)
+
+        Returns:
+            role -> S3 URL (None where storing failed)
+        """
+        futures = {
+            role: s3_service.executor.submit(self.put, data, extension, owner_type, owner_id, role)
+            for role, (data, extension) in items.items()
+        }
+        return {role: future.result() for role, future in futures.items()}
+
+    def release(self, owner_type: str, owner_ids: List[str], roles: Optional[List[str]] = None,
+                db: Optional[Session] = None) -> int:
+        """
+        Drop references held by owners (e.g. purged detections)
+
+        Blobs whose count reaches zero are marked orphaned and deleted by collect_garbage
+        after BLOB_GC_GRACE_HOURS.
+
+        Args:
+            db: Session of the caller's transaction (e.g. the one deleting the owners);
+                the caller commits. A new session is used and committed otherwise.
+
+        Returns:
+            Number of references removed
+        """
+        if not owner_ids:
+            return 0
+
+        if db is not None:
+            return self._release(db, owner_type, owner_ids, roles)
+
+        db = SessionLocal()
+        try:
+            released = self._release(db, owner_type, owner_ids, roles)
+            db.commit()
+            return released
+
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _release(self, db: Session, owner_type: str, owner_ids: List[str], roles: Optional[List[str]]) -> int:
+        query = db.query(StorageBlobRef).filter(
+            StorageBlobRef.owner_type == owner_type,
+            StorageBlobRef.owner_id.in_([uuid.UUID(str(owner_id)) for owner_id in owner_ids])
+        )
+        if roles:
+            query = query.filter(StorageBlobRef.role.in_(roles))
+
+        released = Counter(sha256 for (sha256,) in query.with_entities(StorageBlobRef.sha256).all())
+        query.delete(synchronize_session=False)
+        self._decrement(db, released, datetime.utcnow())
+        return sum(released.values())
+
+    def collect_garbage(self, batch_size: int = 500) -> int:
+        """
+        Delete orphaned blobs (and their renditions and tiles) from S3 and the index
+
+        Rows are locked while their objects are deleted, so a concurrent put of the same
+        bytes waits and then re-uploads instead of referencing a deleted object.
+
+        Returns:
+            Number of blobs deleted
+        """
+        cutoff = datetime.utcnow() - timedelta(hours=settings.BLOB_GC_GRACE_HOURS)
+        collected = 0
+
+        while True:
+            db = SessionLocal()
+            try:
+                blobs = db.query(StorageBlob).filter(
+                    StorageBlob.ref_count <= 0,
+                    StorageBlob.orphaned_at < cutoff
+                ).with_for_update(skip_locked=True).limit(batch_size).all()
+
+                if not blobs:
+                    db.commit()
+                    return collected
+
+                self._delete_objects([blob.key for blob in blobs])
+                for blob in blobs:
+                    db.delete(blob)
+
+                db.commit()
+                collected += len(blobs)
+                self.stats['collected'] += len(blobs)
+
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+
+            if len(blobs) < batch_size:
+                return collected
+
+    def _decrement(self, db, counts: Counter, now: datetime):
+        # One set-based UPDATE instead of a locking SELECT per blob
+        if not counts:
+            return
+        released = values(
+            column('sha256', String), column('refs', Integer), name='released'
+        ).data(sorted(counts.items()))
+        remaining = StorageBlob.ref_count - released.c.refs
+        db.execute(
+            update(StorageBlob)
+            .where(StorageBlob.sha256 == released.c.sha256)
+            .values(
+                ref_count=func.greatest(remaining, 0),
+                orphaned_at=case((remaining <= 0, now), else_=StorageBlob.orphaned_at)
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    def _delete_objects(self, keys: List[str]):
+        """Delete blobs (batched) and the renditions and tiles derived from them"""
+        s3_service.delete_keys(keys)
+        for key in keys:
+            folder, _, filename = key.rpartition('/')
+            stem = filename.rsplit('.', 1)[0]
+            s3_service.delete_prefix(f"{folder}/renditions/{stem}")
+            s3_service.delete_prefix(f"{folder}/tiles/{stem}")
+
+# Global blob store instance
+blob_store = BlobStore()
@@ -13,6 +13,7 @@ import io
 import json
 from typing import Tuple, Dict, List, Optional, Any
 import time
+import threading
 from datetime import datetime
 import uuid
 
@@ -33,13 +34,27 @@ except ImportError:
     print("LPIPS not available. Install with: pip install lpips")
 
 from services.s3_storage import s3_service
+from services.blob_store import blob_store
+from services.model_weights_cache import model_weights_cache
 from core.config import settings
+from core.metrics import StageTimer
 
 class DamageAIService:
-    def __init__(self):
+    def __init__(self, yolo_model_path: str = None, model_version: str = 'v1.1'):
         self.yolo_model = None
         self.lpips_model = None
+        self.yolo_model_path = yolo_model_path or settings.YOLO_MODEL_PATH
+        self.model_version = model_version
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        
+        # Number of interactive detect_damage calls currently running
+        self._inflight = 0
+        self._inflight_lock = threading.Lock()
+        
+        # Set once warm_up() has run (or immediately when warm-up is disabled)
+        self.ready = threading.Event()
+        self.warmup_report: Dict[str, Any] = {'status': 'pending'}
+        
         self._initialize_models()
     
     def _initialize_models(self):
@@ -47,8 +62,8 @@ class DamageAIService:
         # Initialize YOLOv8n-seg model
         if YOLO_AVAILABLE:
             try:
-                self.yolo_model = YOLO('yolov8n-seg.pt')
-                print(f"YOLOv8n-seg model loaded on {self.device}")
+                self.yolo_model = YOLO(self.yolo_model_path)
+                print(f"YOLOv8n-seg model {self.model_version} loaded on {self.device}")
             except Exception as e:
                 print(f"Failed to load YOLOv8 model: {e}")
                 self.yolo_model = None
@@ -56,12 +71,121 @@ class DamageAIService:
         # Initialize LPIPS model
         if LPIPS_AVAILABLE:
             try:
-                self.lpips_model = lpips.LPIPS(net='alex').to(self.device)
+                self.lpips_model = lpips.LPIPS(net=settings.LPIPS_MODEL_PATH).to(self.device)
                 print(f"LPIPS model loaded on {self.device}")
             except Exception as e:
                 print(f"Failed to load LPIPS model: {e}")
                 self.lpips_model = None
     
+    def warm_up(self) -> Dict[str, Any]:
+        """
+        Run dummy inferences so the first real request doesn't pay for lazy initialisation
+        
+        Every configured resolution and batch size goes through SSIM, LPIPS, YOLO and
+        overlay encoding once, then model weight pages are touched so they are resident.
+        
+        Returns:
+            Warm-up report with per-shape timings
+        """
+        if not settings.WARMUP_ENABLED:
+            self.warmup_report = {'status': 'skipped'}
+            self.ready.set()
+            return self.warmup_report
+        
+        start_time = time.time()
+        self.warmup_report = {'status': 'running', 'shapes': []}
+        rng = np.random.default_rng(0)
+        
+        try:
+            for width, height in _parse_resolutions(settings.WARMUP_RESOLUTIONS):
+                before_img = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+                after_img = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+                
+                for batch_size in _parse_batch_sizes(settings.WARMUP_BATCH_SIZES):
+                    shape_start = time.time()
+                    
+                    if batch_size == 1:
+                        # Full single-request path, minus the S3 upload
+                        ssim_score, ssim_heatmap = self._compute_ssim(before_img, after_img)
+                        lpips_score, lpips_heatmap = self._compute_lpips(before_img, after_img)
+                        yolo_results = self._yolo_damage_detection(before_img, after_img)
+                        overlays = self._generate_overlays(
+                            before_img, after_img, ssim_heatmap, lpips_heatmap, yolo_results
+                        )
+                        for overlay_img in overlays.values():
+                            cv2.imencode('.jpg', overlay_img)
+                    else:
+                        self._compute_lpips_batch([(before_img, after_img)] * batch_size)
+                        self._yolo_damage_detection_batch([after_img] * batch_size)
+                    
+                    self.warmup_report['shapes'].append({
+                        'resolution': f"{width}x{height}",
+                        'batch_size': batch_size,
+                        'time_ms': int((time.time() - shape_start) * 1000)
+                    })
+            
+            self.warmup_report['touched_bytes'] = self._touch_model_pages()
+            self.warmup_report['status'] = 'completed'
+            
+        except Exception as e:
+            # A failed warm-up only costs latency, so the worker still becomes ready
+            print(f"Damage AI warm-up error: {e}")
+            self.warmup_report['status'] = 'failed'
+            self.warmup_report['error'] = str(e)
+        
+        self.warmup_report['total_time_ms'] = int((time.time() - start_time) * 1000)
+        self.ready.set()
+        print(f"Damage AI warm-up {self.warmup_report['status']} in {self.warmup_report['total_time_ms']} ms")
+        return self.warmup_report
+    
+    def _touch_model_pages(self) -> int:
+        """Read one element per memory page of every weight tensor so the pages are resident"""
+        modules = [self.lpips_model]
+        if self.yolo_model is not None:
+            modules.append(getattr(self.yolo_model, 'model', None))
+        
+        touched = 0
+        with torch.no_grad():
+            for module in modules:
+                if module is None:
+                    continue
+                for tensor in list(module.parameters()) + list(module.buffers()):
+                    if tensor.device.type != 'cpu' or tensor.numel() == 0:
+                        continue
+                    stride = max(1, 4096 // tensor.element_size())
+                    tensor.detach().reshape(-1)[::stride].sum()
+                    touched += tensor.numel() * tensor.element_size()
+        
+        return touched
+    
+    def prepare_for_fork(self):
+        """
+        Make loaded weights safe to share copy-on-write with forked workers
+        
+        Called in the pre-fork master. Weights are frozen (no autograd bookkeeping
+        writes) and their storages moved to shared memory, so a write in one worker
+        can never turn a shared page into a private copy. No inference runs here:
+        OpenMP thread pools started before fork hang in the children, so warm-up
+        still happens per worker.
+        """
+        modules = [self.lpips_model]
+        if self.yolo_model is not None:
+            modules.append(getattr(self.yolo_model, 'model', None))
+        
+        for module in modules:
+            if module is None:
+                continue
+            module.eval()
+            for param in module.parameters():
+                param.requires_grad_(False)
+            if self.device.type == 'cpu':
+                module.share_memory()
+    
+    @property
+    def inflight_requests(self) -> int:
+        """Number of interactive detections currently being processed"""
+        return self._inflight
+    
     def detect_damage(self, before_image_bytes: bytes, after_image_bytes: bytes, 
                      contract_id: str = None) -> Dict[str, Any]:
         """
@@ -76,44 +200,57 @@ class DamageAIService:
             Complete damage detection results
         """
         start_time = time.time()
+        timer = StageTimer(self.model_version, len(before_image_bytes) + len(after_image_bytes))
+        
+        with self._inflight_lock:
+            self._inflight += 1
         
         try:
             # Convert bytes to images
-            before_image = self._bytes_to_image(before_image_bytes)
-            after_image = self._bytes_to_image(after_image_bytes)
+            with timer.stage('decode', len(before_image_bytes) + len(after_image_bytes)):
+                before_image = self._bytes_to_image(before_image_bytes)
+                after_image = self._bytes_to_image(after_image_bytes)
             
             # Ensure images are the same size
-            before_image, after_image = self._resize_images(before_image, after_image)
+            with timer.stage('resize'):
+                before_image, after_image = self._resize_images(before_image, after_image)
+            timer.set_resolution(before_image.shape[1], before_image.shape[0])
             
             # Generate unique detection ID
             detection_id = str(uuid.uuid4())
             
             # Step 1: SSIM Analysis
-            ssim_score, ssim_heatmap = self._compute_ssim(before_image, after_image)
+            with timer.stage('ssim', before_image.nbytes * 2):
+                ssim_score, ssim_heatmap = self._compute_ssim(before_image, after_image)
             
             # Step 2: LPIPS Analysis
-            lpips_score, lpips_heatmap = self._compute_lpips(before_image, after_image)
+            with timer.stage('lpips', before_image.nbytes * 2):
+                lpips_score, lpips_heatmap = self._compute_lpips(before_image, after_image)
             
             # Step 3: YOLOv8 Segmentation
-            yolo_results = self._yolo_damage_detection(before_image, after_image)
+            with timer.stage('yolo', before_image.nbytes * 2):
+                yolo_results = self._yolo_damage_detection(before_image, after_image)
             
             # Step 4: Ensemble Decision
-            damage_detected, confidence, severity = self._ensemble_decision(
-                ssim_score, lpips_score, yolo_results
-            )
+            with timer.stage('ensemble'):
+                damage_detected, confidence, severity = self._ensemble_decision(
+                    ssim_score, lpips_score, yolo_results
+                )
             
             # Step 5: Generate overlays and heatmaps
-            overlays = self._generate_overlays(
-                before_image, after_image, ssim_heatmap, lpips_heatmap, yolo_results
-            )
+            with timer.stage('overlay'):
+                overlays = self._generate_overlays(
+                    before_image, after_image, ssim_heatmap, lpips_heatmap, yolo_results
+                )
             
-            # Step 6: Upload results to S3
+            # Step 6: Upload results to S3 (records 'encode' and 's3_upload' itself)
             s3_urls = self._upload_results_to_s3(
-                detection_id, overlays, ssim_heatmap, lpips_heatmap
+                detection_id, overlays, ssim_heatmap, lpips_heatmap, timer
             )
             
             # Calculate processing time
             processing_time = int((time.time() - start_time) * 1000)
+            timer.record('total', processing_time / 1000, timer.input_bytes)
             
             # Determine if human review is needed
             needs_review = self._needs_human_review(confidence, ssim_score, lpips_score)
@@ -125,12 +262,13 @@ class DamageAIService:
                 'damage_severity': severity,
                 'ssim_score': float(ssim_score),
                 'lpips_score': float(lpips_score),
-                'yolo_detections': yolo_results,
+                'yolo_detections': self._yolo_summary(yolo_results),
                 'processing_time_ms': processing_time,
+                'stage_timings': timer.summary(),
                 'needs_human_review': needs_review,
                 'uncertainty_score': float(1.0 - confidence),
                 's3_urls': s3_urls,
-                'model_version': 'v1.1',
+                'model_version': self.model_version,
                 'status': 'completed'
             }
             
@@ -143,6 +281,66 @@ class DamageAIService:
                 'error': str(e),
                 'status': 'failed'
             }
+        finally:
+            with self._inflight_lock:
+                self._inflight -= 1
+    
+    def score_batch(self, image_pairs: List[Tuple[bytes, bytes]]) -> List[Dict[str, Any]]:
+        """
+        Score several before/after pairs in one pass (used by offline jobs)
+        
+        LPIPS and YOLO run once over the whole batch. Overlays, heatmaps and
+        S3 uploads are skipped since offline callers only need the scores.
+        
+        Args:
+            image_pairs: List of (before_bytes, after_bytes) tuples
+            
+        Returns:
+            One result dict per pair, in input order
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(image_pairs)
+        decoded = []
+        
+        for index, (before_bytes, after_bytes) in enumerate(image_pairs):
+            try:
+                before_image = self._bytes_to_image(before_bytes)
+                after_image = self._bytes_to_image(after_bytes)
+                decoded.append((index, *self._resize_images(before_image, after_image)))
+            except Exception as e:
+                results[index] = {'status': 'failed', 'error': str(e)}
+        
+        if not decoded:
+            return results
+        
+        start_time = time.time()
+        
+        ssim_scores = [self._compute_ssim(before, after)[0] for _, before, after in decoded]
+        lpips_scores = self._compute_lpips_batch([(before, after) for _, before, after in decoded])
+        yolo_batch = self._yolo_damage_detection_batch([after for _, _, after in decoded])
+        
+        per_pair_ms = int((time.time() - start_time) * 1000 / len(decoded))
+        
+        for (index, _, _), ssim_score, lpips_score, yolo_results in zip(
+            decoded, ssim_scores, lpips_scores, yolo_batch
+        ):
+            damage_detected, confidence, severity = self._ensemble_decision(
+                ssim_score, lpips_score, yolo_results
+            )
+            results[index] = {
+                'damage_detected': damage_detected,
+                'confidence_score': float(confidence),
+                'damage_severity': severity,
+                'ssim_score': float(ssim_score),
+                'lpips_score': float(lpips_score),
+                'yolo_detections': self._yolo_summary(yolo_results),
+                'needs_human_review': self._needs_human_review(confidence, ssim_score, lpips_score),
+                'uncertainty_score': float(1.0 - confidence),
+                'processing_time_ms': per_pair_ms,
+                'model_version': self.model_version,
+                'status': 'completed'
+            }
+        
+        return results
     
     def _bytes_to_image(self, image_bytes: bytes) -> np.ndarray:
         """Convert bytes to OpenCV image"""
@@ -189,25 +387,9 @@ class DamageAIService:
             return 0.0, np.zeros_like(before_img)
         
         try:
-            # Convert to PIL and then to tensor
-            before_pil = Image.fromarray(cv2.cvtColor(before_img, cv2.COLOR_BGR2RGB))
-            after_pil = Image.fromarray(cv2.cvtColor(after_img, cv2.COLOR_BGR2RGB))
-            
-            # Resize to 256x256 for LPIPS
-            before_pil = before_pil.resize((256, 256))
-            after_pil = after_pil.resize((256, 256))
-            
-            # Convert to tensor
-            before_tensor = torch.from_numpy(np.array(before_pil)).permute(2, 0, 1).float() / 255.0
-            after_tensor = torch.from_numpy(np.array(after_pil)).permute(2, 0, 1).float() / 255.0
-            
-            # Normalize to [-1, 1]
-            before_tensor = before_tensor * 2.0 - 1.0
-            after_tensor = after_tensor * 2.0 - 1.0
-            
             # Add batch dimension
-            before_tensor = before_tensor.unsqueeze(0).to(self.device)
-            after_tensor = after_tensor.unsqueeze(0).to(self.device)
+            before_tensor = self._lpips_tensor(before_img).unsqueeze(0).to(self.device)
+            after_tensor = self._lpips_tensor(after_img).unsqueeze(0).to(self.device)
             
             # Compute LPIPS
             with torch.no_grad():
@@ -228,6 +410,30 @@ class DamageAIService:
             print(f"LPIPS computation error: {e}")
             return 0.0, np.zeros_like(before_img)
     
+    def _lpips_tensor(self, img: np.ndarray) -> torch.Tensor:
+        """Convert an OpenCV image to a 256x256 LPIPS input tensor in [-1, 1]"""
+        pil_img = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB)).resize((256, 256))
+        tensor = torch.from_numpy(np.array(pil_img)).permute(2, 0, 1).float() / 255.0
+        return tensor * 2.0 - 1.0
+    
+    def _compute_lpips_batch(self, image_pairs: List[Tuple[np.ndarray, np.ndarray]]) -> List[float]:
+        """Compute LPIPS scores for several pairs with a single forward pass"""
+        if not self.lpips_model:
+            return [0.0] * len(image_pairs)
+        
+        try:
+            before_batch = torch.stack([self._lpips_tensor(before) for before, _ in image_pairs]).to(self.device)
+            after_batch = torch.stack([self._lpips_tensor(after) for _, after in image_pairs]).to(self.device)
+            
+            with torch.no_grad():
+                scores = self.lpips_model(before_batch, after_batch)
+            
+            return [float(score) for score in scores.flatten().tolist()]
+            
+        except Exception as e:
+            print(f"LPIPS batch computation error: {e}")
+            return [0.0] * len(image_pairs)
+    
     def _yolo_damage_detection(self, before_img: np.ndarray, after_img: np.ndarray) -> Dict[str, Any]:
         """YOLOv8 damage detection and segmentation"""
         if not self.yolo_model:
@@ -238,41 +444,66 @@ class DamageAIService:
             before_results = self.yolo_model(before_img)
             after_results = self.yolo_model(after_img)
             
-            # Process results
-            detections = []
-            masks = []
-            
-            # Compare detections between before and after
-            for result in after_results:
-                if result.masks is not None:
-                    for i, mask in enumerate(result.masks.data):
-                        confidence = result.boxes.conf[i].item()
-                        if confidence > 0.5:  # Confidence threshold
-                            # Get bounding box
-                            box = result.boxes.xyxy[i].cpu().numpy()
-                            
-                            detections.append({
-                                'class': 'damage',
-                                'confidence': confidence,
-                                'bbox': box.tolist(),
-                                'area': (box[2] - box[0]) * (box[3] - box[1])
-                            })
-                            
-                            # Convert mask to image
-                            mask_img = mask.cpu().numpy()
-                            mask_img = (mask_img * 255).astype(np.uint8)
-                            masks.append(mask_img)
-            
-            return {
-                'detections': detections,
-                'masks': masks,
-                'confidence': max([d['confidence'] for d in detections]) if detections else 0.0
-            }
+            return self._parse_yolo_results(after_results)
             
         except Exception as e:
             print(f"YOLOv8 detection error: {e}")
             return {'detections': [], 'masks': [], 'confidence': 0.0}
     
+    def _yolo_damage_detection_batch(self, after_imgs: List[np.ndarray]) -> List[Dict[str, Any]]:
+        """YOLOv8 detection over a batch of after images"""
+        empty = {'detections': [], 'masks': [], 'confidence': 0.0}
+        if not self.yolo_model:
+            return [dict(empty) for _ in after_imgs]
+        
+        try:
+            batch_results = self.yolo_model(after_imgs)
+            return [self._parse_yolo_results([result]) for result in batch_results]
+            
+        except Exception as e:
+            print(f"YOLOv8 batch detection error: {e}")
+            return [dict(empty) for _ in after_imgs]
+    
+    def _parse_yolo_results(self, results) -> Dict[str, Any]:
+        """Convert raw YOLOv8 results into detections, masks and max confidence"""
+        # Process results
+        detections = []
+        masks = []
+        
+        for result in results:
+            if result.masks is not None:
+                for i, mask in enumerate(result.masks.data):
+                    confidence = result.boxes.conf[i].item()
+                    if confidence > 0.5:  # Confidence threshold
+                        # Get bounding box
+                        box = result.boxes.xyxy[i].cpu().numpy()
+                        
+                        # Plain Python numbers; these dicts are stored as JSON
+                        detections.append({
+                            'class': 'damage',
+                            'confidence': float(confidence),
+                            'bbox': box.tolist(),
+                            'area': float((box[2] - box[0]) * (box[3] - box[1]))
+                        })
+                        
+                        # Convert mask to image
+                        mask_img = mask.cpu().numpy()
+                        mask_img = (mask_img * 255).astype(np.uint8)
+                        masks.append(mask_img)
+        
+        return {
+            'detections': detections,
+            'masks': masks,
+            'confidence': max([d['confidence'] for d in detections]) if detections else 0.0
+        }
+    
+    def _yolo_summary(self, yolo_results: Dict[str, Any]) -> Dict[str, Any]:
+        """YOLO results without the masks, as stored in yolo_detections and returned to clients"""
+        return {
+            'detections': yolo_results['detections'],
+            'confidence': float(yolo_results['confidence'])
+        }
+    
     def _ensemble_decision(self, ssim_score: float, lpips_score: float, 
                           yolo_results: Dict[str, Any]) -> Tuple[bool, float, str]:
         """Make ensemble decision based on all models"""
@@ -361,41 +592,46 @@ class DamageAIService:
         return overlays
     
     def _upload_results_to_s3(self, detection_id: str, overlays: Dict[str, np.ndarray],
-                             ssim_heatmap: np.ndarray, lpips_heatmap: np.ndarray) -> Dict[str, str]:
+                             ssim_heatmap: np.ndarray, lpips_heatmap: np.ndarray,
+                             timer: StageTimer = None) -> Dict[str, str]:
         """Upload all results to S3"""
         
         s3_urls = {}
         
+        # (result key, image, S3 folder, filename)
+        uploads = [
+            (f"{overlay_type}_overlay", overlay_img, f"damage-overlays/{detection_id}", f"{overlay_type}_overlay.jpg")
+            for overlay_type, overlay_img in overlays.items()
+        ]
+        uploads.append(('ssim_heatmap', ssim_heatmap, f"damage-heatmaps/{detection_id}", "ssim_heatmap.jpg"))
+        uploads.append(('lpips_heatmap', lpips_heatmap, f"damage-heatmaps/{detection_id}", "lpips_heatmap.jpg"))
+        
         try:
-            # Upload overlays
-            for overlay_type, overlay_img in overlays.items():
-                _, buffer = cv2.imencode('.jpg', overlay_img)
-                url = s3_service.upload_image(
-                    buffer.tobytes(),
-                    f"damage-overlays/{detection_id}",
-                    f"{overlay_type}_overlay.jpg"
-                )
+            encoded = []
+            for result_key, image, folder, filename in uploads:
+                encode_start = time.perf_counter()
+                _, buffer = cv2.imencode('.jpg', image)
+                encoded.append((buffer.tobytes(), folder, filename))
+                if timer:
+                    timer.record('encode', time.perf_counter() - encode_start, image.nbytes)
+            
+            # All results go up in parallel over the pooled client
+            upload_start = time.perf_counter()
+            if settings.CONTENT_ADDRESSED_STORAGE:
+                stored = blob_store.put_many('damage_detection', detection_id, {
+                    result_key: (image_bytes, 'jpg')
+                    for (result_key, _, _, _), (image_bytes, _, _) in zip(uploads, encoded)
+                })
+                urls = [stored[result_key] for result_key, _, _, _ in uploads]
+            else:
+                urls = s3_service.upload_images(encoded)
+            if timer:
+                timer.record('s3_upload', time.perf_counter() - upload_start,
+                             sum(len(image_bytes) for image_bytes, _, _ in encoded))
+            
+            for (result_key, _, _, _), url in zip(uploads, urls):
                 if url:
-                    s3_urls[f"{overlay_type}_overlay"] = url
-            
-            # Upload heatmaps
-            _, ssim_buffer = cv2.imencode('.jpg', ssim_heatmap)
-            ssim_url = s3_service.upload_image(
-                ssim_buffer.tobytes(),
-                f"damage-heatmaps/{detection_id}",
-                "ssim_heatmap.jpg"
-            )
-            if ssim_url:
-                s3_urls['ssim_heatmap'] = ssim_url
-            
-            _, lpips_buffer = cv2.imencode('.jpg', lpips_heatmap)
-            lpips_url = s3_service.upload_image(
-                lpips_buffer.tobytes(),
-                f"damage-heatmaps/{detection_id}",
-                "lpips_heatmap.jpg"
-            )
-            if lpips_url:
-                s3_urls['lpips_heatmap'] = lpips_url
+                    s3_urls[result_key] = url
             
         except Exception as e:
             print(f"S3 upload error: {e}")
@@ -456,5 +692,54 @@ class DamageAIService:
                 'error': str(e)
             }
 
+def _parse_resolutions(value: str) -> List[Tuple[int, int]]:
+    """Parse '640x480,1920x1080' into [(640, 480), (1920, 1080)]"""
+    resolutions = []
+    for item in value.split(','):
+        if item.strip():
+            width, height = item.lower().split('x')
+            resolutions.append((int(width), int(height)))
+    return resolutions
+
+def _parse_batch_sizes(value: str) -> List[int]:
+    """Parse '1,4' into [1, 4]"""
+    return [int(item) for item in value.split(',') if item.strip()]
+
+def _fetch_model_weights(model_version: str, weights_path: Optional[str]) -> str:
+    """Return a local path for model weights, fetching S3 weights into the versioned weights cache"""
+    if not weights_path:
+        return settings.YOLO_MODEL_PATH
+    
+    if not weights_path.startswith('https://'):
+        return weights_path
+    
+    return model_weights_cache.get(model_version, weights_path)
+
+# Services for model versions other than the serving one (re-scoring, evaluation)
+_versioned_services: Dict[str, DamageAIService] = {}
+_versioned_services_lock = threading.Lock()
+
+def get_damage_ai_service(model_version: str = None, weights_path: str = None) -> DamageAIService:
+    """
+    Get a DamageAIService for a specific model version
+    
+    Args:
+        model_version: DamageModel.model_version, defaults to the serving model
+        weights_path: DamageModel.model_weights_path (S3 URL or local path)
+        
+    Returns:
+        Cached service instance with that version's weights loaded
+    """
+    if not model_version or model_version == damage_ai_service.model_version:
+        return damage_ai_service
+    
+    with _versioned_services_lock:
+        service = _versioned_services.get(model_version)
+        if service is None:
+            service = DamageAIService(_fetch_model_weights(model_version, weights_path), model_version)
+            _versioned_services[model_version] = service
+    
+    return service
+
 # Global service instance
 damage_ai_service = DamageAIService()
\ No newline at end of file
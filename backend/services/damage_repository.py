@@ -0,0 +1,345 @@
+"""
+Damage Repository
+Data access for damage_detections, damage_labels, damage_models, damage_training_jobs and
+damage_metrics over the pooled SQLAlchemy engine (replaces per-call PostgREST requests)
+"""
+
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Any, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, insert, select, text, tuple_, update, delete
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Session
+
+from core.database import SessionLocal
+from core.damage_ai_models import (
+    DamageDetection, DamageLabel, DamageModel, DamageTrainingJob, DamageMetrics,
+    DETECTION_YOLO_DETECTIONS, DETECTION_YOLO_CONFIDENCE
+)
+
+# Rows per INSERT statement in bulk inserts
+INSERT_BATCH_SIZE = 1000
+
+# Serialises "create a training job unless one is pending or running" across workers
+TRAINING_JOB_LOCK_KEY = 0x64616d616765  # 'damage'
+
+def _plain(value: Any) -> Any:
+    # Rows leave the repository as JSON-ready dicts, like the PostgREST responses they replace
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+def _bind(model, row: Dict[str, Any]) -> Dict[str, Any]:
+    # Routes pass ids as strings; UUID(as_uuid=True) columns bind uuid.UUID
+    columns = model.__table__.c
+    return {
+        key: uuid.UUID(value) if isinstance(value, str) and isinstance(columns[key].type, UUID) else value
+        for key, value in row.items()
+    }
+
+def _columns(model, names: Optional[Sequence[str]] = None):
+    table = model.__table__
+    return [table.c[name] for name in names] if names else list(table.c)
+
+class DamageRepository:
+    """
+    Every method runs in its own transaction, or in the caller's when given db
+
+    With db the method neither commits nor closes, so several calls can be combined
+    atomically:
+
+        with damage_repository.transaction() as db:
+            damage_repository.insert_detections([...], db=db)
+            damage_repository.insert_metrics([...], db=db)
+    """
+
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+
+    @contextmanager
+    def transaction(self) -> Iterator[Session]:
+        """Session committed when the block succeeds and rolled back when it raises"""
+        db = self.session_factory()
+        try:
+            yield db
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    @contextmanager
+    def _session(self, db: Optional[Session]) -> Iterator[Session]:
+        if db is not None:
+            yield db
+        else:
+            with self.transaction() as own:
+                yield own
+
+    def _rows(self, db: Session, stmt) -> List[Dict[str, Any]]:
+        return [{key: _plain(value) for key, value in row.items()} for row in db.execute(stmt).mappings()]
+
+    # Detections
+
+    def insert_detections(self, detections: List[Dict[str, Any]], db: Optional[Session] = None) -> int:
+        """Insert detection rows in batches; returns the number inserted"""
+        with self._session(db) as db:
+            for start in range(0, len(detections), INSERT_BATCH_SIZE):
+                db.execute(insert(DamageDetection), [_bind(DamageDetection, row) for row in detections[start:start + INSERT_BATCH_SIZE]])
+        return len(detections)
+
+    def get_detection(self, detection_id: str, columns: Optional[Sequence[str]] = None,
+                      db: Optional[Session] = None) -> Optional[Dict[str, Any]]:
+        """Detection by id (only the given columns, if any), or None"""
+        detection_uuid = self._uuid(detection_id)
+        if detection_uuid is None:
+            return None
+        with self._session(db) as db:
+            rows = self._rows(db, select(*_columns(DamageDetection, columns)).where(DamageDetection.id == detection_uuid))
+        return rows[0] if rows else None
+
+    def list_detections(self, contract_id: Optional[str] = None, car_id: Optional[str] = None,
+                        status: Optional[str] = None, columns: Optional[Sequence[str]] = None,
+                        after: Optional[Tuple[datetime, uuid.UUID]] = None, limit: int = 50,
+                        damage_class: Optional[str] = None, min_confidence: Optional[float] = None,
+                        db: Optional[Session] = None) -> List[Dict[str, Any]]:
+        """
+        Newest detections first, starting after the keyset position (created_at, id)
+
+        damage_class keeps detections with at least one YOLO detection of that class;
+        min_confidence keeps those whose highest YOLO confidence reaches it. Both are served
+        by the JSONB indexes on yolo_detections.
+        """
+        # A malformed id matches nothing (rather than becoming IS NULL)
+        contract_uuid, car_uuid = self._uuid(contract_id), self._uuid(car_id)
+        if (contract_id and contract_uuid is None) or (car_id and car_uuid is None):
+            return []
+
+        stmt = select(*_columns(DamageDetection, columns))
+        if contract_id:
+            stmt = stmt.where(DamageDetection.contract_id == contract_uuid)
+        if car_id:
+            stmt = stmt.where(DamageDetection.car_id == car_uuid)
+        if status:
+            stmt = stmt.where(DamageDetection.status == status)
+        if damage_class:
+            stmt = stmt.where(DETECTION_YOLO_DETECTIONS.contains([{'class': damage_class}]))
+        if min_confidence is not None:
+            stmt = stmt.where(DETECTION_YOLO_CONFIDENCE >= min_confidence)
+        if after:
+            # The plain created_at bound lets the planner skip partitions after the cursor
+            stmt = stmt.where(DamageDetection.created_at <= after[0],
+                              tuple_(DamageDetection.created_at, DamageDetection.id) < tuple_(*after))
+        stmt = stmt.order_by(DamageDetection.created_at.desc(), DamageDetection.id.desc()).limit(limit)
+
+        with self._session(db) as db:
+            return self._rows(db, stmt)
+
+    def pending_reviews(self, limit: Optional[int] = None, min_uncertainty: Optional[float] = None,
+                        db: Optional[Session] = None) -> List[Dict[str, Any]]:
+        """Detections flagged for human review, most uncertain first"""
+        stmt = select(DamageDetection.__table__).where(DamageDetection.needs_human_review.is_(True))
+        if min_uncertainty is not None:
+            stmt = stmt.where(DamageDetection.uncertainty_score >= min_uncertainty)
+        stmt = stmt.order_by(DamageDetection.uncertainty_score.desc().nulls_last())
+        if limit:
+            stmt = stmt.limit(limit)
+
+        with self._session(db) as db:
+            return self._rows(db, stmt)
+
+    def mark_for_review(self, detection_ids: List[str], db: Optional[Session] = None) -> int:
+        """Flag detections for human review in one UPDATE; returns the rows updated"""
+        if not detection_ids:
+            return 0
+        with self._session(db) as db:
+            result = db.execute(
+                update(DamageDetection)
+                .where(DamageDetection.id.in_([self._uuid(detection_id) for detection_id in detection_ids]))
+                .values(needs_human_review=True, status='pending_review', updated_at=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            )
+        return result.rowcount
+
+    def training_data(self, db: Optional[Session] = None) -> List[Dict[str, Any]]:
+        """Reviewed detections with their labels (one joined query)"""
+        stmt = (
+            select(DamageDetection.id, DamageDetection.before_image_path, DamageDetection.after_image_path,
+                   *[column.label(f'label_{column.name}') for column in DamageLabel.__table__.c])
+            .join(DamageLabel, DamageLabel.detection_id == DamageDetection.id)
+            .where(DamageDetection.status == 'reviewed')
+            .order_by(DamageDetection.id, DamageLabel.created_at)
+        )
+        with self._session(db) as db:
+            rows = self._rows(db, stmt)
+
+        by_detection: Dict[str, Dict[str, Any]] = {}
+        for row in rows:
+            entry = by_detection.setdefault(row['id'], {
+                'detection_id': row['id'],
+                'before_image_path': row['before_image_path'],
+                'after_image_path': row['after_image_path'],
+                'labels': []
+            })
+            entry['labels'].append({key[len('label_'):]: value for key, value in row.items() if key.startswith('label_')})
+        return list(by_detection.values())
+
+    # Labels
+
+    def submit_label(self, label: Dict[str, Any], db: Optional[Session] = None) -> bool:
+        """
+        Store a human label and mark its detection reviewed in one transaction
+
+        The detection update doubles as the existence check (UPDATE ... RETURNING), so a
+        submission is two statements on one connection.
+
+        Returns:
+            False (and nothing written) when the detection does not exist
+        """
+        detection_uuid = self._uuid(label['detection_id'])
+        if detection_uuid is None:
+            return False
+
+        with self._session(db) as db:
+            reviewed = db.execute(
+                update(DamageDetection)
+                .where(DamageDetection.id == detection_uuid)
+                .values(status='reviewed', needs_human_review=False, updated_at=datetime.utcnow())
+                .returning(DamageDetection.id)
+                .execution_options(synchronize_session=False)
+            ).first()
+            if not reviewed:
+                return False
+
+            db.execute(insert(DamageLabel), [_bind(DamageLabel, {**label, 'detection_id': detection_uuid})])
+        return True
+
+    def labels_for_detection(self, detection_id: str, db: Optional[Session] = None) -> List[Dict[str, Any]]:
+        detection_uuid = self._uuid(detection_id)
+        if detection_uuid is None:
+            return []
+        with self._session(db) as db:
+            return self._rows(db, select(DamageLabel.__table__)
+                              .where(DamageLabel.detection_id == detection_uuid)
+                              .order_by(DamageLabel.created_at))
+
+    def count_labels(self, since: Optional[datetime] = None, db: Optional[Session] = None) -> int:
+        stmt = select(func.count()).select_from(DamageLabel)
+        if since:
+            stmt = stmt.where(DamageLabel.created_at > since)
+        with self._session(db) as db:
+            return db.scalar(stmt)
+
+    # Models
+
+    def active_model_id(self, model_type: Optional[str] = None, db: Optional[Session] = None) -> Optional[str]:
+        stmt = select(DamageModel.id).where(DamageModel.is_active.is_(True))
+        if model_type:
+            stmt = stmt.where(DamageModel.model_type == model_type)
+        with self._session(db) as db:
+            return _plain(db.scalar(stmt.order_by(DamageModel.updated_at.desc()).limit(1)))
+
+    def model_ids_for_version(self, model_version: str, db: Optional[Session] = None) -> List[str]:
+        with self._session(db) as db:
+            return [_plain(model_id) for model_id in db.scalars(
+                select(DamageModel.id).where(DamageModel.model_version == model_version)
+            )]
+
+    # Training jobs
+
+    def create_training_job(self, job: Dict[str, Any], db: Optional[Session] = None) -> str:
+        job = _bind(DamageTrainingJob, {'id': uuid.uuid4(), **job})
+        with self._session(db) as db:
+            db.execute(insert(DamageTrainingJob), [job])
+        return str(job['id'])
+
+    def create_training_job_unless_running(self, job: Dict[str, Any]) -> Tuple[bool, str]:
+        """
+        Create a training job unless one is already pending or running
+
+        The check and the insert share a transaction holding an advisory lock, so concurrent
+        triggers cannot both create a job.
+
+        Returns:
+            (created, id of the new job or of the one already in progress)
+        """
+        with self.transaction() as db:
+            db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {'key': TRAINING_JOB_LOCK_KEY})
+            running = db.scalar(
+                select(DamageTrainingJob.id)
+                .where(DamageTrainingJob.status.in_(['pending', 'running']))
+                .order_by(DamageTrainingJob.created_at.desc())
+                .limit(1)
+            )
+            if running:
+                return False, str(running)
+            return True, self.create_training_job(job, db=db)
+
+    def update_training_job(self, job_id: str, values: Dict[str, Any], db: Optional[Session] = None):
+        with self._session(db) as db:
+            db.execute(
+                update(DamageTrainingJob)
+                .where(DamageTrainingJob.id == self._uuid(job_id))
+                .values(**values, updated_at=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            )
+
+    def latest_training_job(self, db: Optional[Session] = None) -> Optional[Dict[str, Any]]:
+        with self._session(db) as db:
+            rows = self._rows(db, select(DamageTrainingJob.__table__)
+                              .order_by(DamageTrainingJob.created_at.desc()).limit(1))
+        return rows[0] if rows else None
+
+    def last_completed_training_at(self, db: Optional[Session] = None) -> Optional[datetime]:
+        with self._session(db) as db:
+            return db.scalar(
+                select(func.max(DamageTrainingJob.completed_at)).where(DamageTrainingJob.status == 'completed')
+            )
+
+    def delete_training_jobs_before(self, cutoff: datetime, db: Optional[Session] = None) -> int:
+        with self._session(db) as db:
+            result = db.execute(
+                delete(DamageTrainingJob)
+                .where(DamageTrainingJob.created_at < cutoff)
+                .execution_options(synchronize_session=False)
+            )
+        return result.rowcount
+
+    # Metrics
+
+    def insert_metrics(self, metrics: List[Dict[str, Any]], db: Optional[Session] = None) -> int:
+        """Insert metric rows in batches; returns the number inserted"""
+        with self._session(db) as db:
+            for start in range(0, len(metrics), INSERT_BATCH_SIZE):
+                db.execute(insert(DamageMetrics), [_bind(DamageMetrics, row) for row in metrics[start:start + INSERT_BATCH_SIZE]])
+        return len(metrics)
+
+    def list_metrics(self, model_ids: Optional[List[str]] = None, limit: Optional[int] = None,
+                     db: Optional[Session] = None) -> List[Dict[str, Any]]:
+        """Metrics newest first, optionally of the given models only"""
+        stmt = select(DamageMetrics.__table__)
+        if model_ids is not None:
+            stmt = stmt.where(DamageMetrics.model_id.in_([self._uuid(model_id) for model_id in model_ids]))
+        stmt = stmt.order_by(DamageMetrics.evaluation_date.desc())
+        if limit:
+            stmt = stmt.limit(limit)
+        with self._session(db) as db:
+            return self._rows(db, stmt)
+
+    def _uuid(self, value: Any) -> Optional[uuid.UUID]:
+        # Ids arrive as strings from routes; a malformed one cannot match any row
+        if value is None or isinstance(value, uuid.UUID):
+            return value
+        try:
+            return uuid.UUID(str(value))
+        except ValueError:
+            return None
+
+# Global damage repository instance
+damage_repository = DamageRepository()
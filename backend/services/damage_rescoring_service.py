@@ -0,0 +1,348 @@
+"""
+Historical Damage Re-scoring Service
+Re-runs a DamageModel over past damage_detections with checkpointing
+"""
+
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, Future
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Any, Tuple
+
+from sqlalchemy import tuple_, update, or_, and_, func
+from sqlalchemy.dialects.postgresql import insert
+
+from core.config import settings
+from core.database import SessionLocal
+from core.damage_ai_models import DamageDetection, DamageModel, DamageRescoreJob, DamageRescoreResult
+from services.damage_ai_service import damage_ai_service, get_damage_ai_service
+from services.s3_storage import s3_service
+
+class DamageRescoringService:
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    def create_job(self, model_version: Optional[str] = None) -> str:
+        """
+        Create a re-scoring job for a model version
+
+        Args:
+            model_version: DamageModel version to re-run, defaults to the active model
+
+        Returns:
+            ID of the new (or already existing unfinished) job
+        """
+        db = SessionLocal()
+        try:
+            query = db.query(DamageModel)
+            if model_version:
+                query = query.filter(DamageModel.model_version == model_version)
+            else:
+                query = query.filter(DamageModel.is_active == True)
+
+            model = query.order_by(DamageModel.created_at.desc()).first()
+            if not model:
+                raise ValueError(f"No damage model found for version {model_version or 'active'}")
+
+            # Reuse an unfinished job so progress is never thrown away
+            existing = db.query(DamageRescoreJob).filter(
+                DamageRescoreJob.model_version == model.model_version,
+                DamageRescoreJob.status.in_(["pending", "running", "paused"])
+            ).first()
+            if existing:
+                return str(existing.id)
+
+            job = DamageRescoreJob(model_id=model.id, model_version=model.model_version, status="pending")
+            db.add(job)
+            db.commit()
+            return str(job.id)
+        finally:
+            db.close()
+
+    def ensure_job_for_active_model(self) -> Optional[str]:
+        """Create a job for the active model if it has never been re-scored"""
+        db = SessionLocal()
+        try:
+            model = db.query(DamageModel).filter(DamageModel.is_active == True).first()
+            if not model or model.model_version == damage_ai_service.model_version:
+                return None
+
+            already_scored = db.query(DamageRescoreJob.id).filter(
+                DamageRescoreJob.model_version == model.model_version
+            ).first()
+            if already_scored:
+                return None
+        finally:
+            db.close()
+
+        return self.create_job(model.model_version)
+
+    def start_job(self, job_id: str) -> bool:
+        """
+        Run a job on a background thread in this process
+
+        Returns:
+            False if this process is already running a job
+        """
+        if self._thread and self._thread.is_alive():
+            return False
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self.run_job, args=(job_id,), name=f"rescore-{job_id}", daemon=True
+        )
+        self._thread.start()
+        return True
+
+    def resume_unfinished_jobs(self):
+        """
+        Pick up pending jobs, jobs paused by a shutdown and jobs whose worker stopped
+        heartbeating
+        """
+        db = SessionLocal()
+        try:
+            stale_before = datetime.utcnow() - timedelta(seconds=settings.RESCORE_HEARTBEAT_TIMEOUT_SECONDS)
+            job = db.query(DamageRescoreJob).filter(
+                or_(
+                    DamageRescoreJob.status.in_(["pending", "paused"]),
+                    and_(DamageRescoreJob.status == "running", DamageRescoreJob.heartbeat_at < stale_before)
+                )
+            ).order_by(DamageRescoreJob.created_at).first()
+            job_id = str(job.id) if job else None
+        finally:
+            db.close()
+
+        if job_id:
+            self.start_job(job_id)
+
+    def stop(self):
+        """Ask the running job to pause at the next checkpoint"""
+        self._stop_event.set()
+
+    def get_job_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get progress of a re-scoring job"""
+        db = SessionLocal()
+        try:
+            job = db.query(DamageRescoreJob).filter(DamageRescoreJob.id == job_id).first()
+            if not job:
+                return None
+
+            return {
+                'job_id': str(job.id),
+                'model_version': job.model_version,
+                'status': job.status,
+                'processed_count': job.processed_count,
+                'failed_count': job.failed_count,
+                'cursor_created_at': job.cursor_created_at,
+                'started_at': job.started_at,
+                'completed_at': job.completed_at,
+                'error_message': job.error_message
+            }
+        finally:
+            db.close()
+
+    def run_job(self, job_id: str):
+        """Run a job until it completes, is paused or fails"""
+        db = SessionLocal()
+
+        try:
+            if not self._claim_job(db, job_id):
+                print(f"Re-scoring job {job_id} is already claimed by another worker")
+                return
+
+            job = db.query(DamageRescoreJob).filter(DamageRescoreJob.id == job_id).first()
+            model = db.query(DamageModel).filter(DamageModel.id == job.model_id).first()
+            service = get_damage_ai_service(job.model_version, model.model_weights_path if model else None)
+
+            print(f"Re-scoring job {job_id} started for model {job.model_version}")
+
+            with ThreadPoolExecutor(max_workers=settings.RESCORE_PREFETCH_WORKERS) as pool:
+                cursor = (job.cursor_created_at, job.cursor_detection_id)
+                page = self._next_page(db, cursor)
+                prefetched = self._prefetch(pool, page)
+
+                while page:
+                    if self._stop_event.is_set():
+                        self._set_status(db, job, "paused")
+                        print(f"Re-scoring job {job_id} paused")
+                        return
+
+                    self._wait_for_spare_capacity(db, job)
+
+                    # Start fetching the next chunk while this one is scored
+                    next_page = self._next_page(db, (page[-1][1], page[-1][0]))
+                    next_prefetched = self._prefetch(pool, next_page)
+
+                    self._score_page(db, job, service, page, prefetched)
+
+                    page, prefetched = next_page, next_prefetched
+
+            job.status = "completed"
+            job.completed_at = datetime.utcnow()
+            db.commit()
+            print(f"Re-scoring job {job_id} completed: {job.processed_count} detections scored")
+
+        except Exception as e:
+            db.rollback()
+            db.execute(
+                update(DamageRescoreJob)
+                .where(DamageRescoreJob.id == job_id)
+                .values(status="failed", error_message=str(e))
+            )
+            db.commit()
+            print(f"Re-scoring job {job_id} failed: {e}")
+        finally:
+            db.close()
+
+    def _claim_job(self, db, job_id: str) -> bool:
+        """Take the job lease with a conditional update so only one worker runs it"""
+        now = datetime.utcnow()
+        stale_before = now - timedelta(seconds=settings.RESCORE_HEARTBEAT_TIMEOUT_SECONDS)
+
+        result = db.execute(
+            update(DamageRescoreJob)
+            .where(
+                DamageRescoreJob.id == job_id,
+                or_(
+                    DamageRescoreJob.status.in_(["pending", "paused"]),
+                    and_(DamageRescoreJob.status == "running", DamageRescoreJob.heartbeat_at < stale_before)
+                )
+            )
+            .values(
+                status="running",
+                worker_id=self.worker_id,
+                heartbeat_at=now,
+                started_at=func.coalesce(DamageRescoreJob.started_at, now),
+                error_message=None
+            )
+        )
+        db.commit()
+        return result.rowcount == 1
+
+    def _set_status(self, db, job: DamageRescoreJob, status: str):
+        job.status = status
+        job.worker_id = None
+        db.commit()
+
+    def _next_page(self, db, cursor: Tuple[Optional[datetime], Optional[uuid.UUID]]) -> List[Tuple]:
+        """Fetch the next chunk of detections after the cursor, ordered by (created_at, id)"""
+        cursor_created_at, cursor_id = cursor
+
+        query = db.query(
+            DamageDetection.id,
+            DamageDetection.created_at,
+            DamageDetection.before_image_path,
+            DamageDetection.after_image_path
+        ).filter(
+            DamageDetection.before_image_path.isnot(None),
+            DamageDetection.after_image_path.isnot(None)
+        )
+
+        if cursor_created_at is not None:
+            # The plain created_at bound lets the planner skip partitions before the cursor
+            query = query.filter(
+                DamageDetection.created_at >= cursor_created_at,
+                tuple_(DamageDetection.created_at, DamageDetection.id) > tuple_(cursor_created_at, cursor_id)
+            )
+
+        return query.order_by(
+            DamageDetection.created_at, DamageDetection.id
+        ).limit(settings.RESCORE_BATCH_SIZE).all()
+
+    def _prefetch(self, pool: ThreadPoolExecutor, page: List[Tuple]) -> List[Tuple[Future, Future]]:
+        """Download before/after images for a page in parallel, through the disk cache"""
+        return [
+            (
+                pool.submit(s3_service.download_file_mapped, before_path),
+                pool.submit(s3_service.download_file_mapped, after_path)
+            )
+            for _, _, before_path, after_path in page
+        ]
+
+    def _score_page(self, db, job: DamageRescoreJob, service, page: List[Tuple],
+                    prefetched: List[Tuple[Future, Future]]):
+        """Score one page, write its results and move the checkpoint forward in one transaction"""
+        pairs = []
+        rows: List[Dict[str, Any]] = []
+
+        for (detection_id, _, _, _), (before_future, after_future) in zip(page, prefetched):
+            before_bytes, after_bytes = before_future.result(), after_future.result()
+            if before_bytes is None or after_bytes is None:
+                rows.append(self._result_row(job, detection_id, {'status': 'failed', 'error': 'image download failed'}))
+            else:
+                pairs.append((detection_id, (before_bytes, after_bytes)))
+
+        scores = service.score_batch([images for _, images in pairs]) if pairs else []
+        for (detection_id, _), result in zip(pairs, scores):
+            rows.append(self._result_row(job, detection_id, result))
+
+        if rows:
+            stmt = insert(DamageRescoreResult).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                constraint="uq_rescore_detection_version",
+                set_={
+                    column: stmt.excluded[column]
+                    for column in rows[0]
+                    if column not in ("id", "detection_id", "model_version")
+                }
+            )
+            db.execute(stmt)
+
+        failed = sum(1 for row in rows if row['status'] == 'failed')
+        last_id, last_created_at = page[-1][0], page[-1][1]
+
+        job.cursor_created_at = last_created_at
+        job.cursor_detection_id = last_id
+        job.processed_count = (job.processed_count or 0) + len(rows) - failed
+        job.failed_count = (job.failed_count or 0) + failed
+        job.heartbeat_at = datetime.utcnow()
+        db.commit()
+
+    def _result_row(self, job: DamageRescoreJob, detection_id, result: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'id': uuid.uuid4(),
+            'job_id': job.id,
+            'detection_id': detection_id,
+            'model_id': job.model_id,
+            'model_version': job.model_version,
+            # Set explicitly so overwriting a shadow result for this version relabels it
+            'source': "rescore",
+            'damage_detected': result.get('damage_detected', False),
+            'confidence_score': result.get('confidence_score'),
+            'damage_severity': result.get('damage_severity'),
+            'ssim_score': result.get('ssim_score'),
+            'lpips_score': result.get('lpips_score'),
+            'yolo_detections': result.get('yolo_detections'),
+            'uncertainty_score': result.get('uncertainty_score'),
+            'inference_time_ms': result.get('processing_time_ms'),
+            'status': result.get('status', 'failed'),
+            'error_message': result.get('error'),
+            'created_at': datetime.utcnow()
+        }
+
+    def _wait_for_spare_capacity(self, db, job: DamageRescoreJob):
+        """Block while interactive traffic or host load leaves no spare CPU"""
+        cpu_count = os.cpu_count() or 1
+        heartbeat_interval = timedelta(seconds=settings.RESCORE_HEARTBEAT_TIMEOUT_SECONDS / 3)
+
+        while not self._stop_event.is_set():
+            busy = damage_ai_service.inflight_requests >= settings.RESCORE_MAX_INTERACTIVE_INFLIGHT
+            load_per_cpu = os.getloadavg()[0] / cpu_count if hasattr(os, 'getloadavg') else 0.0
+
+            if not busy and load_per_cpu <= settings.RESCORE_MAX_LOAD_PER_CPU:
+                return
+
+            # Keep the lease alive while throttled so no other worker takes over
+            if datetime.utcnow() - job.heartbeat_at > heartbeat_interval:
+                job.heartbeat_at = datetime.utcnow()
+                db.commit()
+
+            time.sleep(settings.RESCORE_THROTTLE_SLEEP_SECONDS)
+
+# Global re-scoring service instance
+damage_rescoring_service = DamageRescoringService()
@@ -0,0 +1,94 @@
+"""
+Dashboard Service
+Owner dashboard and financial summary computed as aggregate queries, one row per request
+"""
+
+import uuid
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.database import Contract, Fine, Car
+
+class DashboardService:
+    async def dashboard_stats(self, db: AsyncSession, organization_id: uuid.UUID) -> Dict[str, Any]:
+        """
+        Contract, fine and car totals of an organisation in a single statement
+
+        Each table is aggregated in its own one-row subquery (so the joins never multiply
+        rows) and the three rows are combined into one.
+        """
+        contracts = select(
+            func.count().label('total_contracts'),
+            func.count().filter(Contract.status == "active").label('active_contracts'),
+            func.coalesce(func.sum(Contract.monthly_rent), 0).label('total_revenue')
+        ).where(Contract.organization_id == organization_id).subquery()
+
+        fines = select(
+            func.count().filter(Fine.status == "pending").label('pending_fines'),
+            func.coalesce(func.sum(Fine.amount), 0).label('total_fines_amount')
+        ).select_from(Fine).join(Contract, Contract.id == Fine.contract_id).where(
+            Contract.organization_id == organization_id
+        ).subquery()
+
+        cars = select(
+            func.count().filter(Car.status == "available").label('cars_available'),
+            func.count().filter(Car.status == "rented").label('cars_rented')
+        ).where(Car.organization_id == organization_id).subquery()
+
+        row = (await db.execute(select(contracts, fines, cars))).one()
+        return {
+            'total_contracts': row.total_contracts,
+            'active_contracts': row.active_contracts,
+            'total_revenue': float(row.total_revenue),
+            'pending_fines': row.pending_fines,
+            'total_fines_amount': float(row.total_fines_amount),
+            'cars_available': row.cars_available,
+            'cars_rented': row.cars_rented
+        }
+
+    async def financial_summary(self, db: AsyncSession, organization_id: uuid.UUID,
+                                start_date: Optional[datetime] = None,
+                                end_date: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Revenue, deposit, fine and contract totals for contracts within a period
+
+        Returns:
+            Flat dict of totals; the route shapes it into the response
+        """
+        conditions = [Contract.organization_id == organization_id]
+        if start_date:
+            conditions.append(Contract.start_date >= start_date)
+        if end_date:
+            conditions.append(Contract.end_date <= end_date)
+
+        contracts = select(
+            func.count().label('total_contracts'),
+            func.count().filter(Contract.status == "active").label('active_contracts'),
+            func.count().filter(Contract.status == "expired").label('completed_contracts'),
+            func.coalesce(func.sum(Contract.monthly_rent), 0).label('total_revenue'),
+            func.coalesce(func.sum(Contract.deposit_amount), 0).label('total_deposits')
+        ).where(*conditions).subquery()
+
+        fines = select(
+            func.count().label('fines_count'),
+            func.count().filter(Fine.status == "pending").label('pending_fines'),
+            func.coalesce(func.sum(Fine.amount), 0).label('total_fines')
+        ).select_from(Fine).join(Contract, Contract.id == Fine.contract_id).where(*conditions).subquery()
+
+        row = (await db.execute(select(contracts, fines))).one()
+        return {
+            'total_contracts': row.total_contracts,
+            'active_contracts': row.active_contracts,
+            'completed_contracts': row.completed_contracts,
+            'total_revenue': float(row.total_revenue),
+            'total_deposits': float(row.total_deposits),
+            'fines_count': row.fines_count,
+            'pending_fines': row.pending_fines,
+            'total_fines': float(row.total_fines)
+        }
+
+# Global dashboard service instance
+dashboard_service = DashboardService()
@@ -0,0 +1,185 @@
+"""
+Disk Cache
+Read-through local cache for S3 objects, shared by all workers on a node
+"""
+
+import fcntl
+import hashlib
+import mmap
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Union
+
+from core.metrics import observe_cache_request, set_cache_bytes
+
+# stats key -> metric label
+CACHE_RESULT_LABELS = {'hits': 'hit', 'coalesced': 'coalesced', 'misses': 'miss', 'errors': 'error'}
+
+class DiskCache:
+    """
+    Caches object bytes as files under root, evicting least recently used files by total size
+
+    Files are written to a temp name and renamed into place, so readers never see partial
+    data. A per-key lock (a thread lock plus an flock, so it also holds across worker
+    processes) makes concurrent misses for the same key download it only once.
+    """
+
+    def __init__(self, root: str, max_bytes: int, low_water_ratio: float = 0.9):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.low_water_bytes = int(max_bytes * low_water_ratio)
+        self._thread_locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._evict_lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'errors': 0, 'evictions': 0}
+
+        os.makedirs(os.path.join(root, 'locks'), exist_ok=True)
+        self._approx_bytes = self._scan_size()
+
+    @property
+    def hit_rate(self) -> float:
+        hits = self.stats['hits'] + self.stats['coalesced']
+        total = hits + self.stats['misses']
+        return round(hits / total, 4) if total else 0.0
+
+    def get_or_fetch(self, key: str, fetch: Callable[[], Optional[bytes]]) -> Optional[Union[mmap.mmap, bytes]]:
+        """
+        Memory-mapped contents of key, calling fetch() to fill the cache on a miss
+
+        Returns:
+            Read-only mmap of the cached file (bytes if it could not be cached),
+            or None if fetch() returned nothing
+        """
+        path = self._path(key)
+
+        mapped = self._open(path)
+        if mapped is not None:
+            self._record('hits')
+            return mapped
+
+        with self._key_lock(path):
+            # Another thread or worker may have filled it while we waited
+            mapped = self._open(path)
+            if mapped is not None:
+                self._record('coalesced')
+                return mapped
+
+            try:
+                data = fetch()
+            except Exception:
+                self._record('errors')
+                raise
+            if data is None:
+                self._record('errors')
+                return None
+
+            self._record('misses')
+            self._write(path, data)
+
+        self._approx_bytes += len(data)
+        if self._approx_bytes > self.max_bytes:
+            self._evict()
+
+        # Objects larger than the whole cache are evicted straight away; serve them from memory
+        mapped = self._open(path)
+        return mapped if mapped is not None else data
+
+    def invalidate(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.root, digest[:2], digest)
+
+    def _open(self, path: str) -> Optional[mmap.mmap]:
+        try:
+            with open(path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return None
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        # mtime doubles as the LRU clock; atime is often disabled (noatime)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return mapped
+
+    def _write(self, path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @contextmanager
+    def _key_lock(self, path: str):
+        # Locks are striped by hash prefix so lock files stay bounded (4096) however many keys pass through
+        stripe = os.path.basename(path)[:3]
+        with self._locks_guard:
+            thread_lock = self._thread_locks.setdefault(stripe, threading.Lock())
+
+        with thread_lock:
+            with open(os.path.join(self.root, 'locks', stripe), 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _iter_entries(self):
+        for shard in os.scandir(self.root):
+            if not shard.is_dir() or shard.name == 'locks':
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith('.tmp'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                yield entry.path, stat.st_size, stat.st_mtime
+
+    def _scan_size(self) -> int:
+        size = sum(size for _, size, _ in self._iter_entries())
+        set_cache_bytes(size)
+        return size
+
+    def _evict(self):
+        """Delete least recently used files until the cache is under the low-water mark"""
+        if not self._evict_lock.acquire(blocking=False):
+            return
+        try:
+            # Rescan so files written by other workers on this node are counted
+            entries = sorted(self._iter_entries(), key=lambda entry: entry[2])
+            total = sum(size for _, size, _ in entries)
+
+            for path, size, _ in entries:
+                if total <= self.low_water_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                    self.stats['evictions'] += 1
+                except FileNotFoundError:
+                    continue
+
+            self._approx_bytes = total
+            set_cache_bytes(total)
+        finally:
+            self._evict_lock.release()
+
+    def _record(self, stat: str):
+        self.stats[stat] += 1
+        observe_cache_request(CACHE_RESULT_LABELS[stat])
@@ -0,0 +1,88 @@
+"""
+Fine Ingestion Service
+Stores fines idempotently under a deterministic fingerprint, so repeated or concurrent
+checks never duplicate a fine or notify about it twice
+"""
+
+import hashlib
+import re
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Union
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.database import Fine
+from services.organization_stats_service import organization_stats_service
+
+# Rows per INSERT statement
+INSERT_BATCH_SIZE = 1000
+
+class FineIngestionService:
+    def fingerprint(self, license_plate: str, violation: str, date: datetime,
+                    location: Optional[str], source: str) -> str:
+        """
+        SHA-256 identifying a fine independent of which contract or run found it
+
+        Normalised the same way as the backfill in the fines fingerprint migration:
+        plate without whitespace, upper-cased; violation and location trimmed and
+        lower-cased; date to the second.
+        """
+        parts = [
+            re.sub(r'\s', '', license_plate or '').upper(),
+            (violation or '').strip().lower(),
+            date.strftime('%Y-%m-%dT%H:%M:%S'),
+            (location or '').strip().lower(),
+            source
+        ]
+        return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+
+    def parse_date(self, value: Union[str, datetime]) -> datetime:
+        """Fine dates arrive as ISO strings from the police service"""
+        return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+
+    async def ingest(self, db: AsyncSession, fines: List[Dict[str, Any]]) -> List[Fine]:
+        """
+        Insert fines that are not stored yet (INSERT ... ON CONFLICT DO NOTHING RETURNING)
+
+        The caller commits (the organisation's dashboard counters are updated in the same
+        transaction). Concurrent runs racing on the same fine both succeed, and only
+        the one whose row was inserted gets it back.
+
+        Args:
+            fines: Dicts with contract_id, license_plate, violation, amount, date,
+                location and source
+
+        Returns:
+            The fines actually inserted
+        """
+        rows = {}
+        for fine in fines:
+            date = self.parse_date(fine['date'])
+            fingerprint = self.fingerprint(
+                fine['license_plate'], fine['violation'], date, fine.get('location'), fine['source']
+            )
+            rows.setdefault(fingerprint, {
+                'contract_id': fine['contract_id'],
+                'violation': fine['violation'],
+                'amount': fine['amount'],
+                'date': date,
+                'location': fine.get('location'),
+                'source': fine['source'],
+                'fingerprint': fingerprint
+            })
+
+        rows = list(rows.values())
+        inserted = []
+        for start in range(0, len(rows), INSERT_BATCH_SIZE):
+            stmt = insert(Fine).on_conflict_do_nothing(index_elements=[Fine.fingerprint]).returning(Fine)
+            inserted.extend((await db.scalars(stmt, rows[start:start + INSERT_BATCH_SIZE])).all())
+
+        # These rows bypass the unit of work, so count them for the dashboard explicitly
+        if inserted:
+            await db.run_sync(organization_stats_service.apply_inserted, inserted)
+
+        return inserted
+
+# Global fine ingestion service instance
+fine_ingestion_service = FineIngestionService()
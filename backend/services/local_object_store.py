@@ -0,0 +1,159 @@
+"""
+Local filesystem stand-in for the S3 client
+Implements the subset of the boto3 S3 client API used by S3StorageService
+"""
+
+import hashlib
+import io
+import json
+import os
+import shutil
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+
+from botocore.exceptions import ClientError
+
+class LocalObjectStore:
+    """
+    Stores objects as files under root/<bucket>/<key>, with a .meta.json sidecar
+
+    Used for development and tests (STORAGE_BACKEND=local) so no AWS
+    credentials or network access are needed.
+    """
+
+    def __init__(self, root: str, public_url_prefix: str = "/uploads/object-store"):
+        self.root = root
+        self.public_url_prefix = public_url_prefix.rstrip('/')
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, bucket: str, key: str) -> str:
+        path = os.path.normpath(os.path.join(self.root, bucket, key))
+        if not path.startswith(os.path.normpath(os.path.join(self.root, bucket))):
+            raise ValueError(f"Invalid object key: {key}")
+        return path
+
+    def _not_found(self, operation: str, key: str) -> ClientError:
+        return ClientError({'Error': {'Code': 'NoSuchKey', 'Message': f"{key} not found"}}, operation)
+
+    def _read_meta(self, path: str) -> Dict[str, Any]:
+        try:
+            with open(f"{path}.meta.json") as f:
+                return json.load(f)
+        except OSError:
+            return {}
+
+    def put_object(self, Bucket: str, Key: str, Body, ContentType: str = "application/octet-stream",
+                   Metadata: Optional[Dict[str, str]] = None, **kwargs) -> Dict[str, Any]:
+        data = Body.read() if hasattr(Body, 'read') else Body
+        path = self._path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write-then-rename so readers never see a partial object
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        etag = f'"{hashlib.md5(data).hexdigest()}"'
+        with open(f"{path}.meta.json", 'w') as f:
+            json.dump({'ContentType': ContentType, 'ETag': etag, 'Metadata': Metadata or {}}, f)
+
+        return {'ETag': etag}
+
+    def upload_fileobj(self, Fileobj, Bucket: str, Key: str, ExtraArgs: Optional[Dict[str, Any]] = None,
+                       Config=None, **kwargs):
+        # Managed (multipart) transfer; a local copy needs no parts
+        extra = ExtraArgs or {}
+        self.put_object(
+            Bucket=Bucket, Key=Key, Body=Fileobj,
+            ContentType=extra.get('ContentType', "application/octet-stream"),
+            Metadata=extra.get('Metadata')
+        )
+
+    def download_file(self, Bucket: str, Key: str, Filename: str, Config=None, **kwargs):
+        path = self._path(Bucket, Key)
+        if not os.path.isfile(path):
+            raise self._not_found('HeadObject', Key)
+        shutil.copyfile(path, Filename)
+
+    def head_object(self, Bucket: str, Key: str, **kwargs) -> Dict[str, Any]:
+        path = self._path(Bucket, Key)
+        if not os.path.isfile(path):
+            raise self._not_found('HeadObject', Key)
+
+        meta = self._read_meta(path)
+        return {
+            'ContentLength': os.path.getsize(path),
+            'LastModified': datetime.fromtimestamp(os.path.getmtime(path), tz=timezone.utc),
+            'ContentType': meta.get('ContentType', 'application/octet-stream'),
+            'ETag': meta.get('ETag', '""'),
+            'Metadata': meta.get('Metadata', {})
+        }
+
+    def get_object(self, Bucket: str, Key: str, Range: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+        head = self.head_object(Bucket, Key)
+        with open(self._path(Bucket, Key), 'rb') as f:
+            if Range:
+                start, end = Range.replace('bytes=', '').split('-')
+                f.seek(int(start))
+                data = f.read(int(end) - int(start) + 1 if end else -1)
+            else:
+                data = f.read()
+
+        return {**head, 'ContentLength': len(data), 'Body': io.BytesIO(data)}
+
+    def delete_object(self, Bucket: str, Key: str, **kwargs) -> Dict[str, Any]:
+        path = self._path(Bucket, Key)
+        for candidate in (path, f"{path}.meta.json"):
+            if os.path.exists(candidate):
+                os.remove(candidate)
+        return {}
+
+    def delete_objects(self, Bucket: str, Delete: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+        deleted = []
+        for obj in Delete['Objects']:
+            self.delete_object(Bucket, obj['Key'])
+            deleted.append({'Key': obj['Key']})
+        return {} if Delete.get('Quiet') else {'Deleted': deleted}
+
+    def list_objects_v2(self, Bucket: str, Prefix: str = "", MaxKeys: int = 1000,
+                        ContinuationToken: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+        bucket_root = os.path.join(self.root, Bucket)
+        keys: List[str] = []
+        for dirpath, _, filenames in os.walk(bucket_root):
+            for filename in filenames:
+                if filename.endswith('.meta.json') or filename.endswith('.tmp'):
+                    continue
+                key = os.path.relpath(os.path.join(dirpath, filename), bucket_root).replace(os.sep, '/')
+                if key.startswith(Prefix):
+                    keys.append(key)
+
+        keys.sort()
+        if ContinuationToken:
+            keys = [key for key in keys if key > ContinuationToken]
+
+        page, truncated = keys[:MaxKeys], len(keys) > MaxKeys
+        response = {
+            'KeyCount': len(page),
+            'IsTruncated': truncated,
+            'Contents': [
+                {
+                    'Key': key,
+                    'Size': os.path.getsize(self._path(Bucket, key)),
+                    'LastModified': datetime.fromtimestamp(
+                        os.path.getmtime(self._path(Bucket, key)), tz=timezone.utc
+                    )
+                }
+                for key in page
+            ]
+        }
+        if truncated:
+            response['NextContinuationToken'] = page[-1]
+        if not page:
+            del response['Contents']
+        return response
+
+    def generate_presigned_url(self, ClientMethod: str, Params: Dict[str, Any], ExpiresIn: int = 3600) -> str:
+        # Served by the /uploads static mount in development
+        return f"{self.public_url_prefix}/{Params['Bucket']}/{Params['Key']}"
@@ -0,0 +1,159 @@
+"""
+Model Weights Cache
+Versioned local cache of model weights, so a node can switch between DamageModel
+versions without downloading their weights again
+"""
+
+import fcntl
+import json
+import os
+import shutil
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from core.config import settings
+from services.s3_storage import s3_service
+
+MANIFEST_NAME = 'manifest.json'
+
+class ModelWeightsCache:
+    """
+    Keeps weights under root/<model_version>/<file> with a manifest of their source and checksum
+
+    Downloads stream to disk with verified checksums (S3StorageService.download_to_file).
+    A version whose weights are byte-identical to an already cached version (same sha256 in
+    the object metadata) is hard-linked instead of downloaded. Least recently used versions
+    beyond max_versions are removed.
+    """
+
+    def __init__(self, root: str, max_versions: int):
+        self.root = root
+        self.max_versions = max_versions
+        self.stats = {'hits': 0, 'linked': 0, 'downloaded': 0, 'failed': 0, 'evicted': 0}
+
+    def get(self, model_version: str, weights_url: str) -> str:
+        """
+        Local path of a version's weights, fetching them on first use
+
+        Args:
+            model_version: DamageModel.model_version
+            weights_url: DamageModel.model_weights_path (S3 URL)
+
+        Returns:
+            Path of the verified weights file
+        """
+        version_dir = os.path.join(self.root, model_version)
+        local_path = os.path.join(version_dir, os.path.basename(weights_url))
+
+        with self._version_lock(model_version):
+            manifest = self._read_manifest(model_version)
+            if (manifest and manifest.get('source') == weights_url and os.path.isfile(local_path)
+                    and os.path.getsize(local_path) == manifest.get('size_bytes')):
+                self._touch(model_version)
+                self.stats['hits'] += 1
+                return local_path
+
+            sha256 = self._remote_sha256(weights_url)
+            if sha256 and self._link_identical(sha256, local_path):
+                self.stats['linked'] += 1
+            else:
+                sha256 = s3_service.download_to_file(weights_url, local_path, expected_sha256=sha256)
+                if sha256 is None:
+                    self.stats['failed'] += 1
+                    raise RuntimeError(f"Could not download weights for model {model_version}")
+                self.stats['downloaded'] += 1
+
+            self._write_manifest(model_version, {
+                'source': weights_url,
+                'file': os.path.basename(local_path),
+                'sha256': sha256,
+                'size_bytes': os.path.getsize(local_path),
+                'fetched_at': datetime.utcnow().isoformat()
+            })
+
+        self._evict(keep=model_version)
+        return local_path
+
+    def versions(self) -> List[Dict[str, Any]]:
+        """Manifests of every cached version, most recently used first"""
+        cached = []
+        for entry in self._version_dirs():
+            manifest = self._read_manifest(entry.name)
+            if manifest:
+                cached.append({'model_version': entry.name, **manifest})
+        return sorted(cached, key=lambda manifest: manifest['last_used'], reverse=True)
+
+    def _remote_sha256(self, weights_url: str) -> Optional[str]:
+        metadata = s3_service.get_file_metadata(weights_url)
+        return (metadata or {}).get('metadata', {}).get('sha256')
+
+    def _link_identical(self, sha256: str, local_path: str) -> bool:
+        for cached in self.versions():
+            if cached.get('sha256') != sha256:
+                continue
+            source = os.path.join(self.root, cached['model_version'], cached['file'])
+            if not os.path.isfile(source):
+                continue
+            os.makedirs(os.path.dirname(local_path), exist_ok=True)
+            tmp_path = f"{local_path}.link.tmp"
+            try:
+                os.link(source, tmp_path)
+            except OSError:
+                shutil.copyfile(source, tmp_path)
+            os.replace(tmp_path, local_path)
+            return True
+        return False
+
+    def _evict(self, keep: str):
+        for cached in self.versions()[self.max_versions:]:
+            if cached['model_version'] == keep:
+                continue
+            with self._version_lock(cached['model_version']):
+                # Models already loaded keep their open files; only the cached copy goes
+                shutil.rmtree(os.path.join(self.root, cached['model_version']), ignore_errors=True)
+                self.stats['evicted'] += 1
+
+    def _version_dirs(self):
+        if not os.path.isdir(self.root):
+            return []
+        return [entry for entry in os.scandir(self.root) if entry.is_dir() and entry.name != '.locks']
+
+    def _read_manifest(self, model_version: str) -> Optional[Dict[str, Any]]:
+        path = os.path.join(self.root, model_version, MANIFEST_NAME)
+        try:
+            with open(path) as f:
+                manifest = json.load(f)
+            manifest['last_used'] = os.path.getmtime(path)
+            return manifest
+        except (OSError, ValueError):
+            return None
+
+    def _write_manifest(self, model_version: str, manifest: Dict[str, Any]):
+        path = os.path.join(self.root, model_version, MANIFEST_NAME)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, path)
+
+    def _touch(self, model_version: str):
+        # The manifest's mtime is the LRU clock
+        try:
+            os.utime(os.path.join(self.root, model_version, MANIFEST_NAME))
+        except OSError:
+            pass
+
+    @contextmanager
+    def _version_lock(self, model_version: str):
+        # flock so workers on one node fetch each version only once
+        lock_dir = os.path.join(self.root, '.locks')
+        os.makedirs(lock_dir, exist_ok=True)
+        with open(os.path.join(lock_dir, model_version), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+# Global model weights cache instance
+model_weights_cache = ModelWeightsCache(settings.MODEL_CACHE_DIR, settings.MODEL_CACHE_MAX_VERSIONS)
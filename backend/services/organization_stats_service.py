@@ -0,0 +1,251 @@
+"""
+Organization Stats Service
+Keeps the per-organisation dashboard counters (OrganizationStats) in step with contracts,
+fines and cars, in the same transaction as the change, and reconciles them nightly
+"""
+
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Any, Iterable, Optional, Tuple
+
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from core.database import SessionLocal, Organization, OrganizationStats, Contract, Fine, Car
+
+# Statuses with their own counter columns; rows in any other status only count towards the totals
+CONTRACT_STATUSES = ('active', 'expired', 'terminated')
+FINE_STATUSES = ('pending', 'paid', 'deducted')
+CAR_STATUSES = ('available', 'rented', 'maintenance')
+
+# Attributes whose changes move a counter
+TRACKED_ATTRIBUTES = {
+    Contract: ('organization_id', 'status', 'monthly_rent', 'deposit_amount'),
+    Fine: ('contract_id', 'status', 'amount'),
+    Car: ('organization_id', 'status')
+}
+
+# Execution option for bulk UPDATE/DELETE of tracked models whose caller fixes the counters
+# itself (e.g. deletes the organisation's stats row too); see check_bulk_statement
+BYPASS_OPTION = 'organization_stats_bypass'
+
+class OrganizationStatsService:
+    def after_flush(self, session: Session, flush_context):
+        """
+        Session after_flush hook: turn the flushed Contract, Fine and Car changes into
+        counter deltas and apply them on the flush's connection
+
+        Registered on every Session (sync and the ones behind AsyncSession), so the counters
+        commit or roll back together with the rows they count. Only the unit of work is
+        seen: bulk INSERTs report their rows through apply_inserted, and bulk UPDATE/DELETE
+        statements are refused by check_bulk_statement.
+        """
+        deltas = defaultdict(lambda: defaultdict(int))
+
+        for obj in session.new:
+            if type(obj) in TRACKED_ATTRIBUTES:
+                self._add(deltas, obj, self._values(obj), 1)
+
+        for obj in session.deleted:
+            if type(obj) in TRACKED_ATTRIBUTES:
+                self._add(deltas, obj, self._values(obj, previous=True), -1)
+
+        for obj in session.dirty:
+            if type(obj) in TRACKED_ATTRIBUTES and session.is_modified(obj):
+                self._add(deltas, obj, self._values(obj, previous=True), -1)
+                self._add(deltas, obj, self._values(obj), 1)
+
+        if deltas:
+            self._apply(session, deltas)
+
+    def apply_inserted(self, session: Session, objects: Iterable[Any]):
+        """
+        Count rows written by INSERT statements outside the unit of work (e.g. the
+        ON CONFLICT DO NOTHING RETURNING of fine ingestion)
+
+        Call with the returned objects before committing; from an AsyncSession use
+        await db.run_sync(organization_stats_service.apply_inserted, objects).
+
+        Only inserts can be reported. Change or delete contracts, fines and cars through the
+        ORM (load, modify, flush), not update()/delete() statements: those would move rows
+        between counters unseen, and the dashboard would drift until the nightly reconcile.
+        Statements run on a raw Connection are not checked at all.
+        """
+        deltas = defaultdict(lambda: defaultdict(int))
+        for obj in objects:
+            self._add(deltas, obj, self._values(obj), 1)
+        if deltas:
+            self._apply(session, deltas)
+
+    def check_bulk_statement(self, orm_execute_state):
+        """
+        Session do_orm_execute hook: refuse update()/delete() of contracts, fines and cars,
+        whose changes the counters cannot follow, unless run with
+        execution_options(organization_stats_bypass=True)
+        """
+        if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+            return
+        if orm_execute_state.execution_options.get(BYPASS_OPTION):
+            return
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.class_ in TRACKED_ATTRIBUTES:
+            raise RuntimeError(
+                f"Bulk {'UPDATE' if orm_execute_state.is_update else 'DELETE'} of {mapper.class_.__name__} "
+                f"would leave the dashboard counters stale; change the rows through the ORM or pass "
+                f"execution_options({BYPASS_OPTION}=True) and fix the counters yourself"
+            )
+
+    def compute(self, db: Session, organization_id) -> Dict[str, Any]:
+        """Counters of an organisation aggregated from the base tables, in one statement"""
+        contracts = select(
+            func.count().label('contracts_total'),
+            *[func.count().filter(Contract.status == status).label(f'contracts_{status}') for status in CONTRACT_STATUSES],
+            func.coalesce(func.sum(Contract.monthly_rent), 0).label('revenue_total'),
+            func.coalesce(func.sum(Contract.deposit_amount), 0).label('deposits_total')
+        ).where(Contract.organization_id == organization_id).subquery()
+
+        fines = select(
+            func.count().label('fines_total'),
+            *[func.count().filter(Fine.status == status).label(f'fines_{status}') for status in FINE_STATUSES],
+            func.coalesce(func.sum(Fine.amount), 0).label('fines_total_amount'),
+            *[func.coalesce(func.sum(Fine.amount).filter(Fine.status == status), 0).label(f'fines_{status}_amount')
+              for status in FINE_STATUSES]
+        ).select_from(Fine).join(Contract, Contract.id == Fine.contract_id).where(
+            Contract.organization_id == organization_id
+        ).subquery()
+
+        cars = select(
+            func.count().label('cars_total'),
+            *[func.count().filter(Car.status == status).label(f'cars_{status}') for status in CAR_STATUSES]
+        ).where(Car.organization_id == organization_id).subquery()
+
+        return dict(db.execute(select(contracts, fines, cars)).one()._mapping)
+
+    def reconcile(self) -> Dict[str, int]:
+        """
+        Recompute every organisation's counters from the base tables and overwrite drifted ones
+
+        Each organisation is reconciled in its own transaction with its stats row locked
+        first, so writers updating it concurrently either commit before the aggregate is
+        taken or block until the corrected row is committed.
+
+        Returns:
+            Number of organisations checked and of those whose counters had drifted
+        """
+        db = SessionLocal()
+        result = {'organizations': 0, 'drifted': 0}
+        try:
+            for organization_id in db.scalars(select(Organization.id)).all():
+                db.execute(insert(OrganizationStats).values(organization_id=organization_id)
+                           .on_conflict_do_nothing(index_elements=[OrganizationStats.organization_id]))
+                stats = db.scalar(select(OrganizationStats).where(
+                    OrganizationStats.organization_id == organization_id
+                ).with_for_update())
+
+                actual = self.compute(db, organization_id)
+                drifted = {column: value for column, value in actual.items() if getattr(stats, column) != value}
+                if drifted:
+                    print(f"⚠️ Dashboard counters of organization {organization_id} drifted: "
+                          + ", ".join(f"{column} {getattr(stats, column)} -> {value}" for column, value in drifted.items()))
+                    for column, value in drifted.items():
+                        setattr(stats, column, value)
+                    stats.updated_at = datetime.utcnow()
+                    result['drifted'] += 1
+
+                stats.reconciled_at = datetime.utcnow()
+                db.commit()
+                result['organizations'] += 1
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        return result
+
+    def _values(self, obj, previous: bool = False) -> Dict[str, Any]:
+        # previous=True gives the values as of before this flush (attribute history is
+        # still intact in after_flush)
+        values = {}
+        state = inspect(obj)
+        for attribute in TRACKED_ATTRIBUTES[type(obj)]:
+            value = getattr(obj, attribute)
+            if previous:
+                history = state.attrs[attribute].history
+                if history.deleted:
+                    value = history.deleted[0]
+            values[attribute] = value
+        return values
+
+    def _counters(self, model, values: Dict[str, Any]) -> Tuple[Optional[Any], Dict[str, Any]]:
+        """Owner key (organisation id, or contract id for fines) and the counters one row adds"""
+        status = values['status']
+        if model is Contract:
+            counters = {
+                'contracts_total': 1,
+                'revenue_total': values['monthly_rent'] or 0,
+                'deposits_total': values['deposit_amount'] or 0
+            }
+            if status in CONTRACT_STATUSES:
+                counters[f'contracts_{status}'] = 1
+            return values['organization_id'], counters
+
+        if model is Fine:
+            amount = values['amount'] or 0
+            counters = {'fines_total': 1, 'fines_total_amount': amount}
+            if status in FINE_STATUSES:
+                counters[f'fines_{status}'] = 1
+                counters[f'fines_{status}_amount'] = amount
+            return values['contract_id'], counters
+
+        counters = {'cars_total': 1}
+        if status in CAR_STATUSES:
+            counters[f'cars_{status}'] = 1
+        return values['organization_id'], counters
+
+    def _add(self, deltas, obj, values: Dict[str, Any], sign: int):
+        key, counters = self._counters(type(obj), values)
+        if key is None:
+            return
+        # Fines are keyed by contract until _apply resolves their organisation
+        target = deltas[(type(obj) is Fine, key)]
+        for column, value in counters.items():
+            target[column] += sign * value
+
+    def _apply(self, session: Session, deltas):
+        connection = session.connection()
+
+        contract_ids = [key for is_fine, key in deltas if is_fine]
+        contract_organizations = dict(connection.execute(
+            select(Contract.id, Contract.organization_id).where(Contract.id.in_(contract_ids))
+        ).all()) if contract_ids else {}
+
+        by_organization = defaultdict(lambda: defaultdict(int))
+        for (is_fine, key), counters in deltas.items():
+            organization_id = contract_organizations.get(key) if is_fine else key
+            if organization_id is None:
+                continue
+            for column, value in counters.items():
+                by_organization[organization_id][column] += value
+
+        now = datetime.utcnow()
+        # Fixed order so concurrent transactions lock stats rows in the same sequence
+        for organization_id in sorted(by_organization, key=str):
+            changed = {column: value for column, value in by_organization[organization_id].items() if value}
+            if not changed:
+                continue
+            stmt = insert(OrganizationStats).values(organization_id=organization_id, updated_at=now, **changed)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[OrganizationStats.organization_id],
+                set_={
+                    **{column: getattr(OrganizationStats, column) + stmt.excluded[column] for column in changed},
+                    'updated_at': now
+                }
+            )
+            connection.execute(stmt)
+
+# Global organization stats service instance
+organization_stats_service = OrganizationStatsService()
+
+event.listen(Session, 'after_flush', organization_stats_service.after_flush)
+event.listen(Session, 'do_orm_execute', organization_stats_service.check_bulk_statement)
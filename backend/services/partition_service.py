@@ -0,0 +1,163 @@
+"""
+Partition Service
+Creates the monthly range partitions of damage_detections and damage_labels ahead of time,
+and detaches and drops whole partitions for retention
+"""
+
+import re
+from datetime import date, datetime
+from typing import List, NamedTuple, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.database import SessionLocal
+
+# Tables partitioned BY RANGE (created_at), one partition per calendar month
+PARTITIONED_TABLES = ('damage_detections', 'damage_labels')
+
+class Partition(NamedTuple):
+    name: str
+    lower: datetime  # inclusive
+    upper: datetime  # exclusive
+
+def month_start(value: date, offset: int = 0) -> datetime:
+    """First instant of the month of value, offset by whole months"""
+    months = value.year * 12 + value.month - 1 + offset
+    return datetime(months // 12, months % 12 + 1, 1)
+
+class PartitionService:
+    """
+    Monthly partitions are named <table>_pYYYYMM. Each table also has a <table>_default
+    partition for rows outside every monthly range, e.g. labelled detections kept past
+    retention, or rows written before their month existed.
+    """
+
+    def ensure_partitions(self, months_ahead: Optional[int] = None) -> List[str]:
+        """
+        Create the default partition and the monthly partitions from the current month up to
+        months_ahead months ahead, for every partitioned table
+
+        Tables that are not partitioned (the migration has not run) are skipped.
+
+        Returns:
+            Names of the partitions created
+        """
+        months_ahead = settings.PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+        this_month = month_start(datetime.utcnow())
+        created = []
+
+        for table in PARTITIONED_TABLES:
+            db = SessionLocal()
+            try:
+                if not self.is_partitioned(db, table):
+                    print(f"{table} is not partitioned; skipping partition maintenance")
+                    continue
+
+                if self._create_default(db, table):
+                    created.append(f"{table}_default")
+                db.commit()
+
+                for offset in range(months_ahead + 1):
+                    name = self.create_partition(db, table, month_start(this_month, offset))
+                    if name:
+                        created.append(name)
+                    db.commit()
+
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+
+        return created
+
+    def is_partitioned(self, db: Session, table: str) -> bool:
+        return db.execute(text(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table pt "
+            "JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = :table)"
+        ), {'table': table}).scalar()
+
+    def partitions(self, db: Session, table: str) -> List[Partition]:
+        """Attached monthly partitions of table, oldest first"""
+        names = db.execute(text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :table"
+        ), {'table': table}).scalars()
+
+        return self._monthly(table, names)
+
+    def detached(self, db: Session, table: str) -> List[Partition]:
+        """
+        Monthly partitions of table that were detached but not dropped yet (e.g. retention
+        stopped halfway), oldest first
+        """
+        names = db.execute(text(
+            "SELECT c.relname FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE n.nspname = current_schema() AND c.relkind = 'r' AND NOT c.relispartition "
+            "AND c.relname LIKE :prefix"
+        ), {'prefix': f"{table}\\_p%"}).scalars()
+        return self._monthly(table, names)
+
+    def create_partition(self, db: Session, table: str, month: datetime) -> Optional[str]:
+        """
+        Create and attach the partition of month unless it exists; the caller commits
+
+        Rows of that month already in the default partition are moved into the new partition
+        first, since attaching fails while the default partition holds rows of its range.
+
+        Returns:
+            Name of the partition created, or None if it already existed
+        """
+        lower, upper = month_start(month), month_start(month, 1)
+        name = f"{table}_p{lower:%Y%m}"
+        if db.execute(text("SELECT to_regclass(:name)"), {'name': name}).scalar():
+            return None
+
+        bounds = {'lower': lower, 'upper': upper}
+        db.execute(text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+        db.execute(text(
+            f"WITH moved AS (DELETE FROM {table}_default WHERE created_at >= :lower AND created_at < :upper RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved"
+        ), bounds)
+        db.execute(text(
+            f"ALTER TABLE {table} ATTACH PARTITION {name} "
+            f"FOR VALUES FROM ('{lower:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+        ))
+        print(f"Created partition {name}")
+        return name
+
+    def detach(self, db: Session, table: str, partition: Partition):
+        """
+        Detach a partition in the caller's transaction; it becomes a plain table
+
+        Takes an ACCESS EXCLUSIVE lock on the parent until the transaction ends, blocking all
+        reads and writes of the table, so the caller should commit right after. (DETACH
+        CONCURRENTLY is not an option: it refuses tables with a default partition.)
+        """
+        db.execute(text(f"ALTER TABLE {table} DETACH PARTITION {partition.name}"))
+
+    def drop(self, db: Session, partition: Partition):
+        """Drop a detached partition in the caller's transaction"""
+        db.execute(text(f"DROP TABLE {partition.name}"))
+
+    def _monthly(self, table: str, names) -> List[Partition]:
+        partitions = []
+        for name in names:
+            match = re.fullmatch(rf"{table}_p(\d{{4}})(\d{{2}})", name)
+            if match:
+                lower = datetime(int(match.group(1)), int(match.group(2)), 1)
+                partitions.append(Partition(name, lower, month_start(lower, 1)))
+        return sorted(partitions, key=lambda partition: partition.lower)
+
+    def _create_default(self, db: Session, table: str) -> bool:
+        if db.execute(text("SELECT to_regclass(:name)"), {'name': f"{table}_default"}).scalar():
+            return False
+        db.execute(text(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT"))
+        return True
+
+# Global partition service instance
+partition_service = PartitionService()
@@ -0,0 +1,121 @@
+"""
+Presigned URL Service
+Caches presigned S3 URLs per object and signs whole pages of detections at once
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Iterable, Optional, Tuple
+
+from core.config import settings
+from services.s3_storage import s3_service
+from services.rendition_service import rendition_service, DETECTION_IMAGE_FIELDS
+
+class PresignService:
+    def __init__(self):
+        self._cache: "OrderedDict[str, Tuple[str, datetime]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'failures': 0}
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.stats['hits'] + self.stats['misses']
+        return round(self.stats['hits'] / lookups, 4) if lookups else 0.0
+
+    @property
+    def size(self) -> int:
+        return len(self._cache)
+
+    def sign(self, s3_url: str) -> Optional[Tuple[str, datetime]]:
+        """
+        Presigned URL for one object
+
+        Returns:
+            (presigned URL, expires_at) or None if signing failed
+        """
+        return self.sign_many([s3_url]).get(s3_url)
+
+    def sign_many(self, s3_urls: Iterable[str]) -> Dict[str, Tuple[str, datetime]]:
+        """
+        Presign a batch of objects, reusing cached URLs that are still valid for long enough
+
+        Args:
+            s3_urls: Object URLs as stored in the database; duplicates and empty values are ignored
+
+        Returns:
+            Mapping of object URL to (presigned URL, expires_at); failed objects are omitted
+        """
+        now = datetime.utcnow()
+        refresh_before = now + timedelta(seconds=settings.PRESIGN_REFRESH_MARGIN_SECONDS)
+
+        signed: Dict[str, Tuple[str, datetime]] = {}
+        missing: List[str] = []
+        with self._lock:
+            for s3_url in dict.fromkeys(url for url in s3_urls if url):
+                cached = self._cache.get(s3_url)
+                if cached and cached[1] > refresh_before:
+                    self._cache.move_to_end(s3_url)
+                    signed[s3_url] = cached
+                else:
+                    missing.append(s3_url)
+            self.stats['hits'] += len(signed)
+            self.stats['misses'] += len(missing)
+
+        if not missing:
+            return signed
+
+        # Signing is local (no request to S3), so the whole batch shares one timestamp
+        expiration = settings.PRESIGN_EXPIRATION_SECONDS
+        expires_at = datetime.utcnow() + timedelta(seconds=expiration)
+        fresh = {}
+        for s3_url in missing:
+            presigned_url = s3_service.generate_presigned_url(s3_url, expiration=expiration)
+            if presigned_url:
+                fresh[s3_url] = (presigned_url, expires_at)
+
+        with self._lock:
+            self.stats['failures'] += len(missing) - len(fresh)
+            self._cache.update(fresh)
+            while len(self._cache) > settings.PRESIGN_CACHE_MAX_ENTRIES:
+                self._cache.popitem(last=False)
+
+        signed.update(fresh)
+        return signed
+
+    def sign_detections(self, detections: List[Dict[str, Any]],
+                        fields: List[Tuple[str, str]] = DETECTION_IMAGE_FIELDS,
+                        rendition: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Add presigned_urls and presigned_urls_expires_at to each detection in one batch
+
+        presigned_urls_expires_at is the earliest expiry among the detection's URLs,
+        so clients can cache every image of the detection until then.
+
+        Args:
+            rendition: thumbnail, preview or full to serve WebP renditions (falling back
+                to the original until they exist); None serves the originals
+        """
+        selected = [
+            rendition_service.resolve(detection, rendition, fields) if rendition
+            else {column: detection.get(column) for _, column in fields}
+            for detection in detections
+        ]
+        signed = self.sign_many(url for urls in selected for url in urls.values())
+
+        for detection, sources in zip(detections, selected):
+            urls = {}
+            expiries = []
+            for key, column in fields:
+                entry = signed.get(sources.get(column))
+                if entry:
+                    urls[key] = entry[0]
+                    expiries.append(entry[1])
+            detection['presigned_urls'] = urls
+            detection['presigned_rendition'] = rendition or 'original'
+            detection['presigned_urls_expires_at'] = min(expiries) if expiries else None
+
+        return detections
+
+# Global presign service instance
+presign_service = PresignService()
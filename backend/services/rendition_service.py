@@ -0,0 +1,237 @@
+"""
+Rendition Service
+Generates WebP renditions (thumbnail, preview, full) of detection images so views
+download only the size they display
+"""
+
+import math
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from core.config import settings
+from core.database import SessionLocal
+from core.damage_ai_models import DamageDetection
+from services.s3_storage import s3_service
+
+# (response key, detection column) for every image a detection can reference
+DETECTION_IMAGE_FIELDS = [
+    ('before_image', 'before_image_path'),
+    ('after_image', 'after_image_path'),
+    ('ssim_heatmap', 'ssim_heatmap_path'),
+    ('lpips_heatmap', 'lpips_heatmap_path'),
+    ('damage_overlay', 'damage_overlay_path'),
+    ('annotated_image', 'annotated_image_path')
+]
+
+# Longest edge in pixels; None keeps the source resolution
+RENDITION_SIZES = {
+    'thumbnail': settings.RENDITION_THUMBNAIL_SIZE,
+    'preview': settings.RENDITION_PREVIEW_SIZE,
+    'full': None
+}
+
+class RenditionService:
+    def __init__(self):
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = set()
+        # (detection id, column) -> (consecutive failures, monotonic time before which no retry starts)
+        self._failures: Dict[Tuple[str, str], Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+
+    def rendition_location(self, s3_url: str, rendition: str) -> Tuple[str, str]:
+        """Folder and filename of a rendition, next to its source object"""
+        key = s3_service._key_from_url(s3_url)
+        folder, _, filename = key.rpartition('/')
+        stem = filename.rsplit('.', 1)[0]
+        return f"{folder}/renditions", f"{stem}_{rendition}.webp"
+
+    def render(self, image: np.ndarray) -> Dict[str, bytes]:
+        """Encode every rendition of a decoded image as WebP"""
+        height, width = image.shape[:2]
+        encoded = {}
+        for rendition, max_edge in RENDITION_SIZES.items():
+            resized = image
+            if max_edge and max(height, width) > max_edge:
+                scale = max_edge / max(height, width)
+                resized = cv2.resize(
+                    image, (max(1, round(width * scale)), max(1, round(height * scale))),
+                    interpolation=cv2.INTER_AREA
+                )
+
+            ok, buffer = cv2.imencode('.webp', resized, [cv2.IMWRITE_WEBP_QUALITY, settings.RENDITION_WEBP_QUALITY])
+            if ok:
+                encoded[rendition] = buffer.tobytes()
+
+        return encoded
+
+    def create_renditions(self, s3_url: str, image_bytes: Optional[bytes] = None) -> Dict[str, str]:
+        """
+        Render and upload all renditions of one stored image
+
+        Args:
+            s3_url: URL of the source image
+            image_bytes: Source bytes if already in memory; downloaded otherwise
+
+        Returns:
+            Mapping of rendition name to its S3 URL
+        """
+        # Content-addressed sources shared by several detections already have renditions
+        existing = {
+            rendition: s3_service._url_for_key('/'.join(self.rendition_location(s3_url, rendition)))
+            for rendition in RENDITION_SIZES
+        }
+        if all(s3_service.object_exists(url) for url in existing.values()):
+            return existing
+
+        if image_bytes is None:
+            image_bytes = s3_service.download_file_mapped(s3_url)
+        if not image_bytes:
+            return {}
+
+        image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            return {}
+
+        renditions = list(self.render(image).items())
+        urls = s3_service.upload_images([
+            (data, *self.rendition_location(s3_url, rendition)) for rendition, data in renditions
+        ])
+        return {rendition: url for (rendition, _), url in zip(renditions, urls) if url}
+
+    def generate_for_detection(self, detection_id: str, sources: Dict[str, str],
+                               source_bytes: Optional[Dict[str, bytes]] = None) -> Dict[str, Dict[str, str]]:
+        """
+        Create renditions for a detection's images and record them on the detection
+
+        Args:
+            detection_id: Detection to update
+            sources: Detection column -> source S3 URL
+            source_bytes: Detection column -> source bytes, for images still in memory
+
+        Returns:
+            Detection column -> {rendition name: S3 URL}
+        """
+        source_bytes = source_bytes or {}
+        created = {}
+        for column, s3_url in sources.items():
+            if not s3_url:
+                continue
+            try:
+                urls = self.create_renditions(s3_url, source_bytes.get(column))
+                if urls:
+                    created[column] = urls
+            except Exception as e:
+                print(f"Rendition generation failed for {s3_url}: {e}")
+            self._record_attempt(detection_id, column, succeeded=column in created)
+
+        if not created:
+            return created
+
+        db = SessionLocal()
+        try:
+            # Lock the row so concurrent generations for the same detection merge instead of overwrite
+            detection = db.query(DamageDetection).filter(
+                DamageDetection.id == uuid.UUID(str(detection_id))
+            ).with_for_update().first()
+            if detection:
+                detection.renditions = {**(detection.renditions or {}), **created}
+                db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Failed to record renditions for detection {detection_id}: {e}")
+        finally:
+            db.close()
+
+        return created
+
+    def retry_after(self, detection_id: str, column: str) -> Optional[int]:
+        """Seconds until the renditions of a detection image may be generated again after failing, or None"""
+        with self._lock:
+            _, retry_at = self._failures.get((str(detection_id), column), (0, 0.0))
+        remaining = retry_at - time.monotonic()
+        return math.ceil(remaining) if remaining > 0 else None
+
+    def schedule(self, detection_id: str, sources: Dict[str, str],
+                 source_bytes: Optional[Dict[str, bytes]] = None) -> bool:
+        """
+        Generate renditions in the background; repeated requests for the same detection are ignored,
+        and so are images whose last generation failed until their backoff (retry_after) has passed
+        """
+        detection_id = str(detection_id)
+        sources = {column: s3_url for column, s3_url in sources.items() if not self.retry_after(detection_id, column)}
+        if not sources:
+            return False
+        with self._lock:
+            if detection_id in self._pending:
+                return False
+            self._pending.add(detection_id)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=settings.RENDITION_WORKERS, thread_name_prefix="renditions"
+                )
+
+        future = self._executor.submit(self.generate_for_detection, detection_id, sources, source_bytes)
+        future.add_done_callback(lambda _: self._discard_pending(detection_id))
+        return True
+
+    def resolve(self, detection: Dict[str, Any], rendition: str,
+                fields: List[Tuple[str, str]] = DETECTION_IMAGE_FIELDS) -> Dict[str, str]:
+        """
+        Pick the URL to serve for each image of a detection
+
+        Uses the requested rendition where it exists and the original otherwise,
+        queueing generation of the missing renditions for the next request.
+
+        Returns:
+            Detection column -> S3 URL to presign
+        """
+        renditions = detection.get('renditions') or {}
+        selected = {}
+        missing = {}
+        for _, column in fields:
+            source = detection.get(column)
+            if not source:
+                continue
+            url = renditions.get(column, {}).get(rendition)
+            if not url:
+                missing[column] = source
+            selected[column] = url or source
+
+        if missing and detection.get('id'):
+            self.schedule(detection['id'], missing)
+
+        return selected
+
+    def shutdown(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _record_attempt(self, detection_id: str, column: str, succeeded: bool):
+        key = (str(detection_id), column)
+        now = time.monotonic()
+        with self._lock:
+            if succeeded:
+                self._failures.pop(key, None)
+                return
+            # Forget failures long past their retry time, so images nobody asks for again don't pile up
+            stale_before = now - settings.RENDITION_RETRY_BACKOFF_MAX_SECONDS
+            for stale in [k for k, (_, retry_at) in self._failures.items() if retry_at < stale_before]:
+                del self._failures[stale]
+            failures = self._failures.get(key, (0, 0.0))[0] + 1
+            backoff = min(settings.RENDITION_RETRY_BACKOFF_SECONDS * 2 ** (failures - 1),
+                          settings.RENDITION_RETRY_BACKOFF_MAX_SECONDS)
+            self._failures[key] = (failures, now + backoff)
+
+    def _discard_pending(self, detection_id: str):
+        with self._lock:
+            self._pending.discard(detection_id)
+
+# Global rendition service instance
+rendition_service = RenditionService()
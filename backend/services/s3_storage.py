@@ -3,33 +3,141 @@ S3 Storage Service for Damage AI Images and Models
 """
 
 import boto3
+import hashlib
+import io
 import os
-from botocore.exceptions import ClientError, NoCredentialsError
-from typing import Optional, Dict, Any
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import ClientError, BotoCoreError
+from collections import deque
+from typing import Optional, Dict, Any, Iterable, Iterator, List, Tuple
 import uuid
 from datetime import datetime, timedelta
 from core.config import settings
+from services.disk_cache import DiskCache
+
+# S3 limits: list_objects_v2 returns and delete_objects accepts at most 1000 keys per call
+LIST_PAGE_SIZE = 1000
+DELETE_BATCH_SIZE = 1000
+
+# Block size for streaming checksums of model artefacts
+HASH_CHUNK_SIZE = 8 * 1024 * 1024
+
+def file_sha256(fileobj) -> str:
+    """SHA-256 of a binary file object, read in blocks from its current position"""
+    digest = hashlib.sha256()
+    for block in iter(lambda: fileobj.read(HASH_CHUNK_SIZE), b''):
+        digest.update(block)
+    return digest.hexdigest()
 
 class S3StorageService:
     def __init__(self):
-        self.s3_client = None
+        self._client = None
+        self._client_initialized = False
+        self._client_lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._disk_cache: Optional[DiskCache] = None
         self.bucket_name = settings.S3_BUCKET_NAME
-        self._initialize_client()
     
-    def _initialize_client(self):
-        """Initialize S3 client with credentials"""
+    @property
+    def s3_client(self):
+        """
+        Shared S3 client, created on first use
+        
+        boto3 clients are thread-safe, so one pooled client serves every request
+        and background job in the process. Returns None when S3 is not configured.
+        """
+        if not self._client_initialized:
+            with self._client_lock:
+                if not self._client_initialized:
+                    self._client = self._create_client()
+                    self._client_initialized = True
+        return self._client
+    
+    @property
+    def disk_cache(self) -> Optional[DiskCache]:
+        """Node-local read-through cache for downloads, None when disabled"""
+        if self._disk_cache is None and settings.S3_DISK_CACHE_MAX_MB > 0:
+            with self._client_lock:
+                if self._disk_cache is None:
+                    self._disk_cache = DiskCache(
+                        settings.S3_DISK_CACHE_DIR, settings.S3_DISK_CACHE_MAX_MB * 1024 * 1024
+                    )
+        return self._disk_cache
+    
+    def _invalidate_cached(self, key: str):
+        """Objects are overwritten rarely, but a stale cached copy must never be served"""
+        if self._disk_cache:
+            self._disk_cache.invalidate(f"{self.bucket_name}/{key}")
+    
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Thread pool sized to the connection pool, for concurrent transfers"""
+        if self._executor is None:
+            with self._client_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=settings.S3_MAX_POOL_CONNECTIONS, thread_name_prefix="s3"
+                    )
+        return self._executor
+    
+    @property
+    def transfer_config(self) -> TransferConfig:
+        """Multipart upload / ranged download settings for large objects such as model weights"""
+        return TransferConfig(
+            multipart_threshold=settings.S3_MULTIPART_THRESHOLD_MB * 1024 * 1024,
+            multipart_chunksize=settings.S3_MULTIPART_CHUNK_MB * 1024 * 1024,
+            max_concurrency=settings.S3_TRANSFER_CONCURRENCY,
+            use_threads=True
+        )
+    
+    def use_backend(self, client):
+        """Swap the client, e.g. for a LocalObjectStore in tests and benchmarks"""
+        with self._client_lock:
+            self._client = client
+            self._client_initialized = True
+    
+    def _create_client(self):
+        """Create the storage client for the configured backend"""
+        if settings.STORAGE_BACKEND == "local":
+            from services.local_object_store import LocalObjectStore
+            return LocalObjectStore(settings.LOCAL_STORAGE_DIR)
+        
         try:
-            self.s3_client = boto3.client(
-                's3',
+            session = boto3.session.Session(
                 aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
                 aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
                 region_name=settings.AWS_REGION
             )
-            # Test connection
-            self.s3_client.head_bucket(Bucket=self.bucket_name)
-        except (NoCredentialsError, ClientError) as e:
+            if session.get_credentials() is None:
+                print("S3 disabled: no AWS credentials configured")
+                return None
+            
+            return session.client(
+                's3',
+                endpoint_url=settings.S3_ENDPOINT_URL or None,
+                config=Config(
+                    max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS,
+                    connect_timeout=settings.S3_CONNECT_TIMEOUT,
+                    read_timeout=settings.S3_READ_TIMEOUT,
+                    retries={'max_attempts': settings.S3_MAX_ATTEMPTS, 'mode': 'adaptive'}
+                )
+            )
+        except BotoCoreError as e:
             print(f"S3 initialization failed: {e}")
-            self.s3_client = None
+            return None
+    
+    def _url_for_key(self, key: str) -> str:
+        """Canonical object URL stored in the database"""
+        return f"https://{self.bucket_name}.s3.{settings.AWS_REGION}.amazonaws.com/{key}"
+    
+    def _key_from_url(self, s3_url: str) -> str:
+        """Extract the object key from a canonical object URL"""
+        return s3_url.split(f"{self.bucket_name}.s3.{settings.AWS_REGION}.amazonaws.com/")[-1]
     
     def upload_image(self, image_data: bytes, folder: str, filename: str = None) -> Optional[str]:
         """
@@ -67,20 +175,65 @@ class S3StorageService:
                 ContentType=content_type,
                 ACL='private'  # Private by default for security
             )
+            self._invalidate_cached(key)
             
             # Return the S3 URL
-            return f"https://{self.bucket_name}.s3.{settings.AWS_REGION}.amazonaws.com/{key}"
+            return self._url_for_key(key)
             
-        except ClientError as e:
+        except (ClientError, BotoCoreError) as e:
             print(f"Error uploading to S3: {e}")
             return None
     
-    def upload_model(self, model_data: bytes, model_name: str, version: str, file_type: str) -> Optional[str]:
+    def upload_file(self, data: bytes, folder: str, filename: str, content_type: str) -> Optional[str]:
+        """
+        Upload arbitrary bytes (e.g. descriptors, manifests) to S3 and return the URL
+        """
+        if not self.s3_client:
+            return None
+        
+        key = f"{folder}/{filename}"
+        
+        try:
+            self.s3_client.put_object(
+                Bucket=self.bucket_name,
+                Key=key,
+                Body=data,
+                ContentType=content_type,
+                ACL='private'
+            )
+            self._invalidate_cached(key)
+            return self._url_for_key(key)
+            
+        except (ClientError, BotoCoreError) as e:
+            print(f"Error uploading to S3: {e}")
+            return None
+    
+    def upload_images(self, uploads: List[Tuple[bytes, str, str]]) -> List[Optional[str]]:
+        """
+        Upload several images concurrently over the shared connection pool
+        
+        Args:
+            uploads: (image bytes, folder, filename) per image
+            
+        Returns:
+            S3 URL (or None if that upload failed) per image, in input order
+        """
+        futures = [
+            self.executor.submit(self.upload_image, image_data, folder, filename)
+            for image_data, folder, filename in uploads
+        ]
+        return [future.result() for future in futures]
+    
+    def upload_model(self, model_data, model_name: str, version: str, file_type: str) -> Optional[str]:
         """
         Upload AI model file to S3
         
+        Files above S3_MULTIPART_THRESHOLD_MB are sent as a multipart upload with
+        S3_TRANSFER_CONCURRENCY parts in flight, streamed from disk when a path is given.
+        The SHA-256 is stored in the object metadata so downloads can be verified.
+        
         Args:
-            model_data: Model file bytes
+            model_data: Model file bytes, or the path of a local model file
             model_name: Name of the model
             version: Model version
             file_type: Type of file (weights, config, metadata)
@@ -95,41 +248,121 @@ class S3StorageService:
         key = f"models/{model_name}/{version}/{filename}"
         
         try:
-            self.s3_client.put_object(
-                Bucket=self.bucket_name,
-                Key=key,
-                Body=model_data,
-                ContentType="application/octet-stream",
-                ACL='private'
-            )
+            if isinstance(model_data, (bytes, bytearray)):
+                fileobj = io.BytesIO(model_data)
+            else:
+                fileobj = open(model_data, 'rb')
             
-            return f"https://{self.bucket_name}.s3.{settings.AWS_REGION}.amazonaws.com/{key}"
+            with fileobj:
+                sha256 = file_sha256(fileobj)
+                fileobj.seek(0)
+                self.s3_client.upload_fileobj(
+                    fileobj,
+                    self.bucket_name,
+                    key,
+                    ExtraArgs={
+                        'ContentType': "application/octet-stream",
+                        'ACL': 'private',
+                        'Metadata': {'sha256': sha256}
+                    },
+                    Config=self.transfer_config
+                )
+            self._invalidate_cached(key)
             
-        except ClientError as e:
+            return self._url_for_key(key)
+            
+        except (ClientError, BotoCoreError, OSError) as e:
             print(f"Error uploading model to S3: {e}")
             return None
     
-    def download_file(self, s3_url: str) -> Optional[bytes]:
+    def download_to_file(self, s3_url: str, local_path: str, expected_sha256: Optional[str] = None) -> Optional[str]:
+        """
+        Stream an object into a local file using concurrent ranged GETs, verifying its checksum
+        
+        The object is written to a temporary file next to local_path and renamed into place
+        only after its SHA-256 matches expected_sha256 (or the sha256 stored in the object
+        metadata by upload_model), so a partial or corrupt download never appears at local_path.
+        
+        Args:
+            s3_url: Full S3 URL
+            local_path: Destination file
+            expected_sha256: Checksum to verify against, overriding the object metadata
+            
+        Returns:
+            SHA-256 of the downloaded file, None if the download failed or did not verify
+        """
+        if not self.s3_client:
+            return None
+        
+        key = self._key_from_url(s3_url)
+        os.makedirs(os.path.dirname(local_path) or '.', exist_ok=True)
+        tmp_path = f"{local_path}.{uuid.uuid4().hex}.tmp"
+        
+        try:
+            head = self.s3_client.head_object(Bucket=self.bucket_name, Key=key)
+            expected_sha256 = expected_sha256 or head.get('Metadata', {}).get('sha256')
+            
+            self.s3_client.download_file(self.bucket_name, key, tmp_path, Config=self.transfer_config)
+            
+            if os.path.getsize(tmp_path) != head['ContentLength']:
+                print(f"Download of {key} is truncated")
+                return None
+            
+            with open(tmp_path, 'rb') as f:
+                sha256 = file_sha256(f)
+            if expected_sha256 and sha256 != expected_sha256:
+                print(f"Checksum mismatch for {key}: expected {expected_sha256}, got {sha256}")
+                return None
+            
+            os.replace(tmp_path, local_path)
+            return sha256
+            
+        except (ClientError, BotoCoreError, OSError) as e:
+            print(f"Error downloading {key} to {local_path}: {e}")
+            return None
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    
+    def download_file(self, s3_url: str, use_cache: bool = True) -> Optional[bytes]:
         """
         Download file from S3 URL
         
         Args:
             s3_url: Full S3 URL
+            use_cache: Read through the local disk cache when it is enabled
             
         Returns:
             File bytes if successful, None if failed
         """
+        if use_cache and self.disk_cache:
+            mapped = self.download_file_mapped(s3_url)
+            return bytes(mapped) if mapped is not None else None
+        
+        return self._get_object_bytes(self._key_from_url(s3_url))
+    
+    def download_file_mapped(self, s3_url: str):
+        """
+        Read-only buffer with the object's contents, without copying cached files into memory
+        
+        Returns a memory-mapped file from the disk cache (bytes when the cache is disabled),
+        suitable for np.frombuffer / cv2.imdecode. None if the download failed.
+        """
+        key = self._key_from_url(s3_url)
+        if not self.disk_cache:
+            return self._get_object_bytes(key)
+        
+        return self.disk_cache.get_or_fetch(f"{self.bucket_name}/{key}", lambda: self._get_object_bytes(key))
+    
+    def _get_object_bytes(self, key: str) -> Optional[bytes]:
         if not self.s3_client:
             return None
         
         try:
-            # Extract key from URL
-            key = s3_url.split(f"{self.bucket_name}.s3.{settings.AWS_REGION}.amazonaws.com/")[-1]
-            
             response = self.s3_client.get_object(Bucket=self.bucket_name, Key=key)
             return response['Body'].read()
             
-        except ClientError as e:
+        except (ClientError, BotoCoreError) as e:
             print(f"Error downloading from S3: {e}")
             return None
     
@@ -149,7 +382,7 @@ class S3StorageService:
         
         try:
             # Extract key from URL
-            key = s3_url.split(f"{self.bucket_name}.s3.{settings.AWS_REGION}.amazonaws.com/")[-1]
+            key = self._key_from_url(s3_url)
             
             presigned_url = self.s3_client.generate_presigned_url(
                 'get_object',
@@ -159,7 +392,7 @@ class S3StorageService:
             
             return presigned_url
             
-        except ClientError as e:
+        except (ClientError, BotoCoreError) as e:
             print(f"Error generating presigned URL: {e}")
             return None
     
@@ -178,15 +411,52 @@ class S3StorageService:
         
         try:
             # Extract key from URL
-            key = s3_url.split(f"{self.bucket_name}.s3.{settings.AWS_REGION}.amazonaws.com/")[-1]
+            key = self._key_from_url(s3_url)
             
             self.s3_client.delete_object(Bucket=self.bucket_name, Key=key)
+            self._invalidate_cached(key)
             return True
             
-        except ClientError as e:
+        except (ClientError, BotoCoreError) as e:
             print(f"Error deleting from S3: {e}")
             return False
     
+    def iter_objects(self, key_prefix: str) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Stream listing pages (up to 1000 objects each) under a key prefix
+        
+        Yields:
+            Lists of objects with Key, Size and LastModified
+        """
+        if not self.s3_client:
+            return
+        
+        params = {'Bucket': self.bucket_name, 'Prefix': key_prefix, 'MaxKeys': LIST_PAGE_SIZE}
+        while True:
+            response = self.s3_client.list_objects_v2(**params)
+            if response.get('Contents'):
+                yield response['Contents']
+            if not response.get('IsTruncated'):
+                return
+            params['ContinuationToken'] = response['NextContinuationToken']
+    
+    def iter_files(self, folder: str, prefix: str = "") -> Iterator[str]:
+        """
+        Stream the URLs of every file in an S3 folder, page by page
+        
+        Args:
+            folder: S3 folder
+            prefix: Optional prefix filter
+        """
+        key_prefix = f"{folder}/{prefix}" if prefix else folder
+        try:
+            for page in self.iter_objects(key_prefix):
+                for obj in page:
+                    yield self._url_for_key(obj['Key'])
+                    
+        except (ClientError, BotoCoreError) as e:
+            print(f"Error listing S3 files: {e}")
+    
     def list_files(self, folder: str, prefix: str = "") -> list:
         """
         List files in S3 folder
@@ -198,28 +468,94 @@ class S3StorageService:
         Returns:
             List of file URLs
         """
+        return list(self.iter_files(folder, prefix))
+    
+    def delete_keys(self, keys: Iterable[str]) -> int:
+        """
+        Delete objects with batched delete_objects calls (1000 keys each), several batches in flight
+        
+        Keys are consumed lazily, so a listing generator can be passed straight in.
+        
+        Returns:
+            Number of objects deleted
+        """
         if not self.s3_client:
-            return []
+            return 0
+        
+        deleted = 0
+        in_flight = deque()
+        
+        def drain(limit: int):
+            nonlocal deleted
+            while len(in_flight) > limit:
+                deleted += in_flight.popleft().result()
+        
+        batch = []
+        for key in keys:
+            batch.append(key)
+            if len(batch) == DELETE_BATCH_SIZE:
+                in_flight.append(self.executor.submit(self._delete_batch, batch))
+                batch = []
+                drain(settings.S3_MAX_POOL_CONNECTIONS)
+        if batch:
+            in_flight.append(self.executor.submit(self._delete_batch, batch))
+        drain(0)
         
+        return deleted
+    
+    def delete_files(self, s3_urls: Iterable[str]) -> int:
+        """Delete many files by URL in batches; returns the number deleted"""
+        return self.delete_keys(self._key_from_url(s3_url) for s3_url in s3_urls)
+    
+    def delete_prefix(self, key_prefix: str) -> int:
+        """Delete every object under a key prefix, deleting each listing page while the next is fetched"""
         try:
-            key_prefix = f"{folder}/{prefix}" if prefix else folder
-            
-            response = self.s3_client.list_objects_v2(
+            return self.delete_keys(
+                obj['Key'] for page in self.iter_objects(key_prefix) for obj in page
+            )
+        except (ClientError, BotoCoreError) as e:
+            print(f"Error deleting S3 prefix {key_prefix}: {e}")
+            return 0
+    
+    def _delete_batch(self, keys: List[str]) -> int:
+        try:
+            response = self.s3_client.delete_objects(
                 Bucket=self.bucket_name,
-                Prefix=key_prefix
+                Delete={'Objects': [{'Key': key} for key in keys], 'Quiet': True}
             )
-            
-            files = []
-            if 'Contents' in response:
-                for obj in response['Contents']:
-                    file_url = f"https://{self.bucket_name}.s3.{settings.AWS_REGION}.amazonaws.com/{obj['Key']}"
-                    files.append(file_url)
-            
-            return files
+        except (ClientError, BotoCoreError) as e:
+            print(f"Error deleting {len(keys)} objects from S3: {e}")
+            return 0
+        
+        for key in keys:
+            self._invalidate_cached(key)
+        
+        errors = response.get('Errors', [])
+        for error in errors[:5]:
+            print(f"Error deleting {error.get('Key')} from S3: {error.get('Code')} {error.get('Message')}")
+        return len(keys) - len(errors)
+    
+    def object_exists(self, s3_url: str) -> bool:
+        """
+        Check whether an object exists with a HEAD request
+        
+        Returns:
+            True if the object exists, False if it does not or S3 is unavailable
+        """
+        if not self.s3_client:
+            return False
+        
+        try:
+            self.s3_client.head_object(Bucket=self.bucket_name, Key=self._key_from_url(s3_url))
+            return True
             
         except ClientError as e:
-            print(f"Error listing S3 files: {e}")
-            return []
+            if e.response.get('Error', {}).get('Code') not in ('404', 'NoSuchKey', 'NotFound'):
+                print(f"Error checking S3 object: {e}")
+            return False
+        except BotoCoreError as e:
+            print(f"Error checking S3 object: {e}")
+            return False
     
     def get_file_metadata(self, s3_url: str) -> Optional[Dict[str, Any]]:
         """
@@ -236,7 +572,7 @@ class S3StorageService:
         
         try:
             # Extract key from URL
-            key = s3_url.split(f"{self.bucket_name}.s3.{settings.AWS_REGION}.amazonaws.com/")[-1]
+            key = self._key_from_url(s3_url)
             
             response = self.s3_client.head_object(Bucket=self.bucket_name, Key=key)
             
@@ -244,12 +580,53 @@ class S3StorageService:
                 'size': response['ContentLength'],
                 'last_modified': response['LastModified'],
                 'content_type': response.get('ContentType', 'unknown'),
-                'etag': response['ETag']
+                'etag': response['ETag'],
+                'metadata': response.get('Metadata', {})
             }
             
-        except ClientError as e:
+        except (ClientError, BotoCoreError) as e:
             print(f"Error getting file metadata: {e}")
             return None
 
-# Global S3 service instance
+class AsyncS3StorageService:
+    """
+    Async interface to S3StorageService for use inside async route handlers
+    
+    Calls run on the service's thread pool, sized to the S3 connection pool, so
+    they never block the event loop and never queue for a connection.
+    """
+    
+    def __init__(self, storage: S3StorageService):
+        self._storage = storage
+    
+    async def _run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._storage.executor, functools.partial(fn, *args, **kwargs))
+    
+    async def upload_image(self, image_data: bytes, folder: str, filename: str = None) -> Optional[str]:
+        return await self._run(self._storage.upload_image, image_data, folder, filename)
+    
+    async def upload_model(self, model_data, model_name: str, version: str, file_type: str) -> Optional[str]:
+        return await self._run(self._storage.upload_model, model_data, model_name, version, file_type)
+    
+    async def download_file(self, s3_url: str) -> Optional[bytes]:
+        return await self._run(self._storage.download_file, s3_url)
+    
+    async def download_to_file(self, s3_url: str, local_path: str, expected_sha256: Optional[str] = None) -> Optional[str]:
+        return await self._run(self._storage.download_to_file, s3_url, local_path, expected_sha256)
+    
+    async def generate_presigned_url(self, s3_url: str, expiration: int = 3600) -> Optional[str]:
+        return await self._run(self._storage.generate_presigned_url, s3_url, expiration)
+    
+    async def delete_file(self, s3_url: str) -> bool:
+        return await self._run(self._storage.delete_file, s3_url)
+    
+    async def list_files(self, folder: str, prefix: str = "") -> list:
+        return await self._run(self._storage.list_files, folder, prefix)
+    
+    async def get_file_metadata(self, s3_url: str) -> Optional[Dict[str, Any]]:
+        return await self._run(self._storage.get_file_metadata, s3_url)
+
+# Global S3 service instances
 s3_service = S3StorageService()
+s3_async = AsyncS3StorageService(s3_service)
@@ -0,0 +1,200 @@
+"""
+Shadow Evaluation Service
+Runs a candidate DamageModel on sampled live traffic, off the request path
+"""
+
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple
+
+from sqlalchemy.dialects.postgresql import insert
+
+from core.config import settings
+from core.database import SessionLocal
+from core.damage_ai_models import DamageModel, DamageMetrics, DamageRescoreResult
+from services.damage_ai_service import DamageAIService, damage_ai_service, get_damage_ai_service
+
+# Agreement metrics maintained as running means in damage_metrics
+SHADOW_METRIC_TYPES = ['shadow_detection_agreement', 'shadow_severity_agreement', 'shadow_confidence_mae']
+
+def _lower_thread_priority():
+    """Run shadow inference at a lower CPU priority than request handling (Linux per-thread nice)"""
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), settings.SHADOW_THREAD_NICE)
+    except (AttributeError, OSError):
+        pass
+
+class ShadowEvaluationService:
+    def __init__(self):
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._queue_slots = threading.BoundedSemaphore(settings.SHADOW_MAX_QUEUE)
+        self._candidate: Optional[Tuple[uuid.UUID, DamageAIService]] = None
+        self._candidate_lock = threading.Lock()
+        self.stats = {'sampled': 0, 'dropped': 0, 'evaluated': 0, 'failed': 0}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(settings.SHADOW_MODEL_VERSION) and settings.SHADOW_SAMPLE_RATE > 0
+
+    def maybe_submit(self, detection_id: str, before_image_bytes: bytes, after_image_bytes: bytes,
+                     active_result: Dict[str, Any]) -> bool:
+        """
+        Sample a live detection for shadow evaluation
+
+        Returns immediately; the candidate model runs on a low-priority worker.
+        Samples are dropped rather than queued without bound when the worker falls behind.
+
+        Returns:
+            True if the detection was queued for the candidate model
+        """
+        if not self.enabled or active_result.get('status') != 'completed':
+            return False
+
+        if random.random() >= settings.SHADOW_SAMPLE_RATE:
+            return False
+
+        if not self._queue_slots.acquire(blocking=False):
+            self.stats['dropped'] += 1
+            return False
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="shadow-eval", initializer=_lower_thread_priority
+            )
+
+        self.stats['sampled'] += 1
+        self._executor.submit(
+            self._evaluate, detection_id, before_image_bytes, after_image_bytes, active_result
+        )
+        return True
+
+    def shutdown(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _get_candidate(self) -> Tuple[uuid.UUID, DamageAIService]:
+        """Resolve the configured candidate model once and keep its service loaded"""
+        with self._candidate_lock:
+            if self._candidate is None:
+                db = SessionLocal()
+                try:
+                    model = db.query(DamageModel).filter(
+                        DamageModel.model_version == settings.SHADOW_MODEL_VERSION
+                    ).order_by(DamageModel.created_at.desc()).first()
+                finally:
+                    db.close()
+
+                if not model:
+                    raise ValueError(f"Shadow model {settings.SHADOW_MODEL_VERSION} not found")
+
+                service = get_damage_ai_service(model.model_version, model.model_weights_path)
+                self._candidate = (model.id, service)
+
+            return self._candidate
+
+    def _evaluate(self, detection_id: str, before_image_bytes: bytes, after_image_bytes: bytes,
+                  active_result: Dict[str, Any]):
+        """Run the candidate model and record its result and agreement with the active model"""
+        try:
+            # Yield to interactive traffic; the sample is still taken, just later
+            while damage_ai_service.inflight_requests > 0:
+                time.sleep(0.05)
+
+            model_id, candidate = self._get_candidate()
+            candidate_result = candidate.score_batch([(before_image_bytes, after_image_bytes)])[0]
+
+            if candidate_result.get('status') != 'completed':
+                raise RuntimeError(candidate_result.get('error', 'candidate scoring failed'))
+
+            self._record(detection_id, model_id, candidate.model_version, active_result, candidate_result)
+            self.stats['evaluated'] += 1
+
+        except Exception as e:
+            self.stats['failed'] += 1
+            print(f"Shadow evaluation failed for detection {detection_id}: {e}")
+        finally:
+            self._queue_slots.release()
+
+    def _record(self, detection_id: str, model_id: uuid.UUID, model_version: str,
+                active_result: Dict[str, Any], candidate_result: Dict[str, Any]):
+        """Store the candidate result next to the active one and fold it into the running metrics"""
+        observations = {
+            'shadow_detection_agreement': float(
+                active_result['damage_detected'] == candidate_result['damage_detected']
+            ),
+            'shadow_severity_agreement': float(
+                active_result['damage_severity'] == candidate_result['damage_severity']
+            ),
+            'shadow_confidence_mae': abs(
+                active_result['confidence_score'] - candidate_result['confidence_score']
+            )
+        }
+
+        db = SessionLocal()
+        try:
+            stmt = insert(DamageRescoreResult).values(
+                id=uuid.uuid4(),
+                detection_id=detection_id,
+                model_id=model_id,
+                model_version=model_version,
+                source="shadow",
+                damage_detected=candidate_result['damage_detected'],
+                confidence_score=candidate_result['confidence_score'],
+                damage_severity=candidate_result['damage_severity'],
+                ssim_score=candidate_result['ssim_score'],
+                lpips_score=candidate_result['lpips_score'],
+                yolo_detections=candidate_result['yolo_detections'],
+                uncertainty_score=candidate_result['uncertainty_score'],
+                inference_time_ms=candidate_result['processing_time_ms'],
+                status="completed",
+                created_at=datetime.utcnow()
+            ).on_conflict_do_nothing(constraint="uq_rescore_detection_version")
+            db.execute(stmt)
+
+            for metric_type, value in observations.items():
+                self._update_running_mean(db, model_id, metric_type, value)
+
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _update_running_mean(self, db, model_id: uuid.UUID, metric_type: str, value: float):
+        """
+        Fold a sample into a metric's mean in one upsert, so concurrent workers neither lose
+        samples nor create duplicate rows (uq_damage_metrics_shadow)
+        """
+        now = datetime.utcnow()
+        stmt = insert(DamageMetrics).values(
+            id=uuid.uuid4(),
+            model_id=model_id,
+            metric_type=metric_type,
+            metric_value=value,
+            dataset_split="shadow",
+            damage_type="overall",
+            sample_size=1,
+            evaluation_date=now,
+            updated_at=now
+        )
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[DamageMetrics.model_id, DamageMetrics.metric_type],
+            index_where=DamageMetrics.dataset_split == "shadow",
+            set_={
+                'metric_value': (DamageMetrics.metric_value * DamageMetrics.sample_size + value)
+                / (DamageMetrics.sample_size + 1),
+                'sample_size': DamageMetrics.sample_size + 1,
+                'evaluation_date': now,
+                'updated_at': now
+            }
+        ))
+
+# Global shadow evaluation service instance
+shadow_evaluation_service = ShadowEvaluationService()
@@ -0,0 +1,262 @@
+"""
+Storage GC Service
+Purges old damage detections (by dropping expired monthly partitions) together with the S3
+objects they reference, and sweeps objects left behind by detections that no longer exist
+"""
+
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Any, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.database import SessionLocal, StorageBlobRef
+from core.damage_ai_models import DamageDetection, DamageLabel, DamageRescoreResult
+from services.blob_store import blob_store
+from services.partition_service import partition_service, Partition
+from services.s3_storage import s3_service
+
+# Legacy (non content-addressed) layout: <prefix>/<detection_id>/<file>
+DETECTION_PREFIXES = ['damage-images', 'damage-overlays', 'damage-heatmaps']
+
+# Detections removed (with their rescore results and blob references) per transaction
+# when dropping a partition
+RELEASE_BATCH_SIZE = 5000
+
+class StorageGCService:
+    def __init__(self):
+        self.stats = {'detections_purged': 0, 'objects_deleted': 0, 'orphans_deleted': 0, 'refs_released': 0}
+
+    def purge_detections(self, cutoff: datetime, batch_size: int = 500) -> Dict[str, int]:
+        """
+        Remove detections created before cutoff and release or delete their objects
+
+        Monthly partitions of damage_detections that end before cutoff are detached and
+        dropped whole (see _drop_partition), so retention never runs a large DELETE on the
+        live table; partitions a previous run detached but did not finish are dropped too. The
+        month containing cutoff is kept until it has expired entirely. Rows older than every
+        monthly partition can only be in the default partition; those are deleted in batches,
+        as is everything when the table is not partitioned.
+
+        Labelled detections are kept; they are training data and damage_labels references them.
+        Legacy per-detection prefixes are deleted once the rows are gone.
+
+        Returns:
+            Counts of detections purged, partitions dropped, blob references released and
+            legacy objects deleted
+        """
+        purged = {'detections': 0, 'partitions_dropped': 0, 'refs_released': 0, 'objects_deleted': 0}
+
+        db = SessionLocal()
+        try:
+            partitions = partition_service.partitions(db, DamageDetection.__tablename__)
+            detached = partition_service.detached(db, DamageDetection.__tablename__)
+        finally:
+            db.close()
+
+        expired = [partition for partition in partitions if partition.upper <= cutoff]
+        for partition in detached + expired:
+            detection_ids, released = self._drop_partition(partition, detach=partition in expired)
+            purged['detections'] += len(detection_ids)
+            purged['partitions_dropped'] += 1
+            purged['refs_released'] += released
+            purged['objects_deleted'] += self._delete_legacy_objects(detection_ids)
+
+        remaining = [partition for partition in partitions if partition.upper > cutoff]
+        if remaining:
+            cutoff = min(cutoff, remaining[0].lower)
+
+        while True:
+            db = SessionLocal()
+            try:
+                labelled = db.query(DamageLabel.id).filter(DamageLabel.detection_id == DamageDetection.id)
+                detection_ids = [
+                    detection_id for (detection_id,) in db.query(DamageDetection.id).filter(
+                        DamageDetection.created_at < cutoff,
+                        ~labelled.exists()
+                    ).order_by(DamageDetection.created_at).limit(batch_size).with_for_update(skip_locked=True).all()
+                ]
+
+                if not detection_ids:
+                    db.commit()
+                    break
+
+                db.query(DamageRescoreResult).filter(
+                    DamageRescoreResult.detection_id.in_(detection_ids)
+                ).delete(synchronize_session=False)
+                db.query(DamageDetection).filter(
+                    DamageDetection.id.in_(detection_ids)
+                ).delete(synchronize_session=False)
+                released = blob_store.release('damage_detection', detection_ids, db=db)
+
+                db.commit()
+
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+
+            purged['detections'] += len(detection_ids)
+            purged['refs_released'] += released
+            purged['objects_deleted'] += self._delete_legacy_objects(detection_ids)
+
+            if len(detection_ids) < batch_size:
+                break
+
+        self.stats['detections_purged'] += purged['detections']
+        self.stats['refs_released'] += purged['refs_released']
+        self.stats['objects_deleted'] += purged['objects_deleted']
+        return purged
+
+    def _drop_partition(self, partition: Partition, detach: bool = True) -> Tuple[List[uuid.UUID], int]:
+        """
+        Detach and drop an expired detections partition
+
+        The detach commits on its own, so the parent table is locked only briefly. The rest
+        works on the detached table in short transactions: labelled detections are copied back
+        into damage_detections (their month is gone, so they land in the default partition),
+        then the other detections are removed in batches with their rescore results and blob
+        references, and the emptied table is dropped. Every step can be resumed: a partition
+        detached by an interrupted run is passed in again with detach=False.
+
+        Returns:
+            Ids of the dropped detections and the number of blob references released
+        """
+        table = DamageDetection.__tablename__
+        labelled = f"EXISTS (SELECT 1 FROM {DamageLabel.__tablename__} l WHERE l.detection_id = d.id)"
+
+        if detach:
+            with self._transaction() as db:
+                partition_service.detach(db, table, partition)
+
+        with self._transaction() as db:
+            kept = db.execute(text(
+                f"WITH kept AS (DELETE FROM {partition.name} d WHERE {labelled} RETURNING d.*) "
+                f"INSERT INTO {table} SELECT * FROM kept"
+            )).rowcount
+
+        detection_ids, released = [], 0
+        while True:
+            with self._transaction() as db:
+                batch = [uuid.UUID(str(detection_id)) for detection_id in db.execute(text(
+                    f"DELETE FROM {partition.name} WHERE id IN "
+                    f"(SELECT id FROM {partition.name} LIMIT :batch_size) RETURNING id"
+                ), {'batch_size': RELEASE_BATCH_SIZE}).scalars()]
+                if not batch:
+                    break
+
+                db.query(DamageRescoreResult).filter(
+                    DamageRescoreResult.detection_id.in_(batch)
+                ).delete(synchronize_session=False)
+                released += blob_store.release('damage_detection', batch, db=db)
+
+            detection_ids.extend(batch)
+
+        with self._transaction() as db:
+            partition_service.drop(db, partition)
+
+        print(f"Dropped detections partition {partition.name}: {len(detection_ids)} purged, {kept} labelled kept")
+        return detection_ids, released
+
+    @contextmanager
+    def _transaction(self) -> Iterator[Session]:
+        db = SessionLocal()
+        try:
+            yield db
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def sweep_orphans(self, grace_hours: Optional[int] = None) -> Dict[str, int]:
+        """
+        Delete legacy objects and blob references whose detection row no longer exists
+
+        Catches what purge_detections could not, e.g. rows deleted by hand or a crash between
+        commit and object deletion. Listings are streamed page by page, and objects newer than
+        the grace period are skipped so uploads for a detection still being inserted survive.
+
+        Returns:
+            Counts of orphaned objects deleted and blob references released
+        """
+        grace_hours = settings.BLOB_GC_GRACE_HOURS if grace_hours is None else grace_hours
+        cutoff = datetime.utcnow() - timedelta(hours=grace_hours)
+        swept = {'objects_deleted': 0, 'refs_released': 0}
+
+        for prefix in DETECTION_PREFIXES:
+            for page in s3_service.iter_objects(f"{prefix}/"):
+                owners = {}
+                for obj in page:
+                    detection_id = self._detection_id(obj['Key'], prefix)
+                    last_modified = obj.get('LastModified')
+                    if last_modified is not None and last_modified.replace(tzinfo=None) >= cutoff:
+                        continue
+                    if detection_id:
+                        owners.setdefault(detection_id, []).append(obj['Key'])
+
+                missing = set(owners) - self._existing_detections(owners)
+                keys = [key for detection_id in missing for key in owners[detection_id]]
+                if keys:
+                    swept['objects_deleted'] += s3_service.delete_keys(keys)
+
+        db = SessionLocal()
+        try:
+            owner_ids = [
+                owner_id for (owner_id,) in db.query(StorageBlobRef.owner_id).filter(
+                    StorageBlobRef.owner_type == 'damage_detection',
+                    StorageBlobRef.created_at < cutoff,
+                    ~db.query(DamageDetection.id).filter(DamageDetection.id == StorageBlobRef.owner_id).exists()
+                ).distinct().all()
+            ]
+        finally:
+            db.close()
+
+        swept['refs_released'] = blob_store.release('damage_detection', owner_ids)
+
+        self.stats['orphans_deleted'] += swept['objects_deleted']
+        self.stats['refs_released'] += swept['refs_released']
+        return swept
+
+    def run(self, retention_days: int = 90) -> Dict[str, Any]:
+        """Purge detections older than retention_days, then sweep orphans"""
+        cutoff = datetime.utcnow() - timedelta(days=retention_days)
+        return {
+            'purged': self.purge_detections(cutoff),
+            'swept': self.sweep_orphans()
+        }
+
+    def _delete_legacy_objects(self, detection_ids: List[uuid.UUID]) -> int:
+        deleted = 0
+        for detection_id in detection_ids:
+            for prefix in DETECTION_PREFIXES:
+                deleted += s3_service.delete_prefix(f"{prefix}/{detection_id}/")
+        return deleted
+
+    def _detection_id(self, key: str, prefix: str) -> Optional[str]:
+        parts = key[len(prefix) + 1:].split('/', 1)
+        try:
+            return str(uuid.UUID(parts[0]))
+        except ValueError:
+            return None
+
+    def _existing_detections(self, detection_ids: Set[str]) -> Set[str]:
+        if not detection_ids:
+            return set()
+
+        db = SessionLocal()
+        try:
+            rows = db.query(DamageDetection.id).filter(
+                DamageDetection.id.in_([uuid.UUID(detection_id) for detection_id in detection_ids])
+            ).all()
+            return {str(detection_id) for (detection_id,) in rows}
+        finally:
+            db.close()
+
+# Global storage GC service instance
+storage_gc_service = StorageGCService()
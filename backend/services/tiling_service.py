@@ -0,0 +1,238 @@
+"""
+Tiling Service
+Builds DeepZoom tile pyramids of detection images so viewers fetch only the visible tiles
+"""
+
+import math
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from core.config import settings
+from core.database import SessionLocal
+from core.damage_ai_models import DamageDetection
+from services.s3_storage import s3_service
+
+DZI_TEMPLATE = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" Format="{format}" '
+    'Overlap="{overlap}" TileSize="{tile_size}"><Size Width="{width}" Height="{height}"/></Image>\n'
+)
+
+# Tiles are uploaded in chunks so a 12 MP pyramid never sits fully encoded in memory
+UPLOAD_CHUNK_SIZE = 64
+
+class TilingService:
+    def __init__(self):
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = set()
+        # (detection id, column) -> (consecutive failures, monotonic time before which no rebuild starts)
+        self._failures: Dict[Tuple[str, str], Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+
+    def tile_prefix(self, s3_url: str) -> str:
+        """Key prefix of an image's pyramid, next to its source object"""
+        key = s3_service._key_from_url(s3_url)
+        folder, _, filename = key.rpartition('/')
+        return f"{folder}/tiles/{filename.rsplit('.', 1)[0]}"
+
+    def tile_url(self, pyramid: Dict[str, Any], level: int, col: int, row: int) -> str:
+        return s3_service._url_for_key(f"{pyramid['prefix']}_files/{level}/{col}_{row}.{pyramid['format']}")
+
+    def iter_tiles(self, image: np.ndarray, tile_size: int, overlap: int) -> Iterator[Tuple[int, int, int, np.ndarray]]:
+        """
+        Yield (level, col, row, tile) for the DeepZoom pyramid of an image
+
+        Level max_level is full resolution and each level below halves it, down to 1x1 at level 0.
+        """
+        height, width = image.shape[:2]
+        max_level = math.ceil(math.log2(max(width, height, 1)))
+
+        level_image = image
+        for level in range(max_level, -1, -1):
+            scale = 2 ** (max_level - level)
+            level_width, level_height = math.ceil(width / scale), math.ceil(height / scale)
+            if level_image.shape[1] != level_width or level_image.shape[0] != level_height:
+                level_image = cv2.resize(level_image, (level_width, level_height), interpolation=cv2.INTER_AREA)
+
+            for row in range(math.ceil(level_height / tile_size)):
+                for col in range(math.ceil(level_width / tile_size)):
+                    x0 = max(col * tile_size - overlap, 0)
+                    y0 = max(row * tile_size - overlap, 0)
+                    x1 = min((col + 1) * tile_size + overlap, level_width)
+                    y1 = min((row + 1) * tile_size + overlap, level_height)
+                    yield level, col, row, level_image[y0:y1, x0:x1]
+
+    def build_pyramid(self, s3_url: str, image_bytes: Optional[bytes] = None) -> Optional[Dict[str, Any]]:
+        """
+        Tile one stored image and upload the tiles plus a .dzi descriptor
+
+        Returns:
+            Pyramid descriptor (size, tile size, overlap, format, levels, key prefix) or None on failure
+        """
+        if image_bytes is None:
+            image_bytes = s3_service.download_file_mapped(s3_url)
+        if not image_bytes:
+            return None
+
+        image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            return None
+
+        height, width = image.shape[:2]
+        prefix = self.tile_prefix(s3_url)
+        folder, _, stem = prefix.rpartition('/')
+        pyramid = {
+            'width': width,
+            'height': height,
+            'tile_size': settings.TILE_SIZE,
+            'overlap': settings.TILE_OVERLAP,
+            'format': 'webp',
+            'max_level': math.ceil(math.log2(max(width, height, 1))),
+            'prefix': prefix
+        }
+
+        encode_params = [cv2.IMWRITE_WEBP_QUALITY, settings.TILE_WEBP_QUALITY]
+        chunk = []
+        failed = 0
+        for level, col, row, tile in self.iter_tiles(image, pyramid['tile_size'], pyramid['overlap']):
+            ok, buffer = cv2.imencode('.webp', tile, encode_params)
+            if not ok:
+                failed += 1
+                continue
+            chunk.append((buffer.tobytes(), f"{prefix}_files/{level}", f"{col}_{row}.webp"))
+            if len(chunk) >= UPLOAD_CHUNK_SIZE:
+                failed += s3_service.upload_images(chunk).count(None)
+                chunk = []
+        if chunk:
+            failed += s3_service.upload_images(chunk).count(None)
+
+        if failed:
+            print(f"Tiling {s3_url}: {failed} tiles failed")
+            return None
+
+        descriptor = DZI_TEMPLATE.format(**pyramid).encode()
+        s3_service.upload_file(descriptor, folder, f"{stem}.dzi", "application/xml")
+        pyramid['dzi_url'] = s3_service._url_for_key(f"{prefix}.dzi")
+        return pyramid
+
+    def build_for_detection(self, detection_id: str, sources: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Build pyramids for a detection's images and record them on the detection
+
+        Args:
+            detection_id: Detection to update
+            sources: Detection column -> source S3 URL
+
+        Returns:
+            Detection column -> pyramid descriptor
+        """
+        built = {}
+        for column, s3_url in sources.items():
+            if not s3_url:
+                continue
+            try:
+                pyramid = self.build_pyramid(s3_url)
+                if pyramid:
+                    built[column] = pyramid
+            except Exception as e:
+                print(f"Tiling failed for {s3_url}: {e}")
+            self._record_attempt(detection_id, column, succeeded=column in built)
+
+        if not built:
+            return built
+
+        db = SessionLocal()
+        try:
+            detection = db.query(DamageDetection).filter(
+                DamageDetection.id == uuid.UUID(str(detection_id))
+            ).with_for_update().first()
+            if detection:
+                detection.tile_pyramids = {**(detection.tile_pyramids or {}), **built}
+                db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Failed to record tile pyramids for detection {detection_id}: {e}")
+        finally:
+            db.close()
+
+        return built
+
+    def retry_after(self, detection_id: str, column: str) -> Optional[int]:
+        """Seconds until the pyramid of a detection image may be rebuilt after failing, or None"""
+        with self._lock:
+            _, retry_at = self._failures.get((str(detection_id), column), (0, 0.0))
+        remaining = retry_at - time.monotonic()
+        return math.ceil(remaining) if remaining > 0 else None
+
+    def schedule(self, detection_id: str, sources: Dict[str, str]) -> bool:
+        """
+        Build pyramids in the background; repeated requests for the same images are ignored,
+        and so are images whose last build failed until their backoff (retry_after) has passed
+        """
+        sources = {column: s3_url for column, s3_url in sources.items() if not self.retry_after(detection_id, column)}
+        if not sources:
+            return False
+        job_key = (str(detection_id), tuple(sorted(sources)))
+        with self._lock:
+            if job_key in self._pending:
+                return False
+            self._pending.add(job_key)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=settings.TILE_WORKERS, thread_name_prefix="tiling"
+                )
+
+        future = self._executor.submit(self.build_for_detection, detection_id, sources)
+        future.add_done_callback(lambda _: self._discard_pending(job_key))
+        return True
+
+    def tile_urls(self, pyramid: Dict[str, Any], level: int, tiles: List[Tuple[int, int]]) -> Dict[str, str]:
+        """
+        Object URLs of the requested tiles of one level, skipping coordinates outside the level
+
+        Returns:
+            "col_row" -> S3 URL
+        """
+        scale = 2 ** (pyramid['max_level'] - level)
+        cols = math.ceil(math.ceil(pyramid['width'] / scale) / pyramid['tile_size'])
+        rows = math.ceil(math.ceil(pyramid['height'] / scale) / pyramid['tile_size'])
+
+        return {
+            f"{col}_{row}": self.tile_url(pyramid, level, col, row)
+            for col, row in tiles
+            if 0 <= col < cols and 0 <= row < rows
+        }
+
+    def shutdown(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _record_attempt(self, detection_id: str, column: str, succeeded: bool):
+        key = (str(detection_id), column)
+        now = time.monotonic()
+        with self._lock:
+            if succeeded:
+                self._failures.pop(key, None)
+                return
+            # Forget failures long past their retry time, so images nobody asks for again don't pile up
+            stale_before = now - settings.TILE_RETRY_BACKOFF_MAX_SECONDS
+            for stale in [k for k, (_, retry_at) in self._failures.items() if retry_at < stale_before]:
+                del self._failures[stale]
+            failures = self._failures.get(key, (0, 0.0))[0] + 1
+            backoff = min(settings.TILE_RETRY_BACKOFF_SECONDS * 2 ** (failures - 1),
+                          settings.TILE_RETRY_BACKOFF_MAX_SECONDS)
+            self._failures[key] = (failures, now + backoff)
+
+    def _discard_pending(self, job_key: Tuple[str, Tuple[str, ...]]):
+        with self._lock:
+            self._pending.discard(job_key)
+
+# Global tiling service instance
+tiling_service = TilingService()
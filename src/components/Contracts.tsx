@@ -29,8 +29,8 @@ const Contracts: React.FC<ContractsProps> = ({ fleetMode, language }) => {
   const loadContracts = async () => {
     setLoading(true);
     try {
-      const backendContracts = await FastAPIService.getMyContracts();
-      setContracts(backendContracts);
+      const page = await FastAPIService.getMyContracts();
+      setContracts(page.items);
     } catch (error) {
       console.error('Error loading contracts:', error);
       // Fallback to mock data
@@ -36,6 +36,12 @@ interface Contract {
   created_at: string;
 }
 
+interface Page<T> {
+  items: T[];
+  next_cursor: string | null;
+  limit: number;
+}
+
 interface DamageDetectionResponse {
   damages_detected: boolean;
   damage_locations: Array<{
@@ -47,6 +53,18 @@ interface DamageDetectionResponse {
   estimated_cost: number;
 }
 
+interface Fine {
+  id: string;
+  contract_id: string;
+  violation: string;
+  amount: number;
+  date: string;
+  status: string;
+  location: string | null;
+  source: string;
+  created_at: string;
+}
+
 interface FineCheckResponse {
   fines: Array<{
     fine_id: string;
@@ -211,8 +229,9 @@ export class FastAPIService {
     });
   }
 
-  static async getMyContracts(): Promise<Contract[]> {
-    return this.request<Contract[]>('/api/contracts/my-contracts');
+  static async getMyContracts(cursor?: string): Promise<Page<Contract>> {
+    const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+    return this.request<Page<Contract>>(`/api/contracts/my-contracts${query}`);
   }
 
   static async getContractPDF(contractId: string): Promise<Blob> {
@@ -254,8 +273,9 @@ export class FastAPIService {
     });
   }
 
-  static async getMyFines(): Promise<FineCheckResponse> {
-    return this.request<FineCheckResponse>('/api/fines/my-fines');
+  static async getMyFines(cursor?: string): Promise<Page<Fine>> {
+    const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+    return this.request<Page<Fine>>(`/api/fines/my-fines${query}`);
   }
 
   static async sendChatbotMessage(message: string, conversationId?: string): Promise<ChatbotResponse> {
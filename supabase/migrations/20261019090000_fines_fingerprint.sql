@@ -0,0 +1,48 @@
+/*
+  # Fine fingerprints for idempotent ingestion
+
+  1. Changes
+    - `fines.fingerprint` - SHA-256 of plate, violation, date, location and source
+      (same normalisation as FineIngestionService.fingerprint in the API)
+    - Unique index `ix_fines_fingerprint`, the conflict target of
+      INSERT ... ON CONFLICT (fingerprint) DO NOTHING
+
+  2. Backfill
+    - Existing fines get their fingerprint from their contract's car plate
+    - Where duplicates already exist, only the oldest row is fingerprinted; the others
+      keep a NULL fingerprint and are left in place for review
+*/
+
+ALTER TABLE fines ADD COLUMN IF NOT EXISTS fingerprint VARCHAR(64);
+
+WITH computed AS (
+  SELECT
+    f.id,
+    encode(sha256(convert_to(concat_ws('|',
+      upper(regexp_replace(coalesce(c.license_plate, ''), '\s', '', 'g')),
+      lower(btrim(f.violation)),
+      to_char(f.date, 'YYYY-MM-DD"T"HH24:MI:SS'),
+      lower(btrim(coalesce(f.location, ''))),
+      f.source
+    ), 'UTF8')), 'hex') AS fingerprint
+  FROM fines f
+  LEFT JOIN contracts ct ON ct.id = f.contract_id
+  LEFT JOIN cars c ON c.id = ct.car_id
+  WHERE f.fingerprint IS NULL
+),
+ranked AS (
+  SELECT
+    computed.id,
+    computed.fingerprint,
+    row_number() OVER (PARTITION BY computed.fingerprint ORDER BY f.created_at, f.id) AS position
+  FROM computed
+  JOIN fines f ON f.id = computed.id
+)
+UPDATE fines
+SET fingerprint = ranked.fingerprint
+FROM ranked
+WHERE fines.id = ranked.id
+  AND ranked.position = 1
+  AND NOT EXISTS (SELECT 1 FROM fines existing WHERE existing.fingerprint = ranked.fingerprint);
+
+CREATE UNIQUE INDEX IF NOT EXISTS ix_fines_fingerprint ON fines(fingerprint);
@@ -0,0 +1,21 @@
+/*
+  # Indexes for the owner dashboard aggregates
+
+  1. Changes
+    - `ix_contracts_organization_status` on contracts(organization_id, status) INCLUDE (monthly_rent)
+    - `ix_fines_contract_status` on fines(contract_id, status) INCLUDE (amount)
+    - `ix_cars_organization_status` on cars(organization_id, status)
+
+  2. Notes
+    - /api/reports/dashboard and /api/reports/financial/summary aggregate per organisation
+      in SQL; the included columns let the contract and fine sums run as index-only scans
+*/
+
+CREATE INDEX IF NOT EXISTS ix_contracts_organization_status
+  ON contracts(organization_id, status) INCLUDE (monthly_rent);
+
+CREATE INDEX IF NOT EXISTS ix_fines_contract_status
+  ON fines(contract_id, status) INCLUDE (amount);
+
+CREATE INDEX IF NOT EXISTS ix_cars_organization_status
+  ON cars(organization_id, status);
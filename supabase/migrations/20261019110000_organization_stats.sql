@@ -0,0 +1,95 @@
+/*
+  # Per-organisation dashboard counters
+
+  1. New Tables
+    - `organization_stats` (one row per organisation, primary key organization_id)
+      - contract counts by status, revenue and deposit sums
+      - fine counts and amounts by status
+      - car counts by status
+      - `updated_at`, `reconciled_at`
+
+  2. Notes
+    - The API updates the counters in the same transaction as the contract, fine or car
+      change and a nightly job reconciles them with the base tables
+    - Backfilled below from the current rows
+*/
+
+CREATE TABLE IF NOT EXISTS organization_stats (
+  organization_id UUID PRIMARY KEY REFERENCES organizations(id),
+  contracts_total INTEGER NOT NULL DEFAULT 0,
+  contracts_active INTEGER NOT NULL DEFAULT 0,
+  contracts_expired INTEGER NOT NULL DEFAULT 0,
+  contracts_terminated INTEGER NOT NULL DEFAULT 0,
+  revenue_total DECIMAL(14, 2) NOT NULL DEFAULT 0,
+  deposits_total DECIMAL(14, 2) NOT NULL DEFAULT 0,
+  fines_total INTEGER NOT NULL DEFAULT 0,
+  fines_pending INTEGER NOT NULL DEFAULT 0,
+  fines_paid INTEGER NOT NULL DEFAULT 0,
+  fines_deducted INTEGER NOT NULL DEFAULT 0,
+  fines_total_amount DECIMAL(14, 2) NOT NULL DEFAULT 0,
+  fines_pending_amount DECIMAL(14, 2) NOT NULL DEFAULT 0,
+  fines_paid_amount DECIMAL(14, 2) NOT NULL DEFAULT 0,
+  fines_deducted_amount DECIMAL(14, 2) NOT NULL DEFAULT 0,
+  cars_total INTEGER NOT NULL DEFAULT 0,
+  cars_available INTEGER NOT NULL DEFAULT 0,
+  cars_rented INTEGER NOT NULL DEFAULT 0,
+  cars_maintenance INTEGER NOT NULL DEFAULT 0,
+  updated_at TIMESTAMP DEFAULT now(),
+  reconciled_at TIMESTAMP
+);
+
+INSERT INTO organization_stats (
+  organization_id,
+  contracts_total, contracts_active, contracts_expired, contracts_terminated, revenue_total, deposits_total,
+  fines_total, fines_pending, fines_paid, fines_deducted,
+  fines_total_amount, fines_pending_amount, fines_paid_amount, fines_deducted_amount,
+  cars_total, cars_available, cars_rented, cars_maintenance,
+  reconciled_at
+)
+SELECT
+  o.id,
+  coalesce(ct.total, 0), coalesce(ct.active, 0), coalesce(ct.expired, 0), coalesce(ct.terminated, 0),
+  coalesce(ct.revenue, 0), coalesce(ct.deposits, 0),
+  coalesce(f.total, 0), coalesce(f.pending, 0), coalesce(f.paid, 0), coalesce(f.deducted, 0),
+  coalesce(f.amount, 0), coalesce(f.pending_amount, 0), coalesce(f.paid_amount, 0), coalesce(f.deducted_amount, 0),
+  coalesce(c.total, 0), coalesce(c.available, 0), coalesce(c.rented, 0), coalesce(c.maintenance, 0),
+  now()
+FROM organizations o
+LEFT JOIN (
+  SELECT
+    organization_id,
+    count(*) AS total,
+    count(*) FILTER (WHERE status = 'active') AS active,
+    count(*) FILTER (WHERE status = 'expired') AS expired,
+    count(*) FILTER (WHERE status = 'terminated') AS terminated,
+    sum(monthly_rent) AS revenue,
+    sum(deposit_amount) AS deposits
+  FROM contracts
+  GROUP BY organization_id
+) ct ON ct.organization_id = o.id
+LEFT JOIN (
+  SELECT
+    contracts.organization_id,
+    count(*) AS total,
+    count(*) FILTER (WHERE fines.status = 'pending') AS pending,
+    count(*) FILTER (WHERE fines.status = 'paid') AS paid,
+    count(*) FILTER (WHERE fines.status = 'deducted') AS deducted,
+    sum(fines.amount) AS amount,
+    sum(fines.amount) FILTER (WHERE fines.status = 'pending') AS pending_amount,
+    sum(fines.amount) FILTER (WHERE fines.status = 'paid') AS paid_amount,
+    sum(fines.amount) FILTER (WHERE fines.status = 'deducted') AS deducted_amount
+  FROM fines
+  JOIN contracts ON contracts.id = fines.contract_id
+  GROUP BY contracts.organization_id
+) f ON f.organization_id = o.id
+LEFT JOIN (
+  SELECT
+    organization_id,
+    count(*) AS total,
+    count(*) FILTER (WHERE status = 'available') AS available,
+    count(*) FILTER (WHERE status = 'rented') AS rented,
+    count(*) FILTER (WHERE status = 'maintenance') AS maintenance
+  FROM cars
+  GROUP BY organization_id
+) c ON c.organization_id = o.id
+ON CONFLICT (organization_id) DO NOTHING;
@@ -0,0 +1,21 @@
+/*
+  # Indexes for keyset pagination of list endpoints
+
+  1. Changes
+    - (owner column, created_at, id) indexes matching the newest-first pages of
+      /contracts/my-contracts, /fines/my-fines, /fines/by-renter,
+      /notifications/my-notifications, /documents/my-documents and /damage-detections
+
+  2. Notes
+    - Each page is an index range scan starting after the cursor's (created_at, id)
+*/
+
+CREATE INDEX IF NOT EXISTS ix_contracts_organization_created ON contracts(organization_id, created_at, id);
+CREATE INDEX IF NOT EXISTS ix_contracts_renter_created ON contracts(renter_id, created_at, id);
+CREATE INDEX IF NOT EXISTS ix_fines_contract_created ON fines(contract_id, created_at, id);
+CREATE INDEX IF NOT EXISTS ix_notifications_user_created ON notifications(user_id, created_at, id);
+CREATE INDEX IF NOT EXISTS ix_document_uploads_user_created ON document_uploads(user_id, created_at, id);
+
+CREATE INDEX IF NOT EXISTS ix_damage_detections_created ON damage_detections(created_at, id);
+CREATE INDEX IF NOT EXISTS ix_damage_detections_contract_created ON damage_detections(contract_id, created_at, id);
+CREATE INDEX IF NOT EXISTS ix_damage_detections_car_created ON damage_detections(car_id, created_at, id);
@@ -0,0 +1,22 @@
+/*
+  # Composite indexes for the API's filter patterns
+
+  1. Changes
+    - `ix_organizations_owner_id` on organizations(owner_id)
+    - `ix_contracts_renter_status` on contracts(renter_id, status)
+    - `ix_contracts_status_end_date` on contracts(status, end_date)
+    - `ix_damage_detections_review_uncertainty` on damage_detections(needs_human_review, uncertainty_score)
+    - `ix_damage_labels_detection_id` on damage_labels(detection_id)
+
+  2. Notes
+    - contracts(organization_id), fines(contract_id, status) and cars(organization_id, status)
+      are served by the dashboard aggregate indexes; notifications(user_id, created_at) by
+      the keyset pagination index
+    - benchmarks/query_plan_check.py EXPLAINs the hot queries and fails on sequential scans
+*/
+
+CREATE INDEX IF NOT EXISTS ix_organizations_owner_id ON organizations(owner_id);
+CREATE INDEX IF NOT EXISTS ix_contracts_renter_status ON contracts(renter_id, status);
+CREATE INDEX IF NOT EXISTS ix_contracts_status_end_date ON contracts(status, end_date);
+CREATE INDEX IF NOT EXISTS ix_damage_detections_review_uncertainty ON damage_detections(needs_human_review, uncertainty_score);
+CREATE INDEX IF NOT EXISTS ix_damage_labels_detection_id ON damage_labels(detection_id);
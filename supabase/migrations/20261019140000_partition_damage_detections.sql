@@ -0,0 +1,80 @@
+/*
+  # Monthly range partitioning of damage_detections and damage_labels
+
+  1. Changes
+    - `damage_detections` and `damage_labels` become `PARTITION BY RANGE (created_at)`
+      with one partition per month (`<table>_pYYYYMM`) and a `<table>_default` partition
+    - Partitions cover the oldest existing month up to three months ahead; the app keeps
+      creating them ahead (`partition_maintenance` job, PARTITION_MONTHS_AHEAD)
+    - Primary keys become (id, created_at), since a partitioned table's keys must contain
+      the partition key
+    - The foreign keys damage_labels.detection_id and damage_rescore_results.detection_id
+      are dropped; they cannot reference a partitioned table's id alone
+
+  2. Notes
+    - Existing rows are copied into the new tables, so run this in a maintenance window
+    - Retention (`cleanup_old_data`) now detaches and drops whole months older than
+      DETECTION_RETENTION_DAYS instead of running a DELETE; labelled detections are moved
+      to the default partition first and kept
+    - Already partitioned tables are left unchanged
+*/
+
+CREATE OR REPLACE FUNCTION pg_temp.partition_by_month(parent text) RETURNS void AS $$
+DECLARE
+  legacy text := parent || '_unpartitioned';
+  partition_month date;
+  last_month date := date_trunc('month', now()) + interval '3 months';
+BEGIN
+  IF EXISTS (
+    SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = parent
+  ) THEN
+    RETURN;
+  END IF;
+
+  EXECUTE format('ALTER TABLE %I RENAME TO %I', parent, legacy);
+  EXECUTE format('UPDATE %I SET created_at = coalesce(updated_at, now()) WHERE created_at IS NULL', legacy);
+  EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)', parent, legacy);
+  EXECUTE format('CREATE TABLE %I PARTITION OF %I DEFAULT', parent || '_default', parent);
+
+  EXECUTE format('SELECT date_trunc(''month'', coalesce(min(created_at), now()))::date FROM %I', legacy) INTO partition_month;
+  WHILE partition_month <= last_month LOOP
+    EXECUTE format(
+      'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+      parent || '_p' || to_char(partition_month, 'YYYYMM'), parent, partition_month, (partition_month + interval '1 month')::date
+    );
+    partition_month := (partition_month + interval '1 month')::date;
+  END LOOP;
+
+  EXECUTE format('INSERT INTO %I SELECT * FROM %I', parent, legacy);
+  EXECUTE format('DROP TABLE %I', legacy);
+  EXECUTE format('ALTER TABLE %I ADD PRIMARY KEY (id, created_at)', parent);
+END;
+$$ LANGUAGE plpgsql;
+
+ALTER TABLE damage_labels DROP CONSTRAINT IF EXISTS damage_labels_detection_id_fkey;
+ALTER TABLE damage_rescore_results DROP CONSTRAINT IF EXISTS damage_rescore_results_detection_id_fkey;
+
+SELECT pg_temp.partition_by_month('damage_detections');
+SELECT pg_temp.partition_by_month('damage_labels');
+
+DO $$
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'damage_detections_contract_id_fkey') THEN
+    ALTER TABLE damage_detections ADD CONSTRAINT damage_detections_contract_id_fkey
+      FOREIGN KEY (contract_id) REFERENCES contracts(id);
+  END IF;
+  IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'damage_detections_car_id_fkey') THEN
+    ALTER TABLE damage_detections ADD CONSTRAINT damage_detections_car_id_fkey
+      FOREIGN KEY (car_id) REFERENCES cars(id);
+  END IF;
+  IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'damage_labels_user_id_fkey') THEN
+    ALTER TABLE damage_labels ADD CONSTRAINT damage_labels_user_id_fkey
+      FOREIGN KEY (user_id) REFERENCES users(id);
+  END IF;
+END $$;
+
+CREATE INDEX IF NOT EXISTS ix_damage_detections_created ON damage_detections(created_at, id);
+CREATE INDEX IF NOT EXISTS ix_damage_detections_contract_created ON damage_detections(contract_id, created_at, id);
+CREATE INDEX IF NOT EXISTS ix_damage_detections_car_created ON damage_detections(car_id, created_at, id);
+CREATE INDEX IF NOT EXISTS ix_damage_detections_review_uncertainty ON damage_detections(needs_human_review, uncertainty_score);
+CREATE INDEX IF NOT EXISTS ix_damage_labels_detection_id ON damage_labels(detection_id);
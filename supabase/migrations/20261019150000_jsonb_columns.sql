@@ -0,0 +1,32 @@
+/*
+  # JSONB for detection, report, document and contract JSON columns
+
+  1. Changes
+    - `damage_detections.yolo_detections`, `damage_reports.damage_details`,
+      `document_uploads.extracted_text` and `contracts.terms` change from json to jsonb
+    - GIN (jsonb_path_ops) index on `yolo_detections -> 'detections'` for the detection
+      class filter of /damage-detections (`@> '[{"class": ...}]'`)
+    - Expression index on the highest YOLO confidence, `(yolo_detections ->> 'confidence')::float8`,
+      for the min_confidence filter of /damage-detections
+    - Expression index on the OCR'd Emirates ID number,
+      `extracted_text -> 'parsed_data' ->> 'emirates_id'`, for /api/documents/by-emirates-id
+
+  2. Notes
+    - The type change rewrites each table (partition by partition for damage_detections)
+      under an ACCESS EXCLUSIVE lock, so run this in a maintenance window
+    - The index expressions match the ones the app queries (core/damage_ai_models.py,
+      core/database.py); the planner only uses an expression index for the same expression
+    - damage_details and terms are not queried by content yet, so they get no index
+*/
+
+ALTER TABLE damage_detections ALTER COLUMN yolo_detections TYPE jsonb USING yolo_detections::jsonb;
+ALTER TABLE damage_reports ALTER COLUMN damage_details TYPE jsonb USING damage_details::jsonb;
+ALTER TABLE document_uploads ALTER COLUMN extracted_text TYPE jsonb USING extracted_text::jsonb;
+ALTER TABLE contracts ALTER COLUMN terms TYPE jsonb USING terms::jsonb;
+
+CREATE INDEX IF NOT EXISTS ix_damage_detections_yolo_detections
+  ON damage_detections USING gin ((yolo_detections -> 'detections') jsonb_path_ops);
+CREATE INDEX IF NOT EXISTS ix_damage_detections_yolo_confidence
+  ON damage_detections (((yolo_detections ->> 'confidence')::float8));
+CREATE INDEX IF NOT EXISTS ix_document_uploads_emirates_id
+  ON document_uploads (((extracted_text -> 'parsed_data') ->> 'emirates_id'));
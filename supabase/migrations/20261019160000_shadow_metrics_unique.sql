@@ -0,0 +1,48 @@
+/*
+  # One running-mean row per shadow metric
+
+  1. Changes
+    - Duplicate shadow rows in `damage_metrics` (same model_id and metric_type) are merged
+      into the newest one, weighting each mean by its sample_size
+    - `uq_damage_metrics_shadow` unique index on damage_metrics(model_id, metric_type)
+      WHERE dataset_split = 'shadow'; shadow evaluation upserts against it
+    - Rescore results that overwrote a shadow result of the same model version (they have a
+      job_id, shadow results do not) get `source = 'rescore'`
+
+  2. Notes
+    - Duplicates came from concurrent workers recording the first sample of a metric
+*/
+
+WITH totals AS (
+  SELECT model_id, metric_type,
+         sum(metric_value * coalesce(sample_size, 1)) / sum(coalesce(sample_size, 1)) AS metric_value,
+         sum(coalesce(sample_size, 1)) AS sample_size
+  FROM damage_metrics
+  WHERE dataset_split = 'shadow'
+  GROUP BY model_id, metric_type
+  HAVING count(*) > 1
+),
+newest AS (
+  SELECT DISTINCT ON (model_id, metric_type) id, model_id, metric_type
+  FROM damage_metrics
+  WHERE dataset_split = 'shadow'
+  ORDER BY model_id, metric_type, evaluation_date DESC, id
+)
+UPDATE damage_metrics m
+SET metric_value = t.metric_value, sample_size = t.sample_size
+FROM newest n JOIN totals t USING (model_id, metric_type)
+WHERE m.id = n.id;
+
+DELETE FROM damage_metrics m
+WHERE m.dataset_split = 'shadow'
+  AND m.id <> (
+    SELECT k.id FROM damage_metrics k
+    WHERE k.dataset_split = 'shadow' AND k.model_id = m.model_id AND k.metric_type = m.metric_type
+    ORDER BY k.evaluation_date DESC, k.id
+    LIMIT 1
+  );
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_damage_metrics_shadow
+  ON damage_metrics(model_id, metric_type) WHERE dataset_split = 'shadow';
+
+UPDATE damage_rescore_results SET source = 'rescore' WHERE source = 'shadow' AND job_id IS NOT NULL;
@@ -0,0 +1,15 @@
+/*
+  # Restart the shadow evaluation metrics
+
+  1. Changes
+    - Shadow rows in `damage_metrics` (dataset_split = 'shadow') are deleted; shadow evaluation
+      starts new running means on its next sample
+
+  2. Notes
+    - Until now every sampled pair where the candidate model found damage failed to record
+      (its YOLO box areas were not JSON serializable), so the agreement and confidence means
+      were taken over damage-free pairs only
+    - Shadow results already in `damage_rescore_results` are kept
+*/
+
+DELETE FROM damage_metrics WHERE dataset_split = 'shadow';
@@ -0,0 +1,13 @@
+/*
+  # Per-stage timings on damage detections
+
+  1. Changes
+    - `damage_detections.stage_timings` jsonb column: per-stage milliseconds, input bytes and
+      resolution bucket recorded by /ai/damage/detect
+
+  2. Notes
+    - Added on the partitioned parent, so every partition gets the column
+    - Nullable with no default, so existing rows are not rewritten
+*/
+
+ALTER TABLE damage_detections ADD COLUMN IF NOT EXISTS stage_timings jsonb;
@@ -0,0 +1,14 @@
+/*
+  # WebP renditions on damage detections
+
+  1. Changes
+    - `damage_detections.renditions` jsonb column: thumbnail, preview and full WebP URLs
+      per image column
+
+  2. Notes
+    - Added on the partitioned parent, so every partition gets the column
+    - Existing detections get renditions lazily, the first time a list or detail response
+      shows them
+*/
+
+ALTER TABLE damage_detections ADD COLUMN IF NOT EXISTS renditions jsonb;
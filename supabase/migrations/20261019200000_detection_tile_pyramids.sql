@@ -0,0 +1,13 @@
+/*
+  # Tile pyramids on damage detections
+
+  1. Changes
+    - `damage_detections.tile_pyramids` jsonb column: DeepZoom pyramid descriptor per image
+      column
+
+  2. Notes
+    - Added on the partitioned parent, so every partition gets the column
+    - Pyramids for existing detections are built when first requested
+*/
+
+ALTER TABLE damage_detections ADD COLUMN IF NOT EXISTS tile_pyramids jsonb;